@@ -0,0 +1,293 @@
+"""
+Agent execution mode: the ReAct coordinator plans and calls the step tools.
+
+Selected with EXECUTION_MODE="agent" (or `mode="agent"` on a request). The
+run is bounded by AGENT_MAX_STEPS graph steps; LangGraph exposes what is
+left as `remaining_steps`, and the agent stops calling tools before the
+budget is exhausted. Graph updates are reported as the same progress events
+as the pipeline (plus `agent_action` for each coordinator decision). The
+coordinator calls its model through the `coordinator` route like the tools
+do, so its calls are retried, scheduled and traced the same way, and
+`run_metrics.json` and /metrics compare the cost and latency of both modes.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.errors import GraphRecursionError
+
+from .agents.base import get_coordinator_agent
+from .agents.context import RunContext
+from .agents.prompts import template_versions
+from .agents.tools import tool_call_key
+from .artefacts import StoredRun, get_artefact_store
+from .checkpoints import RunCheckpoints, RunNotFoundError
+from .config.settings import Settings
+from .graph_tracer import record_run_totals, run_call_graph, trace_node
+from .prompts import build_coordinator_instructions
+from .steps import (
+    EventCallback,
+    awrite_step_output,
+    create_run,
+    emit,
+    print_run_footer,
+    print_run_header,
+    print_step_result,
+    validation_report,
+)
+
+logger = logging.getLogger(__name__)
+
+# Root node of an agent-mode run in the call graph
+AGENT_RUN_NODE = "agent_run"
+
+# tool name -> (step, artefact, result key, console title)
+_STEPS = {
+    "generate_axis_unit_context": (
+        1,
+        "step1_general_context.md",
+        "step1_general_context",
+        "General context for AXIS × UNIT",
+    ),
+    "generate_ideal_roles": (
+        2,
+        "step2_ideal_roles_prompt.md",
+        "step2_ideal_roles_prompt",
+        "Ideal roles prompt opening",
+    ),
+    "generate_actionable_context": (
+        3,
+        "step3_actionable_context_brief.md",
+        "step3_actionable_context_brief",
+        "Actionable analytical context brief (final output)",
+    ),
+}
+
+
+def _load_artefacts(run: StoredRun, outputs: Dict[str, str]) -> List[int]:
+    """Fill `outputs` missing steps from the run's artefacts; their numbers."""
+    loaded = []
+    for step, filename, key, _ in _STEPS.values():
+        if key in outputs:
+            continue
+        content = run.read(filename)
+        if content is not None:
+            outputs[key] = content
+            loaded.append(step)
+    return loaded
+
+
+class AgentRunIncomplete(RuntimeError):
+    """Raised when the agent stops (e.g. out of steps) without all 3 outputs."""
+
+
+async def execute_agent_async(
+    settings: Settings,
+    emit_console: bool = False,
+    on_event: Optional[EventCallback] = None,
+    resume: Optional[str] = None,
+    follow_up: Optional[str] = None,
+) -> dict:
+    """
+    Run the ReAct coordinator for one AXIS × UNIT.
+
+    Uses the process-wide compiled coordinator graph of the run's
+    `coordinator` model route; the run's RunContext reaches the tools through
+    the graph's config. Each tool result is written as its step artefact and
+    checkpointed, so an agent run can later be resumed in pipeline mode.
+
+    The run ID is also the agent's thread ID: with a checkpointer
+    (AGENT_CHECKPOINTER), `resume=<run_id>` continues that thread from its
+    last persisted step, e.g. after a failure, and `follow_up` adds a new
+    instruction to it. Only the new message is sent; the thread's (bounded)
+    history is loaded from the checkpointer. An unknown thread raises
+    `RunNotFoundError`.
+
+    Raises `AgentRunIncomplete` if the agent runs out of steps (or stops)
+    before all three steps have an output. Returns the same dict as the
+    pipeline (`step1_cache_hit` is always False; `resumed_steps` lists the
+    steps whose output comes from an earlier invocation of the thread), plus
+    `thread_id` and `agent_reply` (the coordinator's final answer), with
+    `run_metrics["agent"]` holding the steps taken and the tool calls made.
+    """
+    context = RunContext.from_settings(settings)
+    settings = context.settings
+    agent = get_coordinator_agent(context.model_for("coordinator"), settings)
+
+    if resume:
+        if agent.checkpointer is None:
+            raise ValueError("Resuming agent runs needs an AGENT_CHECKPOINTER")
+        run = await asyncio.to_thread(get_artefact_store(settings).open_run, resume)
+    elif follow_up:
+        raise ValueError("A follow-up message needs the run id to resume")
+    else:
+        run = await asyncio.to_thread(create_run, settings)
+    checkpoints = await asyncio.to_thread(RunCheckpoints, run)
+    outputs: Dict[str, str] = {}
+    # Tool calls by ID (incl. earlier invocations') and this invocation's calls
+    known_calls: Dict[str, Dict[str, Any]] = {}
+    tool_calls: List[str] = []
+    steps_taken = 0
+    writes = []
+    reply: Optional[str] = None
+
+    config = {
+        **context.as_config(),
+        "recursion_limit": settings.AGENT_MAX_STEPS,
+    }
+    config["configurable"]["thread_id"] = run.run_id
+
+    if not resume:
+        inputs = {
+            "messages": [HumanMessage(content="Start the plan.")],
+            "instructions": build_coordinator_instructions(settings),
+        }
+    else:
+        snapshot = await agent.aget_state(config)
+        if not snapshot.values:
+            raise RunNotFoundError(f"No agent thread for run id {resume!r}")
+        for message in snapshot.values.get("messages", []):
+            if isinstance(message, AIMessage):
+                known_calls.update((call["id"], call) for call in message.tool_calls)
+        # None continues the thread from its last checkpoint
+        inputs = (
+            {"messages": [HumanMessage(content=follow_up)]} if follow_up else None
+        )
+
+    async def save_step(call: Dict[str, Any], output: str) -> None:
+        _, filename, _, _ = _STEPS[call["name"]]
+        input_hash = tool_call_key(context, call["name"], call["args"])
+        await awrite_step_output(run, filename, output)
+        await asyncio.to_thread(
+            checkpoints.save, call["name"], input_hash, filename, output
+        )
+
+    async def on_message(message: Any) -> None:
+        nonlocal reply
+        if isinstance(message, AIMessage) and not message.tool_calls:
+            reply = str(message.content)
+            return
+        if isinstance(message, AIMessage):
+            names = [call["name"] for call in message.tool_calls]
+            await emit(on_event, {"event": "agent_action", "tool_calls": names})
+            for call in message.tool_calls:
+                known_calls[call["id"]] = call
+                tool_calls.append(call["name"])
+                step = _STEPS[call["name"]][0] if call["name"] in _STEPS else None
+                await emit(
+                    on_event,
+                    {"event": "step_start", "step": step, "name": call["name"]},
+                )
+            return
+        if not isinstance(message, ToolMessage):
+            return
+        call = known_calls.get(message.tool_call_id)
+        if call is None or call["name"] not in _STEPS:
+            return
+        if message.status == "error":
+            logger.warning("Agent tool `%s` failed: %s", call["name"], message.content)
+            return
+        step, filename, key, title = _STEPS[call["name"]]
+        outputs[key] = message.content
+        # Written while the coordinator decides its next action
+        writes.append(asyncio.create_task(save_step(call, message.content)))
+        await emit(
+            on_event,
+            {
+                "event": "step_complete",
+                "step": step,
+                "name": call["name"],
+                "artefact": filename,
+                "output": message.content,
+                "resumed": False,
+            },
+        )
+        if emit_console:
+            print_step_result(step, title, message.content)
+
+    with run_call_graph() as call_graph, trace_node(AGENT_RUN_NODE):
+        if emit_console:
+            print_run_header(settings, run)
+        await emit(on_event, {"event": "run_start", "run_dir": run.location})
+
+        try:
+            with trace_node("coordinator"):
+                async for update in agent.astream(
+                    inputs, config, stream_mode="updates"
+                ):
+                    steps_taken += 1
+                    for state in update.values():
+                        for message in (state or {}).get("messages", []):
+                            await on_message(message)
+        except GraphRecursionError as exc:
+            raise AgentRunIncomplete(
+                f"Agent used its {settings.AGENT_MAX_STEPS} steps without "
+                "finishing the brief"
+            ) from exc
+        finally:
+            await asyncio.gather(*writes)
+
+        # Steps completed by an earlier invocation of the thread
+        resumed_steps = await asyncio.to_thread(_load_artefacts, run, outputs)
+        missing = [key for _, _, key, _ in _STEPS.values() if key not in outputs]
+        if missing:
+            raise AgentRunIncomplete(
+                f"Agent stopped after {steps_taken} of {settings.AGENT_MAX_STEPS} "
+                f"steps without producing: {', '.join(missing)}"
+            )
+
+        if emit_console:
+            print_run_footer(run)
+
+    validation = validation_report(
+        settings,
+        {
+            filename: (name, outputs[key])
+            for name, (_, filename, key, _) in _STEPS.items()
+        },
+    )
+    mermaid_flowchart = call_graph.as_mermaid_flowchart(direction="LR")
+    run_metrics = call_graph.metrics_as_dict()
+    run_metrics["mode"] = "agent"
+    run_metrics["agent"] = {
+        "steps": steps_taken,
+        "max_steps": settings.AGENT_MAX_STEPS,
+        "static_todo": settings.STATIC_TODO,
+        "tool_calls": tool_calls,
+    }
+    run_metrics["prompt_templates"] = template_versions()
+    record_run_totals("agent", run_metrics["totals"])
+
+    await asyncio.gather(
+        awrite_step_output(run, "call_graph.mmd", mermaid_flowchart),
+        awrite_step_output(
+            run, "run_metrics.json", json.dumps(run_metrics, indent=2)
+        ),
+        awrite_step_output(run, "validation.json", json.dumps(validation, indent=2)),
+    )
+    logger.info(
+        "Agent run completed in %d steps (%d tool calls). Artefacts stored at %s",
+        steps_taken,
+        len(tool_calls),
+        run,
+    )
+
+    result = {
+        "run_id": run.run_id,
+        "run_dir": run.location,
+        "resumed_steps": resumed_steps,
+        "step1_general_context": outputs["step1_general_context"],
+        "step1_cache_hit": False,
+        "step2_ideal_roles_prompt": outputs["step2_ideal_roles_prompt"],
+        "step3_actionable_context_brief": outputs["step3_actionable_context_brief"],
+        "validation": validation,
+        "mermaid_flowchart": mermaid_flowchart,
+        "call_graph": call_graph.as_dict(),
+        "run_metrics": run_metrics,
+        "thread_id": run.run_id,
+        "agent_reply": reply,
+    }
+    await emit(on_event, {"event": "run_complete", "result": result})
+    return result
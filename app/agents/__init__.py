@@ -1,9 +1,17 @@
-from .base import DeepAgentState, build_react_agent
-from .tools import generate_axis_unit_context, generate_ideal_roles
+from .base import DeepAgentState, build_react_agent, get_coordinator_agent
+from .context import RunContext
+from .tools import (
+    generate_actionable_context,
+    generate_axis_unit_context,
+    generate_ideal_roles,
+)
 
 __all__ = [
     "DeepAgentState",
+    "RunContext",
     "build_react_agent",
+    "generate_actionable_context",
     "generate_axis_unit_context",
     "generate_ideal_roles",
+    "get_coordinator_agent",
 ]
@@ -1,36 +1,120 @@
-from typing import List
+import threading
+from typing import Any, Dict, List, Optional
 
 from typing_extensions import Annotated, TypedDict
-from langchain_core.messages import AnyMessage
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AnyMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import add_messages
+from langgraph.managed import RemainingSteps
 from langgraph.prebuilt import create_react_agent
-from langchain_openai import ChatOpenAI
 
 from ..config import Settings
-from ..prompts import build_coordinator_instructions
-from .tools import generate_axis_unit_context, generate_ideal_roles
+from ..graph_tracer import trace_node
+from .memory import get_checkpointer, history_hook
+from .router import RoutedChatModel, RoutedModel
+from .tools import (
+    generate_actionable_context,
+    generate_axis_unit_context,
+    generate_ideal_roles,
+)
 
 
 class DeepAgentState(TypedDict):
     """Shared state for the coordinator agent.
 
     - messages: the ReAct message history
-    - remaining_steps: how many tool/LLM steps the agent is allowed to take
+    - instructions: the run's coordinator system prompt
+      (see `build_coordinator_instructions`)
+    - remaining_steps: how many graph steps the agent has left before
+      hitting the run's recursion limit (managed by LangGraph)
     """
 
     messages: Annotated[List[AnyMessage], add_messages]
-    remaining_steps: int
+    instructions: str
+    remaining_steps: RemainingSteps
 
 
-def build_react_agent(model: ChatOpenAI, settings: Settings):
-    """Create the ReAct coordinator agent with tools and instructions."""
-    tools = [generate_axis_unit_context, generate_ideal_roles]
-    instructions = build_coordinator_instructions(settings)
+def _coordinator_prompt(state: DeepAgentState) -> List[AnyMessage]:
+    # Instructions travel in the state, so one compiled graph serves every run
+    return [SystemMessage(content=state["instructions"]), *state["messages"]]
 
-    agent = create_react_agent(
+
+def _traced(tool: BaseTool) -> StructuredTool:
+    """`tool` with each call traced as its own node in the run's call graph."""
+
+    async def arun(config: RunnableConfig, **kwargs: Any) -> str:
+        with trace_node(tool.name):
+            return await tool.ainvoke(kwargs, config=config)
+
+    return StructuredTool.from_function(
+        coroutine=arun,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
+
+
+AGENT_TOOLS = [
+    generate_axis_unit_context,
+    generate_ideal_roles,
+    generate_actionable_context,
+]
+
+
+def build_react_agent(
+    model: BaseChatModel,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    history_max_tokens: int = 0,
+    history_strategy: str = "trim",
+):
+    """Create the ReAct coordinator agent with the three pipeline tools.
+
+    The run's instructions are read from `state["instructions"]` and its
+    settings reach the tools through the RunContext in the invoke config.
+    With a checkpointer, threads (`configurable.thread_id`) are persisted
+    and their history is bounded to `history_max_tokens` (see `memory.py`).
+    """
+    return create_react_agent(
         model=model,
-        tools=tools,
-        prompt=instructions,
+        tools=[_traced(tool) for tool in AGENT_TOOLS],
+        prompt=_coordinator_prompt,
         state_schema=DeepAgentState,
+        checkpointer=checkpointer,
+        pre_model_hook=history_hook(model, history_max_tokens, history_strategy),
+    )
+
+
+_agents: Dict[tuple, Any] = {}
+_agents_lock = threading.Lock()
+
+
+def get_coordinator_agent(route: RoutedModel, settings: Settings):
+    """
+    The compiled coordinator graph for a model route, built once per process.
+
+    The graph calls its model through the route, like the pipeline's tools.
+    """
+    checkpointer = get_checkpointer(settings)
+    key = (
+        tuple(handle.key for handle in route.handles),
+        route.strategy,
+        route.cooldown_s,
+        id(checkpointer),
+        settings.AGENT_HISTORY_MAX_TOKENS,
+        settings.AGENT_HISTORY_STRATEGY,
     )
+    agent = _agents.get(key)
+    if agent is None:
+        with _agents_lock:
+            agent = _agents.get(key)
+            if agent is None:
+                agent = _agents[key] = build_react_agent(
+                    RoutedChatModel(route=route),
+                    checkpointer,
+                    settings.AGENT_HISTORY_MAX_TOKENS,
+                    settings.AGENT_HISTORY_STRATEGY,
+                )
     return agent
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from ..config import FrozenSettings, Settings, freeze_settings, get_settings
+from .router import ModelRouter, RoutedModel
+
+# Key under `config["configurable"]` where tools look for their RunContext
+RUN_CONTEXT_KEY = "run_context"
+
+
+@dataclass(frozen=True)
+class RunContext:
+    """Everything a tool needs for one run, resolved once up front.
+
+    - settings: immutable snapshot of the run's settings (incl. overrides)
+    - router: each tool's model route (pooled, shared chat model handles)
+
+    Tools receive it through LangChain's RunnableConfig, so concurrent runs
+    with different settings never read each other's (or the process') config.
+    """
+
+    settings: FrozenSettings
+    router: ModelRouter
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "RunContext":
+        frozen = freeze_settings(settings)
+        return cls(settings=frozen, router=ModelRouter(frozen))
+
+    def model_for(self, tool_name: str) -> RoutedModel:
+        """The model route a tool's LLM calls go through."""
+        return self.router.route(tool_name)
+
+    def as_config(self) -> RunnableConfig:
+        """RunnableConfig to pass to a tool's `invoke` / `ainvoke`."""
+        return {"configurable": {RUN_CONTEXT_KEY: self}}
+
+
+@lru_cache(maxsize=1)
+def default_run_context() -> RunContext:
+    """Context built from the process settings, for tools called without one."""
+    return RunContext.from_settings(get_settings())
+
+
+def run_context_from_config(config: Optional[Mapping[str, Any]]) -> RunContext:
+    """The RunContext attached to a RunnableConfig, or the process default."""
+    configurable = (config or {}).get("configurable") or {}
+    context = configurable.get(RUN_CONTEXT_KEY)
+    return context if context is not None else default_run_context()
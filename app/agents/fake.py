@@ -0,0 +1,165 @@
+"""Deterministic offline chat model, for load tests and runs without API keys.
+
+Recognises the pipeline's prompt templates by their system message and
+answers with well-formed, input-dependent output for each step (boundary
+markers, the requested number of roles, the 11 brief headings), so every
+downstream step and validator sees realistic structure. Identical prompts
+always produce identical output.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .prompts import (
+    ACTIONABLE_CONTEXT_TEMPLATE,
+    AXIS_UNIT_CONTEXT_TEMPLATE,
+    IDEAL_ROLES_TEMPLATE,
+)
+
+
+def _field(text: str, pattern: str, default: str) -> str:
+    match = re.search(pattern, text)
+    return match.group(1).strip() if match else default
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning canned, step-shaped answers after `latency_s`."""
+
+    model_name: str = "fake"
+    latency_s: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        system = str(messages[0].content) if messages else ""
+        prompt = str(messages[-1].content) if messages else ""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+
+        if system == AXIS_UNIT_CONTEXT_TEMPLATE.system:
+            axis = _field(prompt, r"AXIS_OF_EXPLORATION: (.+)", "Axis")
+            unit = _field(prompt, r"UNIT_OF_ANALYSIS: (.+)", "Unit")
+            return (
+                "-- START OF GENERAL CONTEXT --\n"
+                f"🔹 AXIS — {axis.title()}\n\n"
+                "Context of the axis\n"
+                f"Synthetic context {digest} for {axis}.\n"
+                "- key transformation\n- opportunity zone\n\n"
+                "🎯 Objective of the axis:\nUnderstand the axis.\n\n"
+                "🧠 Analytical strategies:\n1. Value chain analysis\n\n"
+                f"UNIT OF ANALYSIS: {unit} (synthetic)\n"
+                "-- END OF GENERAL CONTEXT --"
+            )
+        if system == IDEAL_ROLES_TEMPLATE.system:
+            n_roles = int(_field(prompt, r"NUMBER_OF_ROLES: (\d+)", "3"))
+            roles = "\n".join(
+                f"{index}. **Analyst {index}** — covers angle {index} ({digest})."
+                for index in range(1, n_roles + 1)
+            )
+            return f"You will embody the following roles to analyse the field:\n{roles}"
+        if system == ACTIONABLE_CONTEXT_TEMPLATE.system:
+            return "\n\n".join(
+                f"{index}. {heading}\n– Synthetic content {digest}. [INT]"
+                for index, heading in enumerate(
+                    ACTIONABLE_CONTEXT_TEMPLATE.headings, start=1
+                )
+            )
+        return f"Synthetic answer {digest}."
+
+    def _bounded_answer(
+        self, messages: List[BaseMessage], max_tokens: Optional[int]
+    ) -> Tuple[str, dict]:
+        """The answer cut to `max_tokens`, and the response metadata."""
+        answer = self._answer(messages)
+        if max_tokens and _estimate_tokens(answer) > max_tokens:
+            return answer[: max_tokens * 4], {"finish_reason": "length"}
+        return answer, {"finish_reason": "stop"}
+
+    def get_num_tokens_from_messages(
+        self, messages: List[BaseMessage], **_: Any
+    ) -> int:
+        return sum(_estimate_tokens(str(message.content)) for message in messages)
+
+    def _usage(self, messages: List[BaseMessage], answer: str) -> dict:
+        prompt_tokens = self.get_num_tokens_from_messages(messages)
+        completion_tokens = _estimate_tokens(answer)
+        return {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _result(
+        self, messages: List[BaseMessage], max_tokens: Optional[int] = None
+    ) -> ChatResult:
+        answer, metadata = self._bounded_answer(messages, max_tokens)
+        usage = self._usage(messages, answer)
+        message = AIMessage(
+            content=answer, usage_metadata=usage, response_metadata=metadata
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency_s)
+        return self._result(messages, kwargs.get("max_tokens"))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency_s)
+        return self._result(messages, kwargs.get("max_tokens"))
+
+    def _chunks(
+        self, messages: List[BaseMessage], max_tokens: Optional[int] = None
+    ) -> Iterator[ChatGenerationChunk]:
+        answer, metadata = self._bounded_answer(messages, max_tokens)
+        for line in answer.splitlines(keepends=True):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=line))
+        usage = self._usage(messages, answer)
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="", usage_metadata=usage, response_metadata=metadata
+            )
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_s)
+        yield from self._chunks(messages, kwargs.get("max_tokens"))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_s)
+        for chunk in self._chunks(messages, kwargs.get("max_tokens")):
+            yield chunk
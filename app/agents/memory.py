@@ -0,0 +1,141 @@
+"""
+Persistence and bounded message history for the coordinator agent.
+
+A LangGraph checkpointer stores each thread's state after every graph step,
+so an agent run can be continued by its thread ID after a failure or for a
+follow-up request (AGENT_CHECKPOINTER):
+
+  - memory: in-process saver (tests; lost on restart)
+  - sqlite: the DATABASE_URL database (needs `langgraph-checkpoint-sqlite`)
+  - none:   no persistence; agent runs cannot be resumed
+
+Before each coordinator call, a history above AGENT_HISTORY_MAX_TOKENS
+(estimated) is cut down to half the budget: the oldest messages are dropped
+("trim") or condensed into one summary message ("summarize"). The stored
+state is rewritten as well, so memory per thread stays bounded.
+"""
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    get_buffer_string,
+    trim_messages,
+)
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from ..config import Settings, sqlite_path_from_url
+from .models import estimate_prompt_tokens
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTERS = ("memory", "sqlite", "none")
+HISTORY_STRATEGIES = ("trim", "summarize")
+
+_SUMMARY_INSTRUCTIONS = (
+    "Summarise the following part of a conversation between a user and the "
+    "BIG coordinator agent. Keep every decision taken, every tool called and "
+    "the key facts of their results; drop verbatim tool output."
+)
+
+_checkpointers: Dict[Tuple[str, str], BaseCheckpointSaver] = {}
+_checkpointers_lock = threading.Lock()
+
+
+def _build_checkpointer(backend: str, path: str) -> BaseCheckpointSaver:
+    if backend == "memory":
+        return InMemorySaver()
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as exc:  # optional backend
+        raise ImportError(
+            "The sqlite agent checkpointer needs "
+            "`pip install langgraph-checkpoint-sqlite`"
+        ) from exc
+    # The connection is opened on first use, on the service's event loop
+    return AsyncSqliteSaver(aiosqlite.connect(path))
+
+
+def get_checkpointer(settings: Settings) -> Optional[BaseCheckpointSaver]:
+    """The process-wide checkpointer for AGENT_CHECKPOINTER (None for "none")."""
+    backend = settings.AGENT_CHECKPOINTER
+    if backend not in CHECKPOINTERS:
+        raise ValueError(f"AGENT_CHECKPOINTER must be one of {CHECKPOINTERS}")
+    if backend == "none":
+        return None
+    path = sqlite_path_from_url(settings.DATABASE_URL) if backend == "sqlite" else ""
+    key = (backend, path)
+    checkpointer = _checkpointers.get(key)
+    if checkpointer is None:
+        with _checkpointers_lock:
+            checkpointer = _checkpointers.get(key)
+            if checkpointer is None:
+                checkpointer = _checkpointers[key] = _build_checkpointer(
+                    backend, path
+                )
+                logger.info("Agent threads are persisted in %s", backend)
+    return checkpointer
+
+
+def history_hook(
+    model: BaseChatModel, max_tokens: int, strategy: str
+) -> Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]:
+    """
+    Pre-model hook bounding a thread's message history to `max_tokens`.
+
+    Cuts down to half the budget, so the stored history is not rewritten on
+    every step once it is close to the limit.
+    """
+    if strategy not in HISTORY_STRATEGIES:
+        raise ValueError(
+            f"AGENT_HISTORY_STRATEGY must be one of {HISTORY_STRATEGIES}"
+        )
+
+    async def bound_history(state: Dict[str, Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        if max_tokens <= 0 or estimate_prompt_tokens(messages) <= max_tokens:
+            return {}
+        # Never start on a tool result whose tool call was dropped
+        kept = trim_messages(
+            messages,
+            max_tokens=max_tokens // 2,
+            token_counter=estimate_prompt_tokens,
+            strategy="last",
+            start_on=("human", "ai"),
+            allow_partial=False,
+        )
+        if not kept:
+            logger.warning("Latest agent messages exceed the history budget alone")
+            return {}
+
+        dropped = messages[: len(messages) - len(kept)]
+        if strategy == "summarize":
+            summary = await model.ainvoke(
+                [
+                    SystemMessage(content=_SUMMARY_INSTRUCTIONS),
+                    HumanMessage(content=get_buffer_string(dropped)),
+                ]
+            )
+            kept = [
+                HumanMessage(
+                    content=f"Summary of the earlier conversation:\n{summary.content}"
+                ),
+                *kept,
+            ]
+        logger.info(
+            "Agent history over %d tokens: %s %d of %d messages",
+            max_tokens,
+            "summarised" if strategy == "summarize" else "dropped",
+            len(dropped),
+            len(messages),
+        )
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept]}
+
+    return bound_history
@@ -0,0 +1,484 @@
+"""Process-wide registry of pooled chat models used by the tools.
+
+Building a chat model per tool call means a new HTTP client (and TLS
+handshake) every time. The registry instead keeps one model per
+(provider, model name, temperature, API key, base URL), each with its own
+connection pool and a rate-limit-aware scheduler (see `scheduler.py`).
+
+Providers:
+  - openai:    OpenAI chat models (OPENAI_API_KEY)
+  - anthropic: Anthropic chat models (ANTHROPIC_API_KEY, needs
+               `langchain-anthropic`)
+  - local:     any OpenAI-compatible server at LLM_LOCAL_BASE_URL
+               (vLLM, llama.cpp, Ollama, ...)
+  - fake:      deterministic offline model (see `fake.py`)
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import weakref
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import anthropic
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+from langchain_openai import ChatOpenAI
+
+from ..config import Settings
+from ..graph_tracer import record_llm_call, record_llm_error, record_output_stop
+from .fake import FakeChatModel
+from .scheduler import LLMScheduler, RateLimits, retry_delay_s
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOOL_TEMPERATURE = 0.4
+
+PROVIDERS = ("openai", "anthropic", "local", "fake")
+
+# Transient upstream failures worth retrying (429s, 5xx, network/timeouts)
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    anthropic.RateLimitError,
+    anthropic.APIConnectionError,
+    anthropic.InternalServerError,
+)
+
+# Smoothing of the per-model latency average used for routing
+_LATENCY_EWMA_ALPHA = 0.2
+
+
+def estimate_prompt_tokens(messages: List[BaseMessage]) -> int:
+    """Rough token count (~4 characters per token) for TPM budgeting."""
+    return sum(len(str(message.content)) // 4 + 4 for message in messages)
+
+
+def message_token_usage(message: Any) -> Tuple[int, int]:
+    """(prompt_tokens, completion_tokens) from a response's usage metadata."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    metadata = getattr(message, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+def message_cached_tokens(message: Any) -> int:
+    """Prompt tokens served from the provider's prompt cache, if reported."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return (usage.get("input_token_details") or {}).get("cache_read", 0)
+    metadata = getattr(message, "response_metadata", None) or {}
+    details = (metadata.get("token_usage") or {}).get("prompt_tokens_details") or {}
+    return details.get("cached_tokens", 0) or 0
+
+
+def hit_max_tokens(message: Any) -> bool:
+    """Whether a response (or final stream chunk) was cut off by `max_tokens`."""
+    metadata = getattr(message, "response_metadata", None) or {}
+    # OpenAI reports finish_reason, Anthropic stop_reason
+    reason = metadata.get("finish_reason") or metadata.get("stop_reason")
+    return reason in ("length", "max_tokens")
+
+
+def parse_model_spec(spec: str) -> Tuple[str, str]:
+    """Split a `provider:model` spec (a bare name means OpenAI)."""
+    provider, sep, model = spec.strip().partition(":")
+    if not sep:
+        provider, model = "openai", provider
+    provider = provider.strip().lower()
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown model provider {provider!r} in {spec!r}")
+    return provider, model.strip()
+
+
+@dataclass(frozen=True)
+class ModelKey:
+    provider: str
+    model: str
+    temperature: float
+    api_key: str
+    base_url: str = ""
+
+    @property
+    def spec(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    def __repr__(self) -> str:
+        # Never leak the API key into logs
+        fingerprint = hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:8]
+        return (
+            f"ModelKey(spec={self.spec!r}, temperature={self.temperature!r}, "
+            f"api_key=sha256:{fingerprint}, base_url={self.base_url!r})"
+        )
+
+
+class ModelHandle:
+    """
+    A shared chat model plus the scheduler that admits requests for its key.
+
+    Async requests wait on the `LLMScheduler` (rate budgets, adaptive
+    concurrency, priority lanes); sync requests honour the concurrency cap
+    and a separate RPM/TPM budget of their own. Transient failures are
+    retried here (the SDK's own retries are disabled) and every request is
+    reported to the graph tracer with its latency, token usage and retry
+    count.
+
+    The handle also keeps the health stats the router selects on: a moving
+    average of request latency and the time of the last request that failed
+    upstream.
+    """
+
+    def __init__(
+        self,
+        key: ModelKey,
+        llm: BaseChatModel,
+        max_concurrency: int,
+        max_retries: int = 2,
+        limits: Optional[RateLimits] = None,
+    ):
+        self.key = key
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limits = limits or RateLimits()
+        self._sync_limit = threading.BoundedSemaphore(max_concurrency)
+        self._sync_budget = self.limits.build_sync_budget()
+        self._tokenizer_available = True
+        self.latency_ewma_s: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        # asyncio primitives are bound to one loop, so keep one per loop
+        self._schedulers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def scheduler(self) -> LLMScheduler:
+        """The scheduler for this key on the running event loop."""
+        loop = asyncio.get_running_loop()
+        scheduler = self._schedulers.get(loop)
+        if scheduler is None:
+            scheduler = self.limits.build_scheduler(
+                self.key.spec, self.max_concurrency
+            )
+            self._schedulers[loop] = scheduler
+        return scheduler
+
+    def count_tokens(self, messages: List[BaseMessage]) -> int:
+        """Prompt tokens of `messages`; estimated if no tokenizer is available."""
+        if self._tokenizer_available:
+            try:
+                return self.llm.get_num_tokens_from_messages(messages)
+            except Exception as exc:  # e.g. tiktoken cannot fetch its encoding
+                logger.warning("Tokenizer unavailable, estimating tokens: %s", exc)
+                self._tokenizer_available = False
+        return estimate_prompt_tokens(messages)
+
+    def _bound_llm(self, kwargs: Dict[str, Any]) -> Any:
+        """
+        The model for one call. `tools` (and `tool_choice`) are popped from
+        `kwargs` and bound by this model, so every model of a route formats
+        them for its own provider.
+        """
+        tools = kwargs.pop("tools", None)
+        tool_choice = kwargs.pop("tool_choice", None)
+        if not tools:
+            return self.llm
+        if tool_choice is None:
+            return self.llm.bind_tools(tools)
+        return self.llm.bind_tools(tools, tool_choice=tool_choice)
+
+    def _estimate_tokens(self, messages: List[BaseMessage], kwargs: Dict) -> int:
+        output = kwargs.get("max_tokens") or self.limits.expected_output_tokens
+        return estimate_prompt_tokens(messages) + output
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> float:
+        limits = self.limits
+        return retry_delay_s(attempt, exc, limits.retry_base_s, limits.retry_max_s)
+
+    def cooling_down(self, cooldown_s: float) -> bool:
+        """Whether a request failed upstream (after retries) within `cooldown_s`."""
+        failed_at = self.last_failure_at
+        return failed_at is not None and time.monotonic() - failed_at < cooldown_s
+
+    def _record_success(self, duration_s: float) -> None:
+        previous = self.latency_ewma_s
+        self.latency_ewma_s = (
+            duration_s
+            if previous is None
+            else previous + _LATENCY_EWMA_ALPHA * (duration_s - previous)
+        )
+
+    def _mark_failure(self, exc: Exception) -> None:
+        # Only upstream trouble (429, 5xx, network) puts the model in
+        # cooldown; a bad request (400, context length) says nothing about it
+        if isinstance(exc, _RETRYABLE_ERRORS):
+            self.last_failure_at = time.monotonic()
+
+    def _should_retry(self, exc: Exception, attempt: int) -> bool:
+        """Report a failed attempt and decide whether it is worth retrying."""
+        record_llm_error(exc, model=self.key.spec)
+        if isinstance(exc, _RETRYABLE_ERRORS) and attempt < self.max_retries:
+            return True
+        self._mark_failure(exc)
+        return False
+
+    def _record_call(
+        self,
+        started: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        retries: int,
+        cached_tokens: int,
+        truncated: bool = False,
+    ) -> None:
+        duration_s = time.perf_counter() - started
+        self._record_success(duration_s)
+        record_llm_call(
+            duration_s,
+            prompt_tokens,
+            completion_tokens,
+            retries=retries,
+            model=self.key.spec,
+            cached_tokens=cached_tokens,
+        )
+        if truncated:
+            record_output_stop("max_tokens", model=self.key.spec)
+
+    def invoke(self, messages: List[BaseMessage], **kwargs: Any) -> BaseMessage:
+        # Blocking calls get their own RPM/TPM budget (no lanes, no AIMD)
+        estimate = self._estimate_tokens(messages, kwargs)
+        llm = self._bound_llm(kwargs)
+        with self._sync_limit:
+            started = time.perf_counter()
+            attempt = 0
+            while True:
+                self._sync_budget.acquire(estimate)
+                try:
+                    response = llm.invoke(messages, **kwargs)
+                    self._sync_budget.adjust(
+                        sum(message_token_usage(response)), estimate
+                    )
+                    break
+                except Exception as exc:
+                    if not self._should_retry(exc, attempt):
+                        raise
+                    time.sleep(self._retry_delay(attempt, exc))
+                    attempt += 1
+        self._record_call(
+            started,
+            *message_token_usage(response),
+            attempt,
+            message_cached_tokens(response),
+            hit_max_tokens(response),
+        )
+        return response
+
+    async def ainvoke(self, messages: List[BaseMessage], **kwargs: Any) -> BaseMessage:
+        scheduler = self.scheduler()
+        estimate = self._estimate_tokens(messages, kwargs)
+        llm = self._bound_llm(kwargs)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            # The slot is released before backing off so others can proceed
+            async with scheduler.slot(estimate) as slot:
+                try:
+                    response = await llm.ainvoke(messages, **kwargs)
+                except Exception as exc:
+                    slot.failed(exc)
+                    if not self._should_retry(exc, attempt):
+                        raise
+                    delay = self._retry_delay(attempt, exc)
+                else:
+                    slot.succeeded(*message_token_usage(response))
+                    break
+            await asyncio.sleep(delay)
+            attempt += 1
+        self._record_call(
+            started,
+            *message_token_usage(response),
+            attempt,
+            message_cached_tokens(response),
+            hit_max_tokens(response),
+        )
+        return response
+
+    async def astream(
+        self, messages: List[BaseMessage], **kwargs: Any
+    ) -> AsyncIterator[BaseMessageChunk]:
+        # The scheduler slot is held for the whole streamed completion.
+        # A failed stream is only retried if nothing has been yielded yet.
+        # A consumer may stop reading early (closing this generator): the
+        # provider stream is closed and the call is recorded with the usage
+        # seen so far (estimated if the provider reports it only at the end).
+        scheduler = self.scheduler()
+        estimate = self._estimate_tokens(messages, kwargs)
+        llm = self._bound_llm(kwargs)
+        started = time.perf_counter()
+        attempt = 0
+        prompt_tokens = completion_tokens = cached_tokens = streamed_chars = 0
+        truncated = False
+        while True:
+            yielded = False
+            async with scheduler.slot(estimate) as slot:
+                try:
+                    async with aclosing(llm.astream(messages, **kwargs)) as stream:
+                        async for chunk in stream:
+                            slot.first_token()
+                            prompt, completion = message_token_usage(chunk)
+                            prompt_tokens += prompt
+                            completion_tokens += completion
+                            cached_tokens += message_cached_tokens(chunk)
+                            truncated = truncated or hit_max_tokens(chunk)
+                            streamed_chars += len(str(chunk.content))
+                            yielded = True
+                            yield chunk
+                except GeneratorExit:
+                    if not completion_tokens:
+                        prompt_tokens = estimate_prompt_tokens(messages)
+                        completion_tokens = streamed_chars // 4
+                    slot.succeeded(prompt_tokens, completion_tokens)
+                    self._record_call(
+                        started,
+                        prompt_tokens,
+                        completion_tokens,
+                        attempt,
+                        cached_tokens,
+                    )
+                    raise
+                except Exception as exc:
+                    slot.failed(exc)
+                    if yielded:
+                        # Partial output was already streamed: cannot retry
+                        record_llm_error(exc, model=self.key.spec)
+                        self._mark_failure(exc)
+                        raise
+                    if not self._should_retry(exc, attempt):
+                        raise
+                    delay = self._retry_delay(attempt, exc)
+                else:
+                    slot.succeeded(prompt_tokens, completion_tokens)
+                    break
+            await asyncio.sleep(delay)
+            attempt += 1
+        self._record_call(
+            started, prompt_tokens, completion_tokens, attempt, cached_tokens, truncated
+        )
+
+
+class ModelRegistry:
+    """Thread-safe cache of `ModelHandle`s keyed by `ModelKey`."""
+
+    def __init__(self) -> None:
+        self._handles: Dict[ModelKey, ModelHandle] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: ModelKey, settings: Settings) -> ModelHandle:
+        """
+        The handle for `key`, built on first use.
+
+        Pool sizes, retries and rate limits come from the settings of the
+        first caller; later callers share that handle.
+        """
+        handle = self._handles.get(key)
+        if handle is not None:
+            return handle
+
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                handle = ModelHandle(
+                    key,
+                    _build_chat_model(key, settings),
+                    settings.LLM_MAX_CONCURRENCY,
+                    settings.LLM_MAX_RETRIES,
+                    RateLimits.from_settings(settings),
+                )
+                self._handles[key] = handle
+                logger.info("Registered pooled chat model %r", key)
+        return handle
+
+    def clear(self) -> None:
+        with self._lock:
+            self._handles.clear()
+
+
+def _build_chat_model(key: ModelKey, settings: Settings) -> BaseChatModel:
+    """Create the chat model for `key`, with HTTP pools sized to the cap."""
+    if key.provider == "fake":
+        return FakeChatModel(
+            model_name=key.model, latency_s=settings.FAKE_LLM_LATENCY_S
+        )
+
+    max_concurrency = settings.LLM_MAX_CONCURRENCY
+    limits = httpx.Limits(
+        max_connections=max_concurrency,
+        max_keepalive_connections=max_concurrency,
+    )
+    if key.provider == "anthropic":
+        try:
+            from langchain_anthropic import ChatAnthropic
+        except ImportError as exc:  # optional backend
+            raise ImportError(
+                "The anthropic provider needs `pip install langchain-anthropic`"
+            ) from exc
+        return ChatAnthropic(
+            model=key.model,
+            temperature=key.temperature,
+            api_key=key.api_key or None,
+            max_retries=0,
+            stream_usage=True,
+        )
+
+    # openai, or an OpenAI-compatible local server
+    return ChatOpenAI(
+        model=key.model,
+        temperature=key.temperature,
+        api_key=key.api_key or None,
+        base_url=key.base_url or None,
+        # Retries are handled (and counted) by ModelHandle
+        max_retries=0,
+        # Report token usage on streamed completions too
+        stream_usage=True,
+        http_client=httpx.Client(limits=limits),
+        http_async_client=httpx.AsyncClient(limits=limits),
+    )
+
+
+# Global registry for the process
+model_registry = ModelRegistry()
+
+
+def model_key(
+    settings: Settings, spec: str, temperature: float = DEFAULT_TOOL_TEMPERATURE
+) -> ModelKey:
+    """The registry key for a `provider:model` spec under `settings`."""
+    provider, model = parse_model_spec(spec)
+    api_key, base_url = "", ""
+    if provider == "openai":
+        api_key = settings.OPENAI_API_KEY
+    elif provider == "anthropic":
+        api_key = settings.ANTHROPIC_API_KEY
+    elif provider == "local":
+        api_key = settings.LLM_LOCAL_API_KEY or "local"
+        base_url = settings.LLM_LOCAL_BASE_URL
+    return ModelKey(provider, model, temperature, api_key, base_url)
+
+
+def get_model(
+    settings: Settings,
+    spec: Optional[str] = None,
+    temperature: Optional[float] = None,
+) -> ModelHandle:
+    """Return the shared handle for a model spec (default: LLM_FAST_MODEL)."""
+    key = model_key(
+        settings,
+        spec or settings.LLM_FAST_MODEL,
+        DEFAULT_TOOL_TEMPERATURE if temperature is None else temperature,
+    )
+    return model_registry.get(key, settings)
@@ -0,0 +1,233 @@
+"""Versioned prompt templates for the pipeline tools.
+
+Every template lays a tool's messages out as a static prefix (the system
+message plus instructions that are byte-identical for every call) followed
+by the variable content, most widely shared first. Providers with automatic
+prompt caching (e.g. OpenAI, for prompts of 1024+ tokens) can then serve the
+prefix from cache across runs, which cuts input-token cost and time to first
+token; cache reads are reported as `cached_prompt_tokens` in run metrics.
+
+Bump a template's `version` whenever its text changes: the version is part of
+the response-cache keys, tool-call keys and step checkpoints.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: str
+    system: str
+    # Start of the user message, identical for every call
+    static: str
+    # Markers the output must start / end with; nothing after the end is kept
+    start_marker: str = ""
+    end_marker: str = ""
+    # Headings the output must contain, in this order
+    headings: Tuple[str, ...] = ()
+
+    def messages(self, variable: str) -> List[BaseMessage]:
+        """The system message, then the static prefix followed by `variable`."""
+        return [
+            SystemMessage(content=self.system),
+            HumanMessage(content=self.static + variable),
+        ]
+
+
+# v1 put the axis and unit before the instructions
+AXIS_UNIT_CONTEXT_TEMPLATE = PromptTemplate(
+    name="generate_axis_unit_context",
+    version="2",
+    system=(
+        "You are a senior strategy consultant. You write clear, structured "
+        "analytical briefs that can serve as a reusable context block for "
+        "further AI prompts, regardless of the domain."
+    ),
+    static=(
+        "You are given an axis of exploration and a unit of analysis, stated at "
+        "the end of this prompt.\n\n"
+        "Your task is to produce a self-contained, well-structured general "
+        "context block, following this logic:\n\n"
+        "-- START OF GENERAL CONTEXT --\n"
+        "🔹 AXIS — <axis name in title case>\n\n"
+        "Context of the axis\n"
+        "Explain what this axis focuses on in terms of transformations, "
+        "dynamics, behaviours, markets, technologies, or other relevant aspects "
+        "in the field defined by the axis.\n\n"
+        "Then, in bullet points, describe:\n"
+        "- key transformations / dynamics related to this axis\n"
+        "- typical opportunity zones (without listing specific business ideas)\n\n"
+        "🎯 Objective of the axis:\n"
+        "Summarise the strategic purpose of exploring this axis: what we are "
+        "trying to understand, anticipate or identify.\n\n"
+        "🧠 Analytical strategies:\n"
+        "List 1–3 analytical strategies or angles that are particularly relevant "
+        "for analysing this axis and the chosen unit of analysis.\n\n"
+        "Finally, clearly state the UNIT OF ANALYSIS with a short parenthetical "
+        "description of what is most important about it in this context.\n\n"
+        "The tone should be analytical, neutral and reusable in other prompts.\n"
+        "Return ONLY the formatted block including the boundary markers:\n"
+        "`-- START OF GENERAL CONTEXT --` and `-- END OF GENERAL CONTEXT --`.\n"
+    ),
+    start_marker="-- START OF GENERAL CONTEXT --",
+    end_marker="-- END OF GENERAL CONTEXT --",
+)
+
+# v1 interpolated the number of roles into the instructions
+IDEAL_ROLES_TEMPLATE = PromptTemplate(
+    name="generate_ideal_roles",
+    version="2",
+    system=(
+        "You are an expert in designing analytical workflows and role-based AI "
+        "collaboration. You decompose a field of analysis into complementary, "
+        "well-defined analytical roles."
+    ),
+    static=(
+        "At the end of this prompt there is a block of text which describes a "
+        "field of analysis, a strategic objective, a transformation area, or an "
+        "issue to be explored.\n\n"
+        "Relying solely on this content:\n\n"
+        "1. Infer the number of ideal roles given as NUMBER_OF_ROLES below that "
+        "an artificial intelligence should embody in order to provide rigorous, "
+        "cross-cutting analysis with very high added value.\n\n"
+        "Expected format: an opening to the prompt that can be directly used as "
+        "the first part of a prompt: it must begin with "
+        "‘You will embody the following roles to analyse <theme>:’ where you "
+        "infer the theme from the context.\n\n"
+        "Then simply list the roles, numbered, with **bold names** and one "
+        "concise sentence describing what is expected from each role.\n\n"
+        "Do NOT explain your reasoning. Do NOT add comments before or after. "
+        "Return only the final prompt opening.\n\n"
+    ),
+)
+
+# v1 opened with the roles prompt and inlined the variables in the rules
+ACTIONABLE_CONTEXT_TEMPLATE = PromptTemplate(
+    name="generate_actionable_context",
+    version="2",
+    system=(
+        "You are a neutral, rigorous strategy analyst. You produce structured, "
+        "traceable analytical briefs that can be reused for later ideation "
+        "without suggesting any concrete solutions."
+    ),
+    static="""You will embody the roles listed under 'ROLES' at the end of this prompt.
+
+You must produce a rigorous, cross-cutting and actionable analysis in order to identify
+viable commercial opportunities from the 'General context' below, and solely from this content.
+
+MISSION (Context only):  
+Produce a rigorous, neutral and actionable context brief based on the 'General context' below,
+and only on this content (unless [[EXTERNAL_RESEARCH]] = yes, see Rules).  
+⚠️ FORBIDDEN at this stage: proposing solutions, offers, business models, channels, MVPs,
+scorecards, GTM, or a shortlist of ideas.
+
+Variables: [[AXIS_OF_EXPLORATION]], [[UNIT_OF_ANALYSIS]], [[COUNTRY]],
+[[EXTERNAL_RESEARCH]], [[CONSTRAINTS]] and [[COMPLEX_UNITS]] are set under 'Variables'
+at the end of this prompt.
+
+Rigour principles (mandatory):  
+• Neutrality: no value judgements and no ideological narrative.  
+• Traceability: tag each relevant statement with [FAIT], [HYP] (minimal hypothesis),
+  [INT] (interpretation/implication).  
+• Parsimony: no external information beyond the General context; if [[EXTERNAL_RESEARCH]] = yes,
+  cite the source after the statement: [SOURCE: domain, short title].  
+• Explicit logic: make explicit ‘observation → mechanism → consequence → implication for (future) ideation’.  
+• Qualitative quantification: if there is no data, use ordinal scales (low/medium/high) + short justification.  
+• Replicability: stable, verifiable structure, ready to be reused by the ideation stage.
+
+Target length:  
+• By default: 300–500 words.  
+• If [[COMPLEX_UNITS]] = yes: 700–900 words and +1 table ‘Trend | Risk | Opportunity | Critical unknown’.
+
+Inclusion/exclusion rules:  
+• Include: facts, country constraints, actors, value chain, needs/JTBD, frictions, unknowns, metrics to monitor.  
+• Exclude: ideas, solution directions, evaluation, GTM, offer comparisons, MVP, pricing, business model.
+
+OUTPUT FORMAT (use exactly this structure and these headings):
+
+1. Neutral summary (≤ 8 lines)  
+    – Object of the unit, country scope, why the topic is non-trivial for (future) ideation. [INT]
+    
+2. Scope & definitions  
+    – Reformulation of the objective in 1–2 sentences. [INT]  
+    – Key terms/segments and units explicitly mentioned. [FAIT]
+    
+3. Facts & observable signals  
+    – List of elements explicitly present in the General context (trends, constraints, behaviours, internal figures if any). [FAIT]
+    
+4. Actors & value chain (table)  
+    • Actor/Segment  
+    • Role  
+    • Purchasing power/influence (L/M/H)  
+    • Incentives  
+    • Country/specific constraints  
+    (Tag each cell: [FAIT] if explicit, otherwise minimal [HYP])
+    
+5. Country environment & contextual constraints  
+    – Regulation, culture, language, infrastructures, seasonality, dominant channels (if present). [FAIT]  
+    – Critical unknowns if information is absent, formulated minimally. [HYP]
+    
+6. Needs-oriented segmentation (no solution)  
+    – Relevant segments (2–6).  
+    – For each segment: needs, constraints, ‘moments of truth’ / frictions. [INT] (+ [HYP] if needed)
+    
+7. Jobs-to-be-done (by segment)  
+    – 3–7 JTBD per segment: ‘When [situation], I want [motivation] so that [outcome].’ [INT]  
+    – Indicate the desired outcome (perceived success) and a plausible measurement proxy. [HYP] if missing.
+    
+8. Hypotheses & unknowns to clarify  
+    – Prioritised list of questions that will condition ideation (feasibility, distribution, acceptance, legality). [HYP]  
+    – For each: type of evidence required in the next phase (e.g. market data, interviews, purchase signals).
+    
+9. Indicators to monitor (leading metrics & proxies)  
+    – 5–10 indicators (e.g. problem frequency, average basket size, decision delay, cost of channel access).  
+    – For each indicator: Why it matters [INT] + How to observe it later [HYP].
+    
+10. Safeguards for the ideation stage (framing memory, no solutions)  
+    – Briefly recall the relevant constraints from the context (e.g. limited capital, speed of execution,
+      country/CV fit if provided). [INT]  
+    – Do not formulate any proposal: only the constraints to be respected later.
+    
+11. Annex – Traceability log  
+    – Complete list structured by tag: [FAIT] / [HYP] / [INT].  
+    – If [[EXTERNAL_RESEARCH]] = yes: add the SOURCE for each external fact.
+    
+
+Style constraints:  
+• Clear, concise, no storytelling and no superlatives.  
+• Define any technical term in 1 sentence if used.  
+• Never invent numerical data; if information is missing, formulate the minimal inference [HYP] and its impact.  
+• No solution suggestions, no ideas, no evaluation at this stage.
+
+""",
+    headings=(
+        "Neutral summary",
+        "Scope & definitions",
+        "Facts & observable signals",
+        "Actors & value chain",
+        "Country environment & contextual constraints",
+        "Needs-oriented segmentation",
+        "Jobs-to-be-done",
+        "Hypotheses & unknowns to clarify",
+        "Indicators to monitor",
+        "Safeguards for the ideation stage",
+        "Annex – Traceability log",
+    ),
+)
+
+TEMPLATES: Dict[str, PromptTemplate] = {
+    template.name: template
+    for template in (
+        AXIS_UNIT_CONTEXT_TEMPLATE,
+        IDEAL_ROLES_TEMPLATE,
+        ACTIONABLE_CONTEXT_TEMPLATE,
+    )
+}
+
+
+def template_versions() -> Dict[str, str]:
+    """Version of each tool's prompt template (recorded with run metrics)."""
+    return {name: template.version for name, template in TEMPLATES.items()}
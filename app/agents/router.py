@@ -0,0 +1,245 @@
+"""
+Model routing for the pipeline tools.
+
+Each tool is routed to a tier: the cheap, fast model for the short steps 1-2
+(general context, ideal roles) and the strong model for step 3 (the brief).
+A route is the tool's model followed by LLM_FALLBACK_MODELS; when a request
+fails after its own retries the next model is tried.
+
+Strategies:
+  - fallback: always try the configured order
+  - latency:  try the model with the lowest recent latency first
+
+In both, models whose last request failed upstream (429, 5xx, network; not
+a bad request) within LLM_FAILURE_COOLDOWN_S move to the back of the route
+until they cool down.
+"""
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from ..config import Settings
+from .models import ModelHandle, ModelKey, get_model
+
+logger = logging.getLogger(__name__)
+
+ROUTING_STRATEGIES = ("fallback", "latency")
+
+# Model tier of each tool
+TOOL_TIERS = {
+    "generate_axis_unit_context": "fast",
+    "generate_ideal_roles": "fast",
+    "generate_actionable_context": "strong",
+    # The ReAct coordinator of agent mode (see `base.py`)
+    "coordinator": "fast",
+}
+
+
+def _parse_tool_models(value: str) -> Dict[str, str]:
+    """Parse LLM_TOOL_MODELS ("tool=spec,tool=spec")."""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        tool, sep, spec = item.partition("=")
+        if not sep or tool.strip() not in TOOL_TIERS:
+            raise ValueError(f"Invalid LLM_TOOL_MODELS entry {item!r}")
+        overrides[tool.strip()] = spec.strip()
+    return overrides
+
+
+class RoutedModel:
+    """
+    A tool's route: its model plus fallbacks, with the same call interface
+    as `ModelHandle`.
+
+    `key` is the primary model's key, so cache and checkpoint identities do
+    not change when a fallback happens to serve a call.
+    """
+
+    def __init__(
+        self,
+        handles: Sequence[ModelHandle],
+        strategy: str = "fallback",
+        cooldown_s: float = 0.0,
+    ) -> None:
+        if not handles:
+            raise ValueError("A route needs at least one model")
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy {strategy!r}")
+        self.handles: Tuple[ModelHandle, ...] = tuple(handles)
+        self.strategy = strategy
+        self.cooldown_s = cooldown_s
+
+    @property
+    def key(self) -> ModelKey:
+        return self.handles[0].key
+
+    @property
+    def primary(self) -> ModelHandle:
+        return self.handles[0]
+
+    def candidates(self) -> List[ModelHandle]:
+        """Handles in the order they should be tried for the next call."""
+        ordered = list(self.handles)
+        if self.strategy == "latency":
+            # Unmeasured models sort first so they get measured
+            ordered.sort(
+                key=lambda handle: (
+                    handle.latency_ewma_s is not None,
+                    handle.latency_ewma_s or 0.0,
+                )
+            )
+        # Stable sort: healthy models first, each group keeps its order
+        ordered.sort(key=lambda handle: handle.cooling_down(self.cooldown_s))
+        return ordered
+
+    def _fallback(self, handle: ModelHandle, exc: Exception, last: bool) -> None:
+        if last:
+            return
+        logger.warning(
+            "Model %s failed (%s); falling back", handle.key.spec, type(exc).__name__
+        )
+
+    def count_tokens(self, messages: Sequence[BaseMessage]) -> int:
+        return self.primary.count_tokens(messages)
+
+    def invoke(self, messages: Sequence[BaseMessage], **kwargs: Any) -> BaseMessage:
+        candidates = self.candidates()
+        for index, handle in enumerate(candidates):
+            try:
+                return handle.invoke(messages, **kwargs)
+            except Exception as exc:
+                last = index == len(candidates) - 1
+                self._fallback(handle, exc, last)
+                if last:
+                    raise
+        raise AssertionError("unreachable")
+
+    async def ainvoke(
+        self, messages: Sequence[BaseMessage], **kwargs: Any
+    ) -> BaseMessage:
+        candidates = self.candidates()
+        for index, handle in enumerate(candidates):
+            try:
+                return await handle.ainvoke(messages, **kwargs)
+            except Exception as exc:
+                last = index == len(candidates) - 1
+                self._fallback(handle, exc, last)
+                if last:
+                    raise
+        raise AssertionError("unreachable")
+
+    async def astream(
+        self, messages: Sequence[BaseMessage], **kwargs: Any
+    ) -> AsyncIterator[BaseMessageChunk]:
+        """Stream from the first model that works; no fallback mid-stream."""
+        candidates = self.candidates()
+        for index, handle in enumerate(candidates):
+            yielded = False
+            try:
+                # Closing this stream early closes the model's stream too
+                async with aclosing(handle.astream(messages, **kwargs)) as stream:
+                    async for chunk in stream:
+                        yielded = True
+                        yield chunk
+                return
+            except Exception as exc:
+                last = index == len(candidates) - 1 or yielded
+                self._fallback(handle, exc, last)
+                if last:
+                    raise
+
+
+class RoutedChatModel(BaseChatModel):
+    """
+    A `RoutedModel` as a LangChain chat model, for graphs that need one (the
+    agent-mode coordinator). Calls go through the route, so they get its
+    fallbacks and each model's retries, scheduler and metrics.
+    """
+
+    route: Any  # RoutedModel
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.route.key.spec}
+
+    def bind_tools(
+        self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs
+    ):
+        # Bound per call by the model that serves it (see `ModelHandle`)
+        if tool_choice is not None:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=list(tools), **kwargs)
+
+    def get_num_tokens_from_messages(
+        self, messages: List[BaseMessage], tools: Optional[Sequence] = None
+    ) -> int:
+        return self.route.count_tokens(messages)
+
+    def _call_kwargs(self, stop: Optional[List[str]], kwargs: Dict) -> Dict:
+        return {**kwargs, "stop": stop} if stop is not None else kwargs
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self.route.invoke(messages, **self._call_kwargs(stop, kwargs))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = await self.route.ainvoke(
+            messages, **self._call_kwargs(stop, kwargs)
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class ModelRouter:
+    """Resolves each tool's `RoutedModel` from the (frozen) run settings."""
+
+    def __init__(self, settings: Settings) -> None:
+        if settings.LLM_ROUTING_STRATEGY not in ROUTING_STRATEGIES:
+            raise ValueError(
+                f"LLM_ROUTING_STRATEGY must be one of {ROUTING_STRATEGIES}"
+            )
+        tiers = {
+            "fast": settings.LLM_FAST_MODEL,
+            "strong": settings.LLM_STRONG_MODEL,
+        }
+        specs = {tool: tiers[tier] for tool, tier in TOOL_TIERS.items()}
+        specs.update(_parse_tool_models(settings.LLM_TOOL_MODELS))
+        fallbacks = [
+            spec.strip()
+            for spec in settings.LLM_FALLBACK_MODELS.split(",")
+            if spec.strip()
+        ]
+
+        self.specs = specs
+        self._routes: Dict[str, RoutedModel] = {}
+        for tool, spec in specs.items():
+            # The registry shares handles, so repeated models collapse here
+            route_specs = (spec, *fallbacks)
+            handles = dict.fromkeys(get_model(settings, s) for s in route_specs)
+            self._routes[tool] = RoutedModel(
+                list(handles),
+                settings.LLM_ROUTING_STRATEGY,
+                settings.LLM_FAILURE_COOLDOWN_S,
+            )
+
+    def route(self, tool_name: str) -> RoutedModel:
+        return self._routes[tool_name]
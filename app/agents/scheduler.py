@@ -0,0 +1,414 @@
+"""Client-side scheduling of LLM requests against upstream rate limits.
+
+Every async tool LLM call goes through an `LLMScheduler` (one per model key
+and event loop), which combines:
+
+- token buckets for requests/minute and tokens/minute (LLM_RPM_LIMIT,
+  LLM_TPM_LIMIT), so we stay under the provider quotas instead of
+  discovering them through 429s;
+- an AIMD concurrency limit: +1 slot per window of fast successes, halved
+  on a 429 and trimmed when latency (time to first token, for a stream)
+  exceeds LLM_LATENCY_TARGET_S;
+- priority lanes: waiting interactive requests are always admitted before
+  batch ones (see `priority_lane`), both to a concurrency slot and to the
+  rate budget;
+- jittered exponential retry delays that honour `Retry-After`.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional, Tuple
+
+from ..graph_tracer import record_llm_concurrency
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "llm_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+@contextmanager
+def priority_lane(priority: int) -> Iterator[None]:
+    """Run the LLM calls made in this context (and its tasks) in a lane."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+def retry_delay_s(
+    attempt: int,
+    error: Optional[BaseException] = None,
+    base_s: float = 1.0,
+    max_s: float = 30.0,
+) -> float:
+    """
+    Delay before retry number `attempt + 1`.
+
+    Uses "full jitter" exponential backoff, but never less than the
+    `Retry-After` the provider asked for on a 429.
+    """
+    delay = random.uniform(0, min(max_s, base_s * (2**attempt)))
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            delay = max(delay, min(max_s, float(retry_after)))
+        except ValueError:
+            pass
+    return delay
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute, up to one minute's worth."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_s = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(
+            self.capacity, self._level + (now - self._updated) * self.rate_per_s
+        )
+        self._updated = now
+
+    def wait_time_s(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill()
+        # Requests larger than the whole bucket wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self._level >= amount:
+            return 0.0
+        return (amount - self._level) / self.rate_per_s
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self._level -= amount
+
+    def adjust(self, amount: float) -> None:
+        """Correct a previous estimate (positive = more was used)."""
+        self._refill()
+        self._level = min(self.capacity, self._level - amount)
+
+
+class SyncRateBudget:
+    """
+    RPM/TPM budget for blocking (sync) calls, which run outside any event
+    loop. Thread-safe; waiting callers are admitted in arrival order.
+    """
+
+    def __init__(self, rpm_limit: int = 0, tpm_limit: int = 0):
+        self._rpm = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self._tpm = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self._lock = threading.Lock()
+
+    def acquire(self, estimated_tokens: int) -> None:
+        # Held while sleeping, so later callers queue behind this one
+        with self._lock:
+            while True:
+                wait = _budget_wait_s(self._rpm, self._tpm, estimated_tokens)
+                if wait <= 0:
+                    break
+                time.sleep(wait)
+            _take_budget(self._rpm, self._tpm, estimated_tokens)
+
+    def adjust(self, tokens_used: int, estimated_tokens: int) -> None:
+        if self._tpm is not None and tokens_used:
+            with self._lock:
+                self._tpm.adjust(tokens_used - estimated_tokens)
+
+
+def _budget_wait_s(
+    rpm: Optional[TokenBucket], tpm: Optional[TokenBucket], tokens: int
+) -> float:
+    wait = 0.0
+    if rpm is not None:
+        wait = max(wait, rpm.wait_time_s(1))
+    if tpm is not None:
+        wait = max(wait, tpm.wait_time_s(tokens))
+    return wait
+
+
+def _take_budget(
+    rpm: Optional[TokenBucket], tpm: Optional[TokenBucket], tokens: int
+) -> None:
+    if rpm is not None:
+        rpm.take(1)
+    if tpm is not None:
+        tpm.take(tokens)
+
+
+class _Slot:
+    """One admitted request; reports its outcome back to the scheduler."""
+
+    def __init__(self, scheduler: "LLMScheduler", priority: int, estimated_tokens: int):
+        self._scheduler = scheduler
+        self._priority = priority
+        self._estimated_tokens = estimated_tokens
+        self._started = 0.0
+        self._first_token_at: Optional[float] = None
+        self._outcome: Optional[Tuple[str, float, int]] = None
+
+    def first_token(self) -> None:
+        """
+        Mark a stream's first chunk: its latency is measured up to here, as
+        the length of a whole generation says nothing about upstream load.
+        """
+        if self._first_token_at is None:
+            self._first_token_at = time.perf_counter()
+
+    def succeeded(self, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        ended = self._first_token_at or time.perf_counter()
+        latency = ended - self._started
+        self._outcome = ("ok", latency, prompt_tokens + completion_tokens)
+
+    def failed(self, error: BaseException) -> None:
+        # OpenAI and Anthropic errors both carry the HTTP status
+        rate_limited = getattr(error, "status_code", None) == 429
+        kind = "rate_limited" if rate_limited else "error"
+        self._outcome = (kind, 0.0, 0)
+
+    async def __aenter__(self) -> "_Slot":
+        scheduler = self._scheduler
+        await scheduler._acquire_slot(self._priority)
+        try:
+            await scheduler._acquire_budget(self._priority, self._estimated_tokens)
+        except BaseException:
+            scheduler._release(None, 0)
+            raise
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._scheduler._release(self._outcome, self._estimated_tokens)
+
+
+class LLMScheduler:
+    """Admission control for one model key on one event loop."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+        latency_target_s: float = 0.0,
+        retry_base_s: float = 1.0,
+        retry_max_s: float = 30.0,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.latency_target_s = latency_target_s
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self._rpm = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self._tpm = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        # (priority, seq, future, estimated tokens), served head first
+        self._budget_waiters: List[Tuple[int, int, asyncio.Future, int]] = []
+        self._budget_timer: Optional[asyncio.TimerHandle] = None
+        self._seq = itertools.count()
+        record_llm_concurrency(name, self.max_concurrency)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def slot(self, estimated_tokens: int = 0, priority: Optional[int] = None) -> _Slot:
+        """
+        Wait for admission, then hold a concurrency slot.
+
+        Usage:
+            async with scheduler.slot(estimated_tokens) as slot:
+                response = await llm.ainvoke(...)
+                slot.succeeded(prompt_tokens, completion_tokens)
+
+        The priority defaults to the caller's `priority_lane`.
+        """
+        if priority is None:
+            priority = current_priority()
+        return _Slot(self, priority, estimated_tokens)
+
+    def retry_delay(self, attempt: int, error: Optional[BaseException]) -> float:
+        return retry_delay_s(attempt, error, self.retry_base_s, self.retry_max_s)
+
+    # -- concurrency (priority-ordered) ------------------------------------
+
+    async def _acquire_slot(self, priority: int) -> None:
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled: hand the slot back
+                self.in_flight -= 1
+                self._wake()
+            raise
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    # -- rate budgets (priority-ordered) ------------------------------------
+
+    async def _acquire_budget(self, priority: int, estimated_tokens: int) -> None:
+        if not self._budget_waiters and (
+            _budget_wait_s(self._rpm, self._tpm, estimated_tokens) <= 0
+        ):
+            _take_budget(self._rpm, self._tpm, estimated_tokens)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._budget_waiters,
+            (priority, next(self._seq), future, estimated_tokens),
+        )
+        # A new head (higher priority) may change how long to wait
+        self._serve_budget()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled: give the budget back
+                if self._rpm is not None:
+                    self._rpm.adjust(-1)
+                if self._tpm is not None:
+                    self._tpm.adjust(-estimated_tokens)
+                self._serve_budget()
+            raise
+
+    def _serve_budget(self) -> None:
+        """
+        Admit budget waiters in priority order while the budget allows,
+        then sleep until the head of the queue can be admitted. Lower
+        priority waiters never overtake the head, even if they would fit.
+        """
+        if self._budget_timer is not None:
+            self._budget_timer.cancel()
+            self._budget_timer = None
+        while self._budget_waiters:
+            _, _, future, tokens = self._budget_waiters[0]
+            if future.done():
+                heapq.heappop(self._budget_waiters)
+                continue
+            wait = _budget_wait_s(self._rpm, self._tpm, tokens)
+            if wait > 0:
+                loop = asyncio.get_running_loop()
+                self._budget_timer = loop.call_later(wait, self._serve_budget)
+                return
+            heapq.heappop(self._budget_waiters)
+            _take_budget(self._rpm, self._tpm, tokens)
+            future.set_result(None)
+
+    # -- AIMD feedback ------------------------------------------------------
+
+    def _release(
+        self, outcome: Optional[Tuple[str, float, int]], estimated_tokens: int
+    ) -> None:
+        self.in_flight -= 1
+        if outcome is not None:
+            kind, latency_s, tokens_used = outcome
+            if kind == "ok":
+                if self._tpm is not None and tokens_used:
+                    self._tpm.adjust(tokens_used - estimated_tokens)
+                if self.latency_target_s and latency_s > self.latency_target_s:
+                    self._decrease(0.9, f"latency {latency_s:.1f}s over target")
+                else:
+                    # Additive increase: about +1 slot per window of successes
+                    previous = int(self.limit)
+                    self.limit = min(
+                        float(self.max_concurrency), self.limit + 1.0 / self.limit
+                    )
+                    if int(self.limit) != previous:
+                        record_llm_concurrency(self.name, int(self.limit))
+            elif kind == "rate_limited":
+                self._decrease(0.5, "upstream 429")
+        self._wake()
+        if self._budget_waiters:
+            # A corrected TPM estimate may have freed budget
+            self._serve_budget()
+
+    def _decrease(self, factor: float, reason: str) -> None:
+        previous = int(self.limit)
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+        if int(self.limit) != previous:
+            record_llm_concurrency(self.name, int(self.limit))
+            logger.warning(
+                "LLM concurrency for %s reduced %d -> %d (%s)",
+                self.name,
+                previous,
+                int(self.limit),
+                reason,
+            )
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    """Scheduler configuration for one model key (see Settings)."""
+
+    rpm_limit: int = 0
+    tpm_limit: int = 0
+    min_concurrency: int = 1
+    latency_target_s: float = 0.0
+    retry_base_s: float = 1.0
+    retry_max_s: float = 30.0
+    expected_output_tokens: int = 1000
+
+    @classmethod
+    def from_settings(cls, settings: Any) -> "RateLimits":
+        return cls(
+            rpm_limit=settings.LLM_RPM_LIMIT,
+            tpm_limit=settings.LLM_TPM_LIMIT,
+            min_concurrency=settings.LLM_MIN_CONCURRENCY,
+            latency_target_s=settings.LLM_LATENCY_TARGET_S,
+            retry_base_s=settings.LLM_RETRY_BASE_DELAY_S,
+            retry_max_s=settings.LLM_RETRY_MAX_DELAY_S,
+            expected_output_tokens=settings.LLM_EXPECTED_OUTPUT_TOKENS,
+        )
+
+    def build_sync_budget(self) -> SyncRateBudget:
+        return SyncRateBudget(self.rpm_limit, self.tpm_limit)
+
+    def build_scheduler(self, name: str, max_concurrency: int) -> LLMScheduler:
+        return LLMScheduler(
+            name,
+            max_concurrency=max_concurrency,
+            min_concurrency=self.min_concurrency,
+            rpm_limit=self.rpm_limit,
+            tpm_limit=self.tpm_limit,
+            latency_target_s=self.latency_target_s,
+            retry_base_s=self.retry_base_s,
+            retry_max_s=self.retry_max_s,
+        )
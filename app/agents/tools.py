@@ -1,119 +1,240 @@
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+import logging
+import math
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
+from langchain_core.messages import BaseMessage
+
+from ..cache import make_cache_key
+from ..config import Settings
+from ..graph_tracer import record_output_stop
+from .context import RunContext, run_context_from_config
+from .models import hit_max_tokens
+from .prompts import (
+    ACTIONABLE_CONTEXT_TEMPLATE,
+    AXIS_UNIT_CONTEXT_TEMPLATE,
+    IDEAL_ROLES_TEMPLATE,
+    TEMPLATES,
+)
+from .validation import StepValidator, output_validator
+
+logger = logging.getLogger(__name__)
+
+# Callbacks of `agenerate_validated`: each delta; (attempt, errors) per retry
+DeltaCallback = Callable[[str], Awaitable[None]]
+RetryCallback = Callable[[int, List[str]], Awaitable[None]]
+
+# Settings each tool reads when building its prompt (part of its call identity)
+_TOOL_SETTINGS_FIELDS = {
+    "generate_axis_unit_context": (),
+    "generate_ideal_roles": (),
+    "generate_actionable_context": (
+        "AXIS_OF_EXPLORATION",
+        "UNIT_OF_ANALYSIS",
+        "COUNTRY",
+        "EXTERNAL_RESEARCH",
+        "CONSTRAINTS",
+        "COMPLEX_UNIT",
+    ),
+}
+
+# Upper end of each tool's output, in words. Step 3's "Target length" (300–500
+# words; 700–900 for complex units) counts the prose only: each of its
+# template's headings also carries scaffolding (heading line, tags, table rows,
+# the traceability annex), allowed ~60 words per section.
+# Steps 1-2 state no length, so theirs follow the structure they ask for.
+_STEP3_WORDS = 500
+_STEP3_COMPLEX_WORDS = 900
+_STEP3_WORDS_PER_SECTION = 60
+_STEP1_WORDS = 600
+# Step 2: the opening sentence, then one sentence per role
+_STEP2_OPENING_WORDS = 40
+_STEP2_WORDS_PER_ROLE = 40
+
+# Markdown-heavy English averages ~1.3-1.4 tokens per word
+_TOKENS_PER_WORD = 1.4
+
+
+def output_token_budget(
+    settings: Settings, tool_name: str, inputs: Dict[str, Any]
+) -> Optional[int]:
+    """
+    `max_tokens` for a tool's LLM call: its length target in tokens times
+    LLM_OUTPUT_BUDGET_HEADROOM, and at least LLM_MIN_OUTPUT_TOKENS (None when
+    the headroom is 0 = no limit).
+    """
+    headroom = settings.LLM_OUTPUT_BUDGET_HEADROOM
+    if headroom <= 0:
+        return None
+    if tool_name == ACTIONABLE_CONTEXT_TEMPLATE.name:
+        words = _STEP3_COMPLEX_WORDS if settings.COMPLEX_UNIT else _STEP3_WORDS
+        words += _STEP3_WORDS_PER_SECTION * len(ACTIONABLE_CONTEXT_TEMPLATE.headings)
+    elif tool_name == IDEAL_ROLES_TEMPLATE.name:
+        words = _STEP2_OPENING_WORDS + _STEP2_WORDS_PER_ROLE * int(inputs["n_roles"])
+    else:
+        words = _STEP1_WORDS
+    budget = math.ceil(words * _TOKENS_PER_WORD * headroom)
+    return max(budget, settings.LLM_MIN_OUTPUT_TOKENS)
+
+
+def _model_kwargs(
+    settings: Settings, tool_name: str, inputs: Dict[str, Any], budget_scale: int = 1
+) -> Dict[str, Any]:
+    budget = output_token_budget(settings, tool_name, inputs)
+    return {"max_tokens": budget * budget_scale} if budget else {}
+
+
+def _end_marker(settings: Settings, tool_name: str) -> str:
+    """The marker the tool's output is cut at ("" if none or disabled)."""
+    if not settings.LLM_STOP_AT_END_MARKER:
+        return ""
+    return TEMPLATES[tool_name].end_marker
+
+
+def _cut_at_marker(text: str, marker: str) -> str:
+    """`text` up to and including the first `marker` (unchanged without one)."""
+    index = text.find(marker) if marker else -1
+    return text if index < 0 else text[: index + len(marker)]
+
+
+# Each builder appends the call's variable content to the template's static
+# prefix (see `prompts.py`), most widely shared content first.
+
+
+def _axis_unit_context_messages(
+    settings: Settings, axis: str, unit: str
+) -> List[BaseMessage]:
+    """Build the chat messages for step 1 (general context)."""
+    return AXIS_UNIT_CONTEXT_TEMPLATE.messages(
+        f"\nAXIS_OF_EXPLORATION: {axis}\nUNIT_OF_ANALYSIS: {unit}\n"
+    )
 
-from ..config import load_settings
 
+def axis_unit_context_cache_key(context: RunContext, axis: str, unit: str) -> str:
+    """Response-cache key for a step 1 call with the run's step 1 model."""
+    key = context.model_for(AXIS_UNIT_CONTEXT_TEMPLATE.name).key
+    return make_cache_key(
+        model=key.spec,
+        temperature=key.temperature,
+        template=AXIS_UNIT_CONTEXT_TEMPLATE.name,
+        template_version=AXIS_UNIT_CONTEXT_TEMPLATE.version,
+        inputs={"axis": axis, "unit": unit},
+    )
+
+
+def _ideal_roles_messages(
+    settings: Settings, context: str, n_roles: int
+) -> List[BaseMessage]:
+    """Build the chat messages for step 2 (ideal roles prompt opening)."""
+    return IDEAL_ROLES_TEMPLATE.messages(
+        f"NUMBER_OF_ROLES: {n_roles}\n\n"
+        "--START OF TEXT BLOCK--\n"
+        f"{context}\n"
+        "--END OF TEXT BLOCK--"
+    )
 
-def _build_llm() -> ChatOpenAI:
-    """Local helper to create a small, fast chat model for tools."""
-    settings = load_settings()
-    model_name = "gpt-4.1-mini"
-    return ChatOpenAI(
-        model=model_name,
-        temperature=0.4,
-        api_key=settings.OPENAI_API_KEY or None,
+
+def _actionable_context_general_section(general_context: str) -> str:
+    # If the general_context already includes the boundary markers, reuse as is.
+    start = AXIS_UNIT_CONTEXT_TEMPLATE.start_marker
+    if start in general_context:
+        prompt_general = general_context
+    else:
+        end = AXIS_UNIT_CONTEXT_TEMPLATE.end_marker
+        prompt_general = f"{start}\n{general_context}\n{end}"
+    return (
+        "PROMPT BLOCK 4 – General context to use strictly as the base:\n\n"
+        f"{prompt_general}\n\n"
     )
 
 
-@tool
-def generate_axis_unit_context(axis: str, unit: str) -> str:
+def _actionable_context_messages(
+    settings: Settings, roles_prompt: str, general_context: str
+) -> List[BaseMessage]:
     """
-    Generate a structured analytical general context for a given axis + unit.
+    Build the chat messages for step 3 (actionable context brief).
 
-    The axis and unit are fully generic and can describe any field of analysis.
+    After the static rules come the general context (shared by every run on
+    the same AXIS × UNIT), then the roles, then the per-run variables.
     """
-    llm = _build_llm()
+    external_flag = "yes" if settings.EXTERNAL_RESEARCH else "no"
+    complex_flag = "yes" if settings.COMPLEX_UNIT else "no"
+    axis = settings.AXIS_OF_EXPLORATION
+    unit = settings.UNIT_OF_ANALYSIS
+    country = settings.COUNTRY
+    constraints = settings.CONSTRAINTS or "none specified"
 
-    system = SystemMessage(
-        content=(
-            "You are a senior strategy consultant. You write clear, structured "
-            "analytical briefs that can serve as a reusable context block for "
-            "further AI prompts, regardless of the domain."
-        )
-    )
+    variables = f"""ROLES:
+{roles_prompt}
 
-    user = HumanMessage(
-        content=(
-            "You are given an axis of exploration and a unit of analysis.\n\n"
-            f"AXIS_OF_EXPLORATION: {axis}\n"
-            f"UNIT_OF_ANALYSIS: {unit}\n\n"
-            "Your task is to produce a self-contained, well-structured general "
-            "context block, following this logic:\n\n"
-            "-- START OF GENERAL CONTEXT --\n"
-            "🔹 AXIS — <axis name in title case>\n\n"
-            "Context of the axis\n"
-            "Explain what this axis focuses on in terms of transformations, "
-            "dynamics, behaviours, markets, technologies, or other relevant aspects "
-            "in the field defined by the axis.\n\n"
-            "Then, in bullet points, describe:\n"
-            "- key transformations / dynamics related to this axis\n"
-            "- typical opportunity zones (without listing specific business ideas)\n\n"
-            "🎯 Objective of the axis:\n"
-            "Summarise the strategic purpose of exploring this axis: what we are "
-            "trying to understand, anticipate or identify.\n\n"
-            "🧠 Analytical strategies:\n"
-            "List 1–3 analytical strategies or angles that are particularly relevant "
-            "for analysing this axis and the chosen unit of analysis.\n\n"
-            "Finally, clearly state the UNIT OF ANALYSIS with a short parenthetical "
-            "description of what is most important about it in this context.\n\n"
-            "The tone should be analytical, neutral and reusable in other prompts.\n"
-            "Return ONLY the formatted block including the boundary markers:\n"
-            "`-- START OF GENERAL CONTEXT --` and `-- END OF GENERAL CONTEXT --`.\n"
-        )
+Variables:  
+• [[AXIS_OF_EXPLORATION]] = {axis}
+• [[UNIT_OF_ANALYSIS]] = {unit}
+• [[COUNTRY]] = {country}
+• [[EXTERNAL_RESEARCH]] = {external_flag} (default: no)  
+• [[CONSTRAINTS]] = {constraints}
+• [[COMPLEX_UNITS]] = {complex_flag} (default: no) → adjust the length
+"""
+    return ACTIONABLE_CONTEXT_TEMPLATE.messages(
+        _actionable_context_general_section(general_context) + variables
     )
 
-    response = llm.invoke([system, user])
-    return response.content
+
+# ---------------------------------------------------------------------------
+# Tool implementations
+#
+# Each tool exposes both a sync (`invoke`) and a native async (`ainvoke`)
+# implementation, so the async pipeline never blocks the event loop on I/O.
+# The run's settings and model come from the RunContext passed in
+# `config["configurable"]["run_context"]` (see `RunContext.as_config`);
+# without one, the process-wide default context is used.
+# ---------------------------------------------------------------------------
 
 
-@tool
-def generate_ideal_roles(context: str, n_roles: int) -> str:
+def _generate_axis_unit_context(axis: str, unit: str, config: RunnableConfig) -> str:
+    """
+    Generate a structured analytical general context for a given axis + unit.
+
+    The axis and unit are fully generic and can describe any field of analysis.
+    """
+    ctx = run_context_from_config(config)
+    return _complete(ctx, AXIS_UNIT_CONTEXT_TEMPLATE.name, {"axis": axis, "unit": unit})
+
+
+async def _agenerate_axis_unit_context(
+    axis: str, unit: str, config: RunnableConfig
+) -> str:
+    ctx = run_context_from_config(config)
+    inputs = {"axis": axis, "unit": unit}
+    return await _acomplete(ctx, AXIS_UNIT_CONTEXT_TEMPLATE.name, inputs)
+
+
+def _generate_ideal_roles(context: str, n_roles: int, config: RunnableConfig) -> str:
     """
     From a general context text block, infer the ideal roles an AI should embody
     to analyse this field with high added value.
 
     This is fully generic and applies to any axis / unit combination.
     """
-    llm = _build_llm()
+    ctx = run_context_from_config(config)
+    inputs = {"context": context, "n_roles": n_roles}
+    return _complete(ctx, IDEAL_ROLES_TEMPLATE.name, inputs)
 
-    system = SystemMessage(
-        content=(
-            "You are an expert in designing analytical workflows and role-based AI "
-            "collaboration. You decompose a field of analysis into complementary, "
-            "well-defined analytical roles."
-        )
-    )
 
-    user = HumanMessage(
-        content=(
-            "At the end of this prompt there is a block of text which describes a "
-            "field of analysis, a strategic objective, a transformation area, or an "
-            "issue to be explored.\n\n"
-            "Relying solely on this content:\n\n"
-            f"1. Infer {n_roles} ideal roles that an artificial intelligence should "
-            "embody in order to provide rigorous, cross-cutting analysis with very "
-            "high added value.\n\n"
-            "Expected format: an opening to the prompt that can be directly used as "
-            "the first part of a prompt: it must begin with "
-            "‘You will embody the following roles to analyse <theme>:’ where you "
-            "infer the theme from the context.\n\n"
-            "Then simply list the roles, numbered, with **bold names** and one "
-            "concise sentence describing what is expected from each role.\n\n"
-            "Do NOT explain your reasoning. Do NOT add comments before or after. "
-            "Return only the final prompt opening.\n\n"
-            "--START OF TEXT BLOCK--\n"
-            f"{context}\n"
-            "--END OF TEXT BLOCK--"
-        )
-    )
-
-    response = llm.invoke([system, user])
-    return response.content
+async def _agenerate_ideal_roles(
+    context: str, n_roles: int, config: RunnableConfig
+) -> str:
+    ctx = run_context_from_config(config)
+    inputs = {"context": context, "n_roles": n_roles}
+    return await _acomplete(ctx, IDEAL_ROLES_TEMPLATE.name, inputs)
 
 
-@tool
-def generate_actionable_context(roles_prompt: str, general_context: str) -> str:
+def _generate_actionable_context(
+    roles_prompt: str, general_context: str, config: RunnableConfig
+) -> str:
     """
     From the roles prompt opening (step 2) and the general context (step 1),
     produce a rigorous, cross-cutting and actionable analytical context brief.
@@ -122,137 +243,287 @@ def generate_actionable_context(roles_prompt: str, general_context: str) -> str:
     in the internal instructions, and use only the provided context plus
     the configured variables (axis, unit, country, constraints, etc.).
     """
-    settings = load_settings()
-    llm = _build_llm()
+    ctx = run_context_from_config(config)
+    inputs = {"roles_prompt": roles_prompt, "general_context": general_context}
+    return _complete(ctx, ACTIONABLE_CONTEXT_TEMPLATE.name, inputs)
 
-    axis = settings.AXIS_OF_EXPLORATION
-    unit = settings.UNIT_OF_ANALYSIS
-    country = settings.COUNTRY
-    external_research = settings.EXTERNAL_RESEARCH
-    constraints = settings.CONSTRAINTS or "none specified"
-    complex_unit = settings.COMPLEX_UNIT
 
-    external_flag = "yes" if external_research else "no"
-    complex_flag = "yes" if complex_unit else "no"
+async def _agenerate_actionable_context(
+    roles_prompt: str, general_context: str, config: RunnableConfig
+) -> str:
+    ctx = run_context_from_config(config)
+    inputs = {"roles_prompt": roles_prompt, "general_context": general_context}
+    return await _acomplete(ctx, ACTIONABLE_CONTEXT_TEMPLATE.name, inputs)
 
-    # If the general_context already includes the boundary markers, reuse as is.
-    if "-- START OF GENERAL CONTEXT --" in general_context:
-        prompt_general = general_context
-    else:
-        prompt_general = (
-            "-- START OF GENERAL CONTEXT --\n"
-            f"{general_context}\n"
-            "-- END OF GENERAL CONTEXT --"
-        )
 
-    system = SystemMessage(
-        content=(
-            "You are a neutral, rigorous strategy analyst. You produce structured, "
-            "traceable analytical briefs that can be reused for later ideation "
-            "without suggesting any concrete solutions."
-        )
+generate_axis_unit_context = StructuredTool.from_function(
+    func=_generate_axis_unit_context,
+    coroutine=_agenerate_axis_unit_context,
+    name="generate_axis_unit_context",
+)
+
+generate_ideal_roles = StructuredTool.from_function(
+    func=_generate_ideal_roles,
+    coroutine=_agenerate_ideal_roles,
+    name="generate_ideal_roles",
+)
+
+generate_actionable_context = StructuredTool.from_function(
+    func=_generate_actionable_context,
+    coroutine=_agenerate_actionable_context,
+    name="generate_actionable_context",
+)
+
+
+_MESSAGE_BUILDERS = {
+    "generate_axis_unit_context": _axis_unit_context_messages,
+    "generate_ideal_roles": _ideal_roles_messages,
+    "generate_actionable_context": _actionable_context_messages,
+}
+
+
+def tool_call_key(context: RunContext, tool_name: str, inputs: Dict[str, Any]) -> str:
+    """
+    Identity of a tool's LLM call: model, temperature, tool, prompt template
+    version, inputs and the run settings the tool's prompt depends on.
+    """
+    key = context.model_for(tool_name).key
+    used_settings = {
+        field: getattr(context.settings, field)
+        for field in _TOOL_SETTINGS_FIELDS[tool_name]
+    }
+    return make_cache_key(
+        model=key.spec,
+        temperature=key.temperature,
+        template=tool_name,
+        template_version=TEMPLATES[tool_name].version,
+        inputs={**inputs, **used_settings},
     )
 
-    user_text = f"""
-{roles_prompt}
 
-You must produce a rigorous, cross-cutting and actionable analysis in order to identify
-viable commercial opportunities from the 'General context' below, and solely from this content.
+@dataclass
+class _Generation:
+    """One attempt at a tool's output: its budget multiplier and outcome."""
 
-MISSION (Context only):  
-Produce a rigorous, neutral and actionable context brief based on the 'General context' below,
-and only on this content (unless [[EXTERNAL_RESEARCH]] = yes, see Rules).  
-⚠️ FORBIDDEN at this stage: proposing solutions, offers, business models, channels, MVPs,
-scorecards, GTM, or a shortlist of ideas.
+    budget_scale: int = 1
+    # The provider stopped it at max_tokens
+    truncated: bool = False
 
-Variables:  
-• [[AXIS_OF_EXPLORATION]] = {axis}
-• [[UNIT_OF_ANALYSIS]] = {unit}
-• [[COUNTRY]] = {country}
-• [[EXTERNAL_RESEARCH]] = {external_flag} (default: no)  
-• [[CONSTRAINTS]] = {constraints}
-• [[COMPLEX_UNITS]] = {complex_flag} (default: no) → adjust the length
 
-Rigour principles (mandatory):  
-• Neutrality: no value judgements and no ideological narrative.  
-• Traceability: tag each relevant statement with [FAIT], [HYP] (minimal hypothesis),
-  [INT] (interpretation/implication).  
-• Parsimony: no external information beyond the General context; if [[EXTERNAL_RESEARCH]] = yes,
-  cite the source after the statement: [SOURCE: domain, short title].  
-• Explicit logic: make explicit ‘observation → mechanism → consequence → implication for (future) ideation’.  
-• Qualitative quantification: if there is no data, use ordinal scales (low/medium/high) + short justification.  
-• Replicability: stable, verifiable structure, ready to be reused by the ideation stage.
-
-Target length:  
-• By default: 300–500 words.  
-• If [[COMPLEX_UNITS]] = yes: 700–900 words and +1 table ‘Trend | Risk | Opportunity | Critical unknown’.
-
-Inclusion/exclusion rules:  
-• Include: facts, country constraints, actors, value chain, needs/JTBD, frictions, unknowns, metrics to monitor.  
-• Exclude: ideas, solution directions, evaluation, GTM, offer comparisons, MVP, pricing, business model.
-
-OUTPUT FORMAT (use exactly this structure and these headings):
-
-1. Neutral summary (≤ 8 lines)  
-    – Object of the unit, country scope, why the topic is non-trivial for (future) ideation. [INT]
-    
-2. Scope & definitions  
-    – Reformulation of the objective in 1–2 sentences. [INT]  
-    – Key terms/segments and units explicitly mentioned. [FAIT]
-    
-3. Facts & observable signals  
-    – List of elements explicitly present in the General context (trends, constraints, behaviours, internal figures if any). [FAIT]
-    
-4. Actors & value chain (table)  
-    • Actor/Segment  
-    • Role  
-    • Purchasing power/influence (L/M/H)  
-    • Incentives  
-    • Country/specific constraints  
-    (Tag each cell: [FAIT] if explicit, otherwise minimal [HYP])
-    
-5. Country environment & contextual constraints  
-    – Regulation, culture, language, infrastructures, seasonality, dominant channels (if present). [FAIT]  
-    – Critical unknowns if information is absent, formulated minimally. [HYP]
-    
-6. Needs-oriented segmentation (no solution)  
-    – Relevant segments (2–6).  
-    – For each segment: needs, constraints, ‘moments of truth’ / frictions. [INT] (+ [HYP] if needed)
-    
-7. Jobs-to-be-done (by segment)  
-    – 3–7 JTBD per segment: ‘When [situation], I want [motivation] so that [outcome].’ [INT]  
-    – Indicate the desired outcome (perceived success) and a plausible measurement proxy. [HYP] if missing.
-    
-8. Hypotheses & unknowns to clarify  
-    – Prioritised list of questions that will condition ideation (feasibility, distribution, acceptance, legality). [HYP]  
-    – For each: type of evidence required in the next phase (e.g. market data, interviews, purchase signals).
-    
-9. Indicators to monitor (leading metrics & proxies)  
-    – 5–10 indicators (e.g. problem frequency, average basket size, decision delay, cost of channel access).  
-    – For each indicator: Why it matters [INT] + How to observe it later [HYP].
-    
-10. Safeguards for the ideation stage (framing memory, no solutions)  
-    – Briefly recall the relevant constraints from the context (e.g. limited capital, speed of execution,
-      country/CV fit if provided). [INT]  
-    – Do not formulate any proposal: only the constraints to be respected later.
-    
-11. Annex – Traceability log  
-    – Complete list structured by tag: [FAIT] / [HYP] / [INT].  
-    – If [[EXTERNAL_RESEARCH]] = yes: add the SOURCE for each external fact.
-    
-
-Style constraints:  
-• Clear, concise, no storytelling and no superlatives.  
-• Define any technical term in 1 sentence if used.  
-• Never invent numerical data; if information is missing, formulate the minimal inference [HYP] and its impact.  
-• No solution suggestions, no ideas, no evaluation at this stage.
-
-PROMPT BLOCK 4 – General context to use strictly as the base:
-
-{prompt_general}
-"""
+async def astream_tool(
+    context: RunContext, tool_name: str, inputs: Dict[str, Any]
+) -> AsyncIterator[str]:
+    """
+    Stream the text of a tool's LLM call as it is generated.
+
+    Uses exactly the same prompt and token budget as the tool's `invoke` /
+    `ainvoke`, so the concatenated deltas equal the tool's return value.
+    For a template with an end marker, the stream is closed (and the
+    provider stops generating) as soon as the marker has been produced.
+    """
+    generation = _astream(context, tool_name, inputs, _Generation())
+    async with aclosing(generation) as stream:
+        async for delta in stream:
+            yield delta
+
+
+async def _astream(
+    context: RunContext,
+    tool_name: str,
+    inputs: Dict[str, Any],
+    generation: _Generation,
+) -> AsyncIterator[str]:
+    settings = context.settings
+    messages = _MESSAGE_BUILDERS[tool_name](settings, **inputs)
+    model = context.model_for(tool_name)
+    marker = _end_marker(settings, tool_name)
+    kwargs = _model_kwargs(settings, tool_name, inputs, generation.budget_scale)
+    text = ""
+    async with aclosing(model.astream(messages, **kwargs)) as stream:
+        async for chunk in stream:
+            generation.truncated = generation.truncated or hit_max_tokens(chunk)
+            if not chunk.content:
+                continue
+            delta = str(chunk.content)
+            # The marker may straddle two deltas
+            start = max(0, len(text) - len(marker))
+            text += delta
+            index = text.find(marker, start) if marker else -1
+            if index < 0:
+                yield delta
+                continue
+            yield delta[: len(delta) - (len(text) - index - len(marker))]
+            record_output_stop("boundary", model=model.key.spec)
+            return
+
+
+def _validator(
+    context: RunContext, tool_name: str, inputs: Dict[str, Any], attempt: int
+) -> Optional[StepValidator]:
+    """The validator of an attempt that may still be retried, else None."""
+    if attempt >= context.settings.STEP_VALIDATION_RETRIES:
+        return None
+    n_roles = int(inputs.get("n_roles", context.settings.IDEAL_ROLES))
+    return output_validator(tool_name, n_roles)
+
+
+def _retry_scale(
+    context: RunContext,
+    tool_name: str,
+    inputs: Dict[str, Any],
+    generation: _Generation,
+) -> Optional[int]:
+    """
+    Budget multiplier for regenerating a rejected attempt, or None when a
+    retry cannot help: an output cut off by the provider's own limit.
+    """
+    if not generation.truncated:
+        return generation.budget_scale
+    if output_token_budget(context.settings, tool_name, inputs) is None:
+        return None
+    # Cut off by our budget: the same budget would cut it off again
+    return generation.budget_scale * 2
+
+
+def _rejected(
+    context: RunContext,
+    tool_name: str,
+    attempt: int,
+    errors: List[str],
+    budget_scale: int,
+) -> None:
+    record_output_stop("invalid", model=context.model_for(tool_name).key.spec)
+    logger.warning(
+        "`%s` output rejected (attempt %d), regenerating%s: %s",
+        tool_name,
+        attempt,
+        f" with {budget_scale}x its token budget" if budget_scale > 1 else "",
+        "; ".join(errors),
+    )
 
-    user = HumanMessage(content=user_text)
 
-    response = llm.invoke([system, user])
+async def agenerate_validated(
+    context: RunContext,
+    tool_name: str,
+    inputs: Dict[str, Any],
+    on_delta: Optional[DeltaCallback] = None,
+    on_retry: Optional[RetryCallback] = None,
+) -> str:
+    """
+    A tool's output, streamed and validated as it is generated.
+
+    A generation its validator rejects (mid-stream as soon as an error is
+    certain, or once complete) is abandoned and regenerated, up to
+    STEP_VALIDATION_RETRIES times. An attempt cut off by its `max_tokens`
+    budget is retried with twice the budget, since the same budget would cut
+    it off again; one cut off by the provider's own limit is not retried.
+    `on_retry(attempt, errors)` is awaited before each new attempt, so
+    deltas already passed to `on_delta` can be discarded. The last attempt
+    is returned as is, valid or not.
+    """
+    attempt = 0
+    generation = _Generation()
+    while True:
+        validator = _validator(context, tool_name, inputs, attempt)
+        parts: List[str] = []
+        errors: List[str] = []
+        stream_generation = _astream(context, tool_name, inputs, generation)
+        async with aclosing(stream_generation) as stream:
+            async for delta in stream:
+                parts.append(delta)
+                if on_delta is not None:
+                    await on_delta(delta)
+                if validator is not None:
+                    errors = validator.feed(delta)
+                    if errors:
+                        break
+        output = "".join(parts)
+        if validator is not None and not errors:
+            errors = validator.errors(output)
+        scale = _retry_scale(context, tool_name, inputs, generation)
+        if not errors or scale is None:
+            return output
+        attempt += 1
+        generation = _Generation(budget_scale=scale)
+        _rejected(context, tool_name, attempt, errors, scale)
+        if on_retry is not None:
+            await on_retry(attempt, errors)
+
+
+def _complete(context: RunContext, tool_name: str, inputs: Dict[str, Any]) -> str:
+    """
+    A tool's LLM call (sync): budgeted, cut after its end marker, and
+    regenerated while its validator rejects it (see `agenerate_validated`).
+    """
+    settings = context.settings
+    messages = _MESSAGE_BUILDERS[tool_name](settings, **inputs)
+    attempt = 0
+    generation = _Generation()
+    while True:
+        response = context.model_for(tool_name).invoke(
+            messages,
+            **_model_kwargs(settings, tool_name, inputs, generation.budget_scale),
+        )
+        generation.truncated = hit_max_tokens(response)
+        output = _cut_at_marker(response.content, _end_marker(settings, tool_name))
+        validator = _validator(context, tool_name, inputs, attempt)
+        errors = validator.errors(output) if validator is not None else []
+        scale = _retry_scale(context, tool_name, inputs, generation)
+        if not errors or scale is None:
+            return output
+        attempt += 1
+        generation = _Generation(budget_scale=scale)
+        _rejected(context, tool_name, attempt, errors, scale)
+
+
+async def _acomplete(
+    context: RunContext, tool_name: str, inputs: Dict[str, Any]
+) -> str:
+    """
+    A tool's LLM call, budgeted with `max_tokens`. Streamed when its output
+    is validated (or its template has an end marker), so a bad generation
+    is dropped early and generation stops right after the marker.
+    """
+    settings = context.settings
+    if settings.STEP_VALIDATION_RETRIES > 0 or _end_marker(settings, tool_name):
+        return await agenerate_validated(context, tool_name, inputs)
+    messages = _MESSAGE_BUILDERS[tool_name](settings, **inputs)
+    response = await context.model_for(tool_name).ainvoke(
+        messages, **_model_kwargs(settings, tool_name, inputs)
+    )
     return response.content
+
+
+def _actionable_context_prefix_messages(
+    settings: Settings, general_context: str
+) -> List[BaseMessage]:
+    """Step 3's messages up to (and including) the general context."""
+    return ACTIONABLE_CONTEXT_TEMPLATE.messages(
+        _actionable_context_general_section(general_context)
+    )
+
+
+def prepare_actionable_context(context: RunContext, general_context: str) -> int:
+    """
+    Assemble the step 2-independent prefix of step 3's prompt (static rules
+    and the general context) ahead of time.
+
+    Returns its prompt token count. Blocking (tokenization), so run it in a
+    thread while step 2 is in flight.
+    """
+    messages = _actionable_context_prefix_messages(context.settings, general_context)
+    model = context.model_for(ACTIONABLE_CONTEXT_TEMPLATE.name)
+    return model.count_tokens(messages)
+
+
+async def warm_actionable_context_cache(
+    context: RunContext, general_context: str
+) -> None:
+    """
+    Send step 3's prompt prefix with a 1-token completion, so providers with
+    automatic prompt caching have it cached by the time step 3 is sent.
+    """
+    messages = _actionable_context_prefix_messages(context.settings, general_context)
+    # Only the primary model: a fallback would not serve step 3 from cache
+    model = context.model_for(ACTIONABLE_CONTEXT_TEMPLATE.name).primary
+    await model.ainvoke(messages, max_tokens=1)
@@ -0,0 +1,201 @@
+"""Structural validators for the pipeline tools' outputs.
+
+Later steps rely on the shape of earlier outputs: step 1's block sits between
+its boundary markers, step 2 lists exactly NUMBER_OF_ROLES numbered roles and
+step 3 uses the brief's 11 headings in order. A validator checks a complete
+output, and can also be fed a streamed output delta by delta: it re-checks on
+every complete line and reports errors as soon as they are certain, so a
+generation that has already gone wrong can be dropped early.
+"""
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .prompts import (
+    ACTIONABLE_CONTEXT_TEMPLATE,
+    AXIS_UNIT_CONTEXT_TEMPLATE,
+    IDEAL_ROLES_TEMPLATE,
+)
+
+# Text allowed before step 1's start marker (e.g. a code fence)
+_PREAMBLE_CHARS = 200
+
+# "3. Title", "## 3) Title", "**3. Title**"...
+_NUMBERED_LINE_RE = re.compile(r"^[\s#>*_]*(\d+)\s*[.)]\s+(.*)$")
+_DASHES_RE = re.compile(r"[‐‑‒–—-]")
+
+
+@dataclass(frozen=True)
+class ValidationResult:
+    tool: str
+    errors: Tuple[str, ...] = ()
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"tool": self.tool, "valid": self.valid, "errors": list(self.errors)}
+
+
+class StepValidator(ABC):
+    """Checks the output of one tool call; `feed` keeps per-stream state."""
+
+    tool: str = ""
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._checked = 0
+
+    @abstractmethod
+    def errors(self, text: str) -> List[str]:
+        """Everything wrong with a complete output."""
+
+    def partial_errors(self, text: str) -> List[str]:
+        """Errors already certain from `text`, the complete lines so far."""
+        return []
+
+    def feed(self, delta: str) -> List[str]:
+        """Add a streamed delta; errors already certain after it."""
+        self._text += delta
+        end = self._text.rfind("\n") + 1
+        if end <= self._checked:
+            return []
+        self._checked = end
+        return self.partial_errors(self._text[:end])
+
+    def validate(self, text: str) -> ValidationResult:
+        return ValidationResult(self.tool, tuple(self.errors(text)))
+
+
+class GeneralContextValidator(StepValidator):
+    """Step 1: the block opens and closes with its boundary markers."""
+
+    tool = AXIS_UNIT_CONTEXT_TEMPLATE.name
+    start = AXIS_UNIT_CONTEXT_TEMPLATE.start_marker
+    end = AXIS_UNIT_CONTEXT_TEMPLATE.end_marker
+
+    def _start_errors(self, text: str, complete: bool) -> List[str]:
+        window = _PREAMBLE_CHARS + len(self.start)
+        if self.start in text[:window]:
+            return []
+        if complete or len(text) >= window:
+            return [f"Missing start marker `{self.start}`"]
+        return []
+
+    def partial_errors(self, text: str) -> List[str]:
+        errors = self._start_errors(text, complete=False)
+        end = text.find(self.end)
+        if not errors and end >= 0 and end < text.find(self.start):
+            errors.append(f"End marker `{self.end}` before the start marker")
+        return errors
+
+    def errors(self, text: str) -> List[str]:
+        errors = self._start_errors(text, complete=True)
+        if errors:
+            return errors
+        start = text.find(self.start) + len(self.start)
+        end = text.find(self.end, start)
+        if end < 0:
+            return [f"Missing end marker `{self.end}`"]
+        if not text[start:end].strip():
+            return ["Empty general context between the markers"]
+        return []
+
+
+class IdealRolesValidator(StepValidator):
+    """Step 2: roles numbered 1..NUMBER_OF_ROLES, no more, no fewer."""
+
+    tool = IDEAL_ROLES_TEMPLATE.name
+
+    def __init__(self, n_roles: int) -> None:
+        super().__init__()
+        self.n_roles = n_roles
+
+    def _numbers(self, text: str) -> List[int]:
+        return [
+            int(match.group(1))
+            for match in map(_NUMBERED_LINE_RE.match, text.splitlines())
+            if match
+        ]
+
+    def partial_errors(self, text: str) -> List[str]:
+        numbers = self._numbers(text)
+        if len(numbers) > self.n_roles:
+            return [f"More than {self.n_roles} roles"]
+        if numbers != list(range(1, len(numbers) + 1)):
+            return [f"Roles are not numbered 1..{self.n_roles}: {numbers}"]
+        return []
+
+    def errors(self, text: str) -> List[str]:
+        numbers = self._numbers(text)
+        if len(numbers) != self.n_roles:
+            return [f"Expected {self.n_roles} roles, found {len(numbers)}"]
+        return self.partial_errors(text)
+
+
+def _heading_key(text: str) -> str:
+    text = _DASHES_RE.sub("-", text.replace("*", "").replace("_", ""))
+    return " ".join(text.split()).casefold()
+
+
+class BriefValidator(StepValidator):
+    """Step 3: every heading of the brief, in order."""
+
+    tool = ACTIONABLE_CONTEXT_TEMPLATE.name
+    headings = ACTIONABLE_CONTEXT_TEMPLATE.headings
+
+    def _found(self, text: str) -> List[int]:
+        """Indexes of the headings present, in the order they appear."""
+        keys = [_heading_key(heading) for heading in self.headings]
+        found: List[int] = []
+        for line in text.splitlines():
+            match = _NUMBERED_LINE_RE.match(line)
+            if not match:
+                continue
+            title = _heading_key(match.group(2))
+            for index, key in enumerate(keys):
+                if title.startswith(key) and index not in found:
+                    found.append(index)
+                    break
+        return found
+
+    def partial_errors(self, text: str) -> List[str]:
+        found = self._found(text)
+        if found != sorted(found):
+            return ["Brief headings out of order"]
+        if found and found != list(range(found[-1] + 1)):
+            missing = sorted(set(range(found[-1])) - set(found))
+            return [f"Missing heading `{self.headings[index]}`" for index in missing]
+        return []
+
+    def errors(self, text: str) -> List[str]:
+        errors = self.partial_errors(text)
+        if errors:
+            return errors
+        found = set(self._found(text))
+        return [
+            f"Missing heading `{heading}`"
+            for index, heading in enumerate(self.headings)
+            if index not in found
+        ]
+
+
+def output_validator(tool_name: str, n_roles: int) -> Optional[StepValidator]:
+    """A fresh validator for one output of `tool_name` (None if unchecked)."""
+    if tool_name == GeneralContextValidator.tool:
+        return GeneralContextValidator()
+    if tool_name == IdealRolesValidator.tool:
+        return IdealRolesValidator(n_roles)
+    if tool_name == BriefValidator.tool:
+        return BriefValidator()
+    return None
+
+
+def validate_output(
+    tool_name: str, output: str, n_roles: int
+) -> Optional[ValidationResult]:
+    """Validate a complete output of `tool_name` (None if unchecked)."""
+    validator = output_validator(tool_name, n_roles)
+    return validator.validate(output) if validator is not None else None
@@ -1,10 +1,42 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+import asyncio
+import json
+import logging
+import mimetypes
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
 
-from .config import load_settings
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+
+from .config import load_settings, sqlite_path_from_url
 from .logging_config import setup_logging
 from .config.settings import Settings
-from .main import execute_pipeline
+from .agent_mode import AgentRunIncomplete
+from .artefacts import RunNotFoundError, get_artefact_store
+from .main import execute_pipeline_async
+from .batch import execute_batch_async
+from .fanout import execute_fanout_async
+from .jobs import JobManager, JobStore
+from .metrics import (
+    install_metrics,
+    monitor_event_loop_lag,
+    render_metrics,
+    track_queue_depth,
+)
+from .schemas import (
+    BatchRunRequest,
+    BatchRunResponse,
+    FanoutRunRequest,
+    FanoutRunResponse,
+    JobStatusResponse,
+    JobSubmitResponse,
+    RunListResponse,
+    RunRequest,
+    RunResponse,
+    RunSummary,
+    settings_for_request,
+)
 import warnings
 
 warnings.filterwarnings(
@@ -16,30 +48,55 @@ warnings.filterwarnings(
 _base_settings: Settings = load_settings()
 setup_logging(_base_settings)
 
+logger = logging.getLogger(__name__)
+
+# Feed /metrics from the graph tracer hooks
+install_metrics()
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Background jobs: persisted in DATABASE_URL, executed by a bounded worker
+    # pool. Built here so that importing the module creates no database.
+    job_manager = JobManager(
+        _base_settings,
+        JobStore(sqlite_path_from_url(_base_settings.DATABASE_URL)),
+        workers=_base_settings.JOB_WORKERS,
+    )
+    app.state.job_manager = job_manager
+    track_queue_depth(lambda: job_manager.queue.qsize())
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    await job_manager.start()
+    try:
+        yield
+    finally:
+        lag_monitor.cancel()
+        await job_manager.stop()
+
+
+def _job_manager(request: Request) -> JobManager:
+    return request.app.state.job_manager
+
+
+def _error_status(exc: Exception) -> int:
+    """HTTP status of a failed run: the request's fault (4xx) or ours (500)."""
+    if isinstance(exc, RunNotFoundError):
+        return 404
+    if isinstance(exc, AgentRunIncomplete):
+        return 409
+    if isinstance(exc, ValueError):
+        return 422
+    return 500
+
+
 app = FastAPI(
     title="BIG Pipeline API",
     description="Agentic pipeline to generate general context, ideal roles, and actionable brief.",
     version="1.0.0",
+    lifespan=_lifespan,
 )
 
 
-class RunRequest(BaseModel):
-    axis_of_exploration: str
-    unit_of_analysis: str
-    ideal_roles: int | None = None
-    external_research: bool | None = None
-    constraints: str | None = None
-    complex_unit: bool | None = None
-    country: str | None = None
-
-
-class RunResponse(BaseModel):
-    run_dir: str
-    step1_general_context: str
-    step2_ideal_roles_prompt: str
-    step3_actionable_context_brief: str
-
-
 @app.post("/run", response_model=RunResponse)
 async def run_pipeline_endpoint(req: RunRequest) -> RunResponse:
     """
@@ -47,34 +104,255 @@ async def run_pipeline_endpoint(req: RunRequest) -> RunResponse:
 
     This endpoint:
       - Overrides the base settings with request-specific values
-      - Runs the 3-step pipeline (context → roles → actionable brief)
-      - Persists artefacts on disk in a per-run folder
-      - Returns all three textual outputs + run directory path
+      - Runs the 3-step pipeline (context → roles → actionable brief) on the
+        event loop via async LLM calls, so concurrent requests don't block
+      - Serves step 1 from the response cache unless `bypass_cache` is set
+      - Persists artefacts in the ARTEFACT_STORE_BACKEND store
+      - With `resume=<run_id>`, continues that run, skipping completed steps
+        (in agent mode, its persisted thread, plus an optional follow-up
+        `message`)
+      - Returns all three textual outputs + run id and directory path
     """
-    # Start from base settings loaded from .env, then override
-    update = {
-        "AXIS_OF_EXPLORATION": req.axis_of_exploration,
-        "UNIT_OF_ANALYSIS": req.unit_of_analysis,
-    }
-
-    if req.ideal_roles is not None:
-        update["IDEAL_ROLES"] = req.ideal_roles
-    if req.external_research is not None:
-        update["EXTERNAL_RESEARCH"] = req.external_research
-    if req.constraints is not None:
-        update["CONSTRAINTS"] = req.constraints
-    if req.complex_unit is not None:
-        update["COMPLEX_UNIT"] = req.complex_unit
-    if req.country is not None:
-        update["COUNTRY"] = req.country
-
-    settings_for_run = _base_settings.model_copy(update=update)
-
-    result = execute_pipeline(settings_for_run, emit_console=False)
+    settings_for_run = settings_for_request(_base_settings, req)
+
+    try:
+        result = await execute_pipeline_async(
+            settings_for_run,
+            emit_console=False,
+            use_cache=not req.bypass_cache,
+            resume=req.resume,
+            follow_up=req.message,
+        )
+    except (RunNotFoundError, AgentRunIncomplete, ValueError) as exc:
+        raise HTTPException(status_code=_error_status(exc), detail=str(exc))
 
     return RunResponse(
+        run_id=result["run_id"],
         run_dir=result["run_dir"],
+        resumed_steps=result["resumed_steps"],
         step1_general_context=result["step1_general_context"],
+        step1_cache_hit=result["step1_cache_hit"],
         step2_ideal_roles_prompt=result["step2_ideal_roles_prompt"],
         step3_actionable_context_brief=result["step3_actionable_context_brief"],
+        validation=result.get("validation", {}),
+        thread_id=result.get("thread_id"),
+        agent_reply=result.get("agent_reply"),
+    )
+
+
+@app.post("/run/stream")
+async def run_pipeline_stream_endpoint(req: RunRequest) -> StreamingResponse:
+    """
+    Execute the BIG pipeline and stream its progress as NDJSON.
+
+    Each line is one JSON event: `run_start`, then for every step a
+    `step_start`, the LLM output as `token` events while it is generated,
+    and `step_complete`; finally `run_complete` with the same payload as
+    `/run` (or a single `error` event, with the HTTP `status` `/run` would
+    return, if the run fails). A `step_retry` event means the step's output
+    failed validation mid-stream: discard its tokens so far, the step is
+    being regenerated. A run failing before its first event (e.g. a bad
+    `resume`/`message` combination) gets a plain HTTP error instead, as
+    for `/run`.
+    """
+    settings_for_run = settings_for_request(_base_settings, req)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run() -> None:
+        try:
+            await execute_pipeline_async(
+                settings_for_run,
+                emit_console=False,
+                use_cache=not req.bypass_cache,
+                on_event=queue.put,
+                resume=req.resume,
+                follow_up=req.message,
+            )
+        except Exception as exc:  # surfaced to the client as an event
+            status = _error_status(exc)
+            if status == 500:
+                logger.exception("Streaming run failed")
+            await queue.put({"event": "error", "status": status, "message": str(exc)})
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(run())
+    try:
+        first = await queue.get()
+    except BaseException:
+        task.cancel()
+        raise
+    if first is not None and first["event"] == "error":
+        raise HTTPException(status_code=first["status"], detail=first["message"])
+
+    async def events() -> AsyncIterator[str]:
+        event = first
+        try:
+            while event is not None:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+                event = await queue.get()
+        finally:
+            # Client went away: the run's LLM calls are cancelled unless
+            # identical in-flight runs or calls are still waiting for them
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/runs/batch", response_model=BatchRunResponse)
+async def run_batch_endpoint(req: BatchRunRequest) -> BatchRunResponse:
+    """
+    Execute many pipeline runs concurrently (bounded by `concurrency`).
+
+    Runs sharing the same AXIS × UNIT compute step 1 once. Returns per-item
+    status plus aggregate throughput; the same summary is written to
+    `<OUTPUT_BASE_DIR>/batches/<batch>/batch_summary.json`.
+    """
+    summary = await execute_batch_async(_base_settings, req.runs, req.concurrency)
+    return BatchRunResponse(**summary)
+
+
+@app.post("/runs/fanout", response_model=FanoutRunResponse)
+async def run_fanout_endpoint(req: FanoutRunRequest) -> FanoutRunResponse:
+    """
+    Execute one AXIS × UNIT for many countries / constraint variants.
+
+    Steps 1 and 2 run once; step 3 runs for every country × constraint
+    variant in parallel. Each variant's brief is stored as
+    `variants/<variant_id>/step3_actionable_context_brief.md` in the run.
+    """
+    if req.resume or req.message or req.mode == "agent":
+        raise HTTPException(
+            status_code=422,
+            detail="Fan-out runs are pipeline runs and cannot be resumed",
+        )
+    try:
+        result = await execute_fanout_async(
+            settings_for_request(_base_settings, req),
+            req.countries,
+            req.constraint_variants,
+            use_cache=not req.bypass_cache,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return FanoutRunResponse(**result)
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> Response:
+    """Prometheus scrape endpoint (latencies, in-flight runs, cache, LLM usage)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/runs", response_model=RunListResponse)
+async def list_runs_endpoint(
+    axis: str | None = None,
+    unit: str | None = None,
+    country: str | None = None,
+    since: str | None = Query(None, description="ISO timestamp, inclusive"),
+    until: str | None = Query(None, description="ISO timestamp, inclusive"),
+    content_hash: str | None = Query(
+        None, description="SHA-256 of one of the run's artefacts"
+    ),
+    limit: int = Query(100, ge=1, le=1000),
+) -> RunListResponse:
+    """
+    Past runs from the artefact store's index, newest first.
+
+    Axis, unit and country match case- and whitespace-insensitively.
+    """
+    store = get_artefact_store(_base_settings)
+    records = await asyncio.to_thread(
+        store.list_runs,
+        axis=axis,
+        unit=unit,
+        country=country,
+        since=since,
+        until=until,
+        content_hash=content_hash,
+        limit=limit,
+    )
+    return RunListResponse(
+        runs=[
+            RunSummary(
+                run_id=record.run_id,
+                axis_of_exploration=record.axis,
+                unit_of_analysis=record.unit,
+                country=record.country,
+                created_at=record.created_at,
+                run_dir=record.location,
+            )
+            for record in records
+        ]
+    )
+
+
+def _job_artefacts(run_dir: str | None) -> list[str]:
+    if not run_dir:
+        return []
+    try:
+        run = get_artefact_store(_base_settings).open_run(Path(run_dir).name)
+    except RunNotFoundError:
+        return []
+    return run.names()
+
+
+def _job_artefact(run_dir: str, name: str) -> str | None:
+    run = get_artefact_store(_base_settings).open_run(Path(run_dir).name)
+    return run.read(name)
+
+
+@app.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job_endpoint(req: RunRequest, request: Request) -> JobSubmitResponse:
+    """
+    Queue a pipeline run and return its job id immediately.
+
+    Poll `GET /jobs/{job_id}` for status and partial step outputs instead of
+    holding a connection open for the whole run.
+    """
+    job_id = await _job_manager(request).submit(req)
+    return JobSubmitResponse(job_id=job_id, status="queued")
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def job_status_endpoint(job_id: str, request: Request) -> JobStatusResponse:
+    """Status of a job, with the outputs of the steps completed so far."""
+    job = await asyncio.to_thread(_job_manager(request).store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    artefacts = await asyncio.to_thread(_job_artefacts, job["run_dir"])
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        run_dir=job["run_dir"],
+        current_step=job["current_step"],
+        steps=job["steps"],
+        artefacts=artefacts,
+        error=job["error"],
+    )
+
+
+@app.get("/jobs/{job_id}/artefacts/{name:path}")
+async def job_artefact_endpoint(job_id: str, name: str, request: Request) -> Response:
+    """Download one artefact (e.g. `step3_actionable_context_brief.md`) of a job."""
+    job = await asyncio.to_thread(_job_manager(request).store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if name not in await asyncio.to_thread(_job_artefacts, job["run_dir"]):
+        raise HTTPException(status_code=404, detail="Artefact not found")
+    content = await asyncio.to_thread(_job_artefact, job["run_dir"], name)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Artefact not found")
+    media_type, _ = mimetypes.guess_type(name)
+    return Response(
+        content=content,
+        media_type=media_type or "text/plain",
+        headers={
+            "Content-Disposition": f'attachment; filename="{Path(name).name}"'
+        },
     )
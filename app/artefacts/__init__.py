@@ -0,0 +1,88 @@
+"""
+Where run artefacts are stored (ARTEFACT_STORE_BACKEND):
+
+  - directory: one directory per run under OUTPUT_BASE_DIR (the original
+               layout), indexed in OUTPUT_BASE_DIR/index.sqlite3
+  - sqlite:    every run in one database (ARTEFACT_STORE_SQLITE_PATH), with
+               compressed artefacts; no files or directories per run
+
+Both backends index runs by axis, unit, country, creation time and artefact
+content hash (see `ArtefactStore.list_runs`).
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+from ..config import Settings
+from .base import (
+    ArtefactStore,
+    RunNotFoundError,
+    RunRecord,
+    StoredRun,
+    make_slug,
+    new_run_id,
+    new_ulid,
+)
+from .directory import DirectoryStore, write_atomic
+from .sqlite import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+ARTEFACT_STORE_BACKENDS = ("directory", "sqlite")
+
+_stores: Dict[Tuple[str, str], ArtefactStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _store_path(settings: Settings) -> Tuple[str, str]:
+    backend = (settings.ARTEFACT_STORE_BACKEND or "directory").lower()
+    if backend == "directory":
+        return backend, settings.OUTPUT_BASE_DIR
+    if backend == "sqlite":
+        path = settings.ARTEFACT_STORE_SQLITE_PATH or str(
+            Path(settings.OUTPUT_BASE_DIR) / "artefacts.sqlite3"
+        )
+        return backend, path
+    raise ValueError(
+        f"ARTEFACT_STORE_BACKEND must be one of {ARTEFACT_STORE_BACKENDS}, "
+        f"got {settings.ARTEFACT_STORE_BACKEND!r}"
+    )
+
+
+def build_artefact_store(settings: Settings) -> ArtefactStore:
+    """Create the artefact store selected by ARTEFACT_STORE_BACKEND."""
+    backend, path = _store_path(settings)
+    if backend == "sqlite":
+        return SQLiteStore(path)
+    return DirectoryStore(path)
+
+
+def get_artefact_store(settings: Settings) -> ArtefactStore:
+    """The process-wide artefact store for the settings' backend and path."""
+    key = _store_path(settings)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = _stores[key] = build_artefact_store(settings)
+                logger.info("Run artefacts are stored in %s (%s)", *key)
+    return store
+
+
+__all__ = [
+    "ARTEFACT_STORE_BACKENDS",
+    "ArtefactStore",
+    "DirectoryStore",
+    "RunNotFoundError",
+    "RunRecord",
+    "SQLiteStore",
+    "StoredRun",
+    "build_artefact_store",
+    "get_artefact_store",
+    "make_slug",
+    "new_run_id",
+    "new_ulid",
+    "write_atomic",
+]
@@ -0,0 +1,326 @@
+import hashlib
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+
+# New run IDs to try before giving up (a clash needs a duplicated ULID)
+_CREATE_ATTEMPTS = 3
+
+
+class RunNotFoundError(LookupError):
+    """Raised when asked to resume a run ID the store does not know."""
+
+
+def make_slug(text: str, max_len: int = 40) -> str:
+    """Create a simple filesystem-safe slug from a string."""
+    text = text.strip().lower()
+    text = re.sub(r"[^a-z0-9]+", "-", text)
+    text = re.sub(r"-{2,}", "-", text).strip("-")
+    if len(text) > max_len:
+        text = text[:max_len].rstrip("-")
+    return text or "run"
+
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_ulid_lock = threading.Lock()
+_last_ulid = (0, 0)
+
+
+def new_ulid() -> str:
+    """
+    A ULID: 48-bit millisecond timestamp + 80 random bits, Crockford base32.
+
+    IDs sort by creation time, and are monotonic within the process: IDs
+    made in the same millisecond increment the random part instead of
+    drawing a new one.
+    """
+    global _last_ulid
+    with _ulid_lock:
+        ms = time.time_ns() // 1_000_000
+        last_ms, last_rand = _last_ulid
+        if ms <= last_ms:
+            ms, rand = last_ms, (last_rand + 1) & ((1 << 80) - 1)
+        else:
+            rand = secrets.randbits(80)
+        _last_ulid = (ms, rand)
+    value = (ms << 80) | rand
+    return "".join(_CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+
+def new_run_id(axis: str, unit: str) -> str:
+    """A unique, time-sortable run ID that still reads as AXIS × UNIT."""
+    return f"{new_ulid()}__axis-{make_slug(axis)}__unit-{make_slug(unit)}"
+
+
+def _index_key(value: str) -> str:
+    """Case- and whitespace-insensitive form of an indexed field."""
+    return " ".join((value or "").split()).casefold()
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass(frozen=True)
+class RunRecord:
+    """One indexed run, as returned by `ArtefactStore.list_runs`."""
+
+    run_id: str
+    axis: str
+    unit: str
+    country: str
+    created_at: str
+    location: str
+
+
+@dataclass(frozen=True)
+class StoredRun:
+    """A run in an artefact store; what the pipeline writes its outputs to."""
+
+    store: "ArtefactStore"
+    run_id: str
+
+    @property
+    def location(self) -> str:
+        return self.store.location(self.run_id)
+
+    def write(self, name: str, content: str) -> None:
+        self.store.write(self.run_id, name, content)
+
+    def read(self, name: str) -> Optional[str]:
+        return self.store.read(self.run_id, name)
+
+    def names(self) -> List[str]:
+        return self.store.names(self.run_id)
+
+    def __str__(self) -> str:
+        return self.location
+
+
+class ArtefactStore(ABC):
+    """
+    Run artefacts plus a SQLite index of runs.
+
+    The index holds one row per run (axis, unit, country, creation time) and
+    one per artefact (name, size, SHA-256 of the content), so past runs are
+    found with an indexed query instead of walking the filesystem. Backends
+    decide where the artefact content lives; `_put` may return the bytes to
+    keep in the index row itself.
+    """
+
+    def __init__(self, index_path: Path):
+        self.index_path = index_path
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.index_path), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                axis TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                country TEXT NOT NULL,
+                axis_key TEXT NOT NULL,
+                unit_key TEXT NOT NULL,
+                country_key TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_axis_unit
+                ON runs (axis_key, unit_key, created_at);
+            CREATE INDEX IF NOT EXISTS idx_runs_country
+                ON runs (country_key, created_at);
+            CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at);
+            CREATE TABLE IF NOT EXISTS artefacts (
+                run_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_artefacts_sha256 ON artefacts (sha256);
+            """
+        )
+        self._conn.commit()
+
+    # -- backend hooks ----------------------------------------------------
+
+    @abstractmethod
+    def location(self, run_id: str) -> str:
+        """Where the run lives (a directory, or a URL into the database)."""
+
+    @abstractmethod
+    def _create(self, run_id: str) -> None:
+        """Prepare storage for a new run; FileExistsError if it is taken."""
+
+    @abstractmethod
+    def _exists(self, run_id: str) -> bool:
+        """Whether the backend holds a run missing from the index."""
+
+    @abstractmethod
+    def _put(self, run_id: str, name: str, data: bytes) -> Optional[bytes]:
+        """Store an artefact; return the bytes to keep in the index, if any."""
+
+    @abstractmethod
+    def _get(self, run_id: str, name: str, blob: Optional[bytes]) -> Optional[bytes]:
+        """Load an artefact, given its index blob (None if not indexed)."""
+
+    # -- runs -------------------------------------------------------------
+
+    def create_run(self, axis: str, unit: str, country: str = "") -> StoredRun:
+        """
+        Create and index a new run for AXIS × UNIT.
+
+        Both the backend's storage and the index row are created exclusively,
+        so concurrent runs (even across processes sharing the store) can
+        never end up writing into the same run.
+        """
+        for _ in range(_CREATE_ATTEMPTS):
+            run_id = new_run_id(axis, unit)
+            try:
+                self._create(run_id)
+                self._index_run(run_id, axis, unit, country)
+            except (FileExistsError, sqlite3.IntegrityError):
+                continue
+            return StoredRun(self, run_id)
+        raise RuntimeError(f"Could not allocate a unique run id for {axis!r}")
+
+    def _index_run(self, run_id: str, axis: str, unit: str, country: str) -> None:
+        created_at = datetime.now()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, axis, unit, country, "
+                "axis_key, unit_key, country_key, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    axis,
+                    unit,
+                    country,
+                    _index_key(axis),
+                    _index_key(unit),
+                    _index_key(country),
+                    created_at.isoformat(timespec="milliseconds"),
+                ),
+            )
+            self._conn.commit()
+
+    def open_run(self, run_id: str) -> StoredRun:
+        """
+        An existing run, by ID.
+
+        Run IDs come from API clients, so anything that is not a plain name
+        is rejected.
+        """
+        if not run_id or run_id in (".", "..") or Path(run_id).name != run_id:
+            raise RunNotFoundError(f"Invalid run id: {run_id!r}")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None and not self._exists(run_id):
+            raise RunNotFoundError(f"No run for run id {run_id!r}")
+        return StoredRun(self, run_id)
+
+    def list_runs(
+        self,
+        axis: Optional[str] = None,
+        unit: Optional[str] = None,
+        country: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[RunRecord]:
+        """
+        Indexed runs matching every given filter, newest first.
+
+        Axis, unit and country match case- and whitespace-insensitively;
+        `since` / `until` are ISO timestamps; `content_hash` is the SHA-256
+        of any of the run's artefacts.
+        """
+        clauses, params = [], []
+        for column, value in (
+            ("axis_key", axis),
+            ("unit_key", unit),
+            ("country_key", country),
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(_index_key(value))
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at <= ?")
+            params.append(until)
+        if content_hash is not None:
+            clauses.append(
+                "run_id IN (SELECT run_id FROM artefacts WHERE sha256 = ?)"
+            )
+            params.append(content_hash.lower())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, axis, unit, country, created_at FROM runs "
+                f"{where} ORDER BY created_at DESC, run_id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [RunRecord(*row, location=self.location(row[0])) for row in rows]
+
+    # -- artefacts --------------------------------------------------------
+
+    def write(self, run_id: str, name: str, content: str) -> None:
+        """Store (or replace) one artefact of a run; `name` may contain `/`."""
+        data = content.encode("utf-8")
+        blob = self._put(run_id, name, data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artefacts "
+                "(run_id, name, sha256, size, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    name,
+                    _sha256(data),
+                    len(data),
+                    blob,
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+            self._conn.commit()
+
+    def read(self, run_id: str, name: str) -> Optional[str]:
+        """One artefact of a run, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM artefacts WHERE run_id = ? AND name = ?",
+                (run_id, name),
+            ).fetchone()
+        data = self._get(run_id, name, row[0] if row else None)
+        return data.decode("utf-8") if data is not None else None
+
+    def names(self, run_id: str) -> List[str]:
+        """Names of a run's artefacts."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM artefacts WHERE run_id = ? ORDER BY name",
+                (run_id,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,71 @@
+import os
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from .base import ArtefactStore
+
+INDEX_FILENAME = "index.sqlite3"
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write `path` via a unique temp file renamed into place.
+
+    Readers see either the old or the new content, never a partial write,
+    and concurrent writers cannot interleave their bytes.
+    """
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class DirectoryStore(ArtefactStore):
+    """One directory per run under `base_dir`, one plain file per artefact.
+
+    The run index lives next to the runs, in `base_dir/index.sqlite3`. Runs
+    written before the index existed can still be opened and read; they are
+    just not listed.
+    """
+
+    def __init__(self, base_dir: str):
+        self.base_dir = Path(base_dir).expanduser().resolve()
+        super().__init__(self.base_dir / INDEX_FILENAME)
+
+    def location(self, run_id: str) -> str:
+        return str(self.base_dir / run_id)
+
+    def _create(self, run_id: str) -> None:
+        # mkdir is atomic: exactly one creator succeeds, the others get
+        # FileExistsError and pick a new run ID
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        (self.base_dir / run_id).mkdir()
+
+    def _exists(self, run_id: str) -> bool:
+        return (self.base_dir / run_id).is_dir()
+
+    def _put(self, run_id: str, name: str, data: bytes) -> Optional[bytes]:
+        path = self.base_dir / run_id / name
+        # Artefact names may have a sub-directory (e.g. per fan-out variant)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(path, data)
+        return None
+
+    def _get(self, run_id: str, name: str, blob: Optional[bytes]) -> Optional[bytes]:
+        try:
+            return (self.base_dir / run_id / name).read_bytes()
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+    def names(self, run_id: str) -> List[str]:
+        run_dir = self.base_dir / run_id
+        if not run_dir.is_dir():
+            return []
+        return sorted(
+            path.relative_to(run_dir).as_posix()
+            for path in run_dir.rglob("*")
+            if path.is_file() and not path.name.endswith(".tmp")
+        )
@@ -0,0 +1,33 @@
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from .base import ArtefactStore
+
+
+class SQLiteStore(ArtefactStore):
+    """All runs in one SQLite database, artefacts zlib-compressed in the index.
+
+    No per-run directories or files: a run is a row in `runs` plus one row
+    per artefact. A run's location is `sqlite:///<database>/<run_id>`, so its
+    last path component is still the run ID.
+    """
+
+    def __init__(self, path: str, level: int = 6):
+        self.level = level
+        super().__init__(Path(path).expanduser().resolve())
+
+    def location(self, run_id: str) -> str:
+        return f"sqlite:///{self.index_path}/{run_id}"
+
+    def _create(self, run_id: str) -> None:
+        pass
+
+    def _exists(self, run_id: str) -> bool:
+        return False
+
+    def _put(self, run_id: str, name: str, data: bytes) -> Optional[bytes]:
+        return zlib.compress(data, self.level)
+
+    def _get(self, run_id: str, name: str, blob: Optional[bytes]) -> Optional[bytes]:
+        return zlib.decompress(blob) if blob is not None else None
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .agents.scheduler import PRIORITY_BATCH, priority_lane
+from .artefacts import new_ulid, write_atomic
+from .config.settings import Settings
+from .main import execute_pipeline_async
+from .schemas import RunRequest, settings_for_request
+
+logger = logging.getLogger(__name__)
+
+
+def _create_batch_directory(settings: Settings, size: int) -> Path:
+    """Create a per-batch directory under OUTPUT_BASE_DIR/batches."""
+    batches_dir = Path(settings.OUTPUT_BASE_DIR).expanduser().resolve() / "batches"
+    batches_dir.mkdir(parents=True, exist_ok=True)
+    # Time-sortable and unique: concurrent batches never share a directory
+    batch_dir = batches_dir / f"{new_ulid()}__batch-{size}-runs"
+    batch_dir.mkdir()
+    logger.info("Created batch directory at %s", batch_dir)
+    return batch_dir
+
+
+async def execute_batch_async(
+    base_settings: Settings,
+    requests: List[RunRequest],
+    concurrency: Optional[int] = None,
+) -> dict:
+    """
+    Run many pipeline requests with bounded concurrency.
+
+    - At most `concurrency` runs (default: BATCH_CONCURRENCY) are in flight.
+    - Requests with the same AXIS × UNIT share a single step 1 computation.
+    - One failing item does not stop the batch; its error is reported.
+    - LLM calls run in the batch priority lane, behind interactive `/run`s.
+
+    Writes `batch_summary.json` (per-item status + aggregate throughput) to
+    a batch directory and returns the same summary as a dict.
+    """
+    concurrency = max(1, concurrency or base_settings.BATCH_CONCURRENCY)
+    batch_dir = await asyncio.to_thread(
+        _create_batch_directory, base_settings, len(requests)
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    shared_step1: Dict[tuple, asyncio.Future] = {}
+
+    logger.info(
+        "Executing batch of %d runs with concurrency=%d", len(requests), concurrency
+    )
+
+    async def run_item(index: int, req: RunRequest) -> dict:
+        item = {
+            "index": index,
+            "axis_of_exploration": req.axis_of_exploration,
+            "unit_of_analysis": req.unit_of_analysis,
+            "country": req.country,
+        }
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                with priority_lane(PRIORITY_BATCH):
+                    result = await execute_pipeline_async(
+                        settings_for_request(base_settings, req),
+                        emit_console=False,
+                        use_cache=not req.bypass_cache,
+                        shared_step1=shared_step1,
+                        resume=req.resume,
+                    )
+            except Exception as exc:
+                logger.exception("Batch item %d failed", index)
+                item.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+            else:
+                item.update(
+                    status="succeeded",
+                    run_dir=result["run_dir"],
+                    step1_cache_hit=result["step1_cache_hit"],
+                )
+            item["duration_s"] = round(time.perf_counter() - started, 3)
+        return item
+
+    started_at = datetime.now()
+    wall_start = time.perf_counter()
+    items = await asyncio.gather(
+        *(run_item(index, req) for index, req in enumerate(requests))
+    )
+    wall_time = time.perf_counter() - wall_start
+
+    succeeded = [item for item in items if item["status"] == "succeeded"]
+    durations = [item["duration_s"] for item in items]
+    summary = {
+        "batch_dir": str(batch_dir),
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "concurrency": concurrency,
+        "total": len(items),
+        "succeeded": len(succeeded),
+        "failed": len(items) - len(succeeded),
+        "step1_cache_hits": sum(1 for item in succeeded if item["step1_cache_hit"]),
+        "wall_time_s": round(wall_time, 3),
+        "mean_run_duration_s": round(sum(durations) / len(durations), 3)
+        if durations
+        else 0.0,
+        "throughput_runs_per_min": round(len(succeeded) / wall_time * 60, 2)
+        if wall_time > 0
+        else 0.0,
+        "items": items,
+    }
+
+    summary_path = batch_dir / "batch_summary.json"
+    await asyncio.to_thread(
+        write_atomic,
+        summary_path,
+        json.dumps(summary, indent=2, ensure_ascii=False).encode("utf-8"),
+    )
+    logger.info(
+        "Batch completed: %d/%d succeeded in %.1fs. Summary at %s",
+        summary["succeeded"],
+        summary["total"],
+        wall_time,
+        summary_path,
+    )
+    return summary
@@ -0,0 +1,599 @@
+"""
+Offline load test and benchmark of the FastAPI service.
+
+Starts the mock LLM server (`mock_llm.py`) in a subprocess, points the
+service's model routes at it, starts the service itself under uvicorn in a
+second subprocess, and drives `POST /run` (or `/run/stream`) over HTTP at
+each requested concurrency level. Every level is a closed loop:
+`concurrency` clients each send their next request as soon as the previous
+one returns.
+
+Per level it reports throughput (of successful requests) and error rate,
+p50 / p95 / p99 latency, event-loop lag of the service's loop (scraped from
+its `big_event_loop_lag_seconds` histogram on /metrics) and resident memory
+of the service per in-flight run, and writes all of it as JSON so runs on
+different commits can be compared:
+
+    python -m app.benchmark --concurrency 1,8,32 --requests 64 \
+        --latency 0.5 --error-rate 0.02 --output bench.json
+    python -m app.benchmark ... --compare bench-main.json
+
+Upstream quotas (LLM_RPM_LIMIT / LLM_TPM_LIMIT) are disabled so the service
+itself is measured; `--set KEY=VALUE` overrides any service setting.
+
+`--server in-process` instead calls the app through an ASGI transport on the
+benchmark's own event loop, sampling the lag of that shared loop directly.
+The client's overhead is then counted as server latency and the client
+competes with the service for the loop, so its numbers are not comparable
+with the default mode.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+logger = logging.getLogger(__name__)
+
+# Throughput gain below which a higher concurrency no longer pays off
+_SATURATION_GAIN = 0.10
+
+# Event-loop lag sampling interval
+_LAG_INTERVAL_S = 0.01
+
+# The service's event-loop lag histogram (see `app/metrics.py`)
+_LOOP_LAG_METRIC = "big_event_loop_lag_seconds"
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linear-interpolated `q`-th percentile (0-100) of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def histogram_quantile(buckets: Sequence[Tuple[float, float]], q: float) -> float:
+    """
+    Prometheus-style `q`-th quantile (0-100) of cumulative (upper bound,
+    count) histogram buckets, interpolated linearly within a bucket.
+    """
+    if not buckets or not buckets[-1][1]:
+        return 0.0
+    rank = buckets[-1][1] * q / 100.0
+    lower_bound = lower_count = 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (
+                count - lower_count
+            )
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def _rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of process `pid` or this one (Linux only, else None)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class _LoopMonitor:
+    """
+    Samples event-loop lag and the service's RSS while a level runs. The lag
+    is this process's loop, used only with `--server in-process` (otherwise
+    the service's own histogram is scraped, see `_scrape_loop_lag`).
+    """
+
+    def __init__(self, server_pid: Optional[int]) -> None:
+        self.server_pid = server_pid
+        self.lags_s: List[float] = []
+        self.peak_rss: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(_LAG_INTERVAL_S)
+            self.lags_s.append(
+                max(0.0, time.perf_counter() - started - _LAG_INTERVAL_S)
+            )
+            rss = _rss_bytes(self.server_pid)
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def _request_body(args: argparse.Namespace, index: int) -> dict:
+    # Unique units, so neither the step 1 cache nor single-flight
+    # coalescing short-circuits the runs being measured
+    return {
+        "axis_of_exploration": args.axis,
+        "unit_of_analysis": f"{args.unit} #{index}",
+        "ideal_roles": args.ideal_roles,
+    }
+
+
+async def _send(client: httpx.AsyncClient, endpoint: str, body: dict) -> bool:
+    """Send one run request; True if it succeeded."""
+    if endpoint == "/run":
+        response = await client.post(endpoint, json=body)
+        return response.status_code == 200
+
+    last_event = None
+    async with client.stream("POST", endpoint, json=body) as response:
+        if response.status_code != 200:
+            return False
+        async for line in response.aiter_lines():
+            if line:
+                last_event = json.loads(line).get("event")
+    return last_event == "run_complete"
+
+
+async def _scrape_loop_lag(
+    client: httpx.AsyncClient,
+) -> Tuple[List[Tuple[float, float]], float]:
+    """Cumulative buckets and sum of the service's loop-lag histogram."""
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    buckets: List[Tuple[float, float]] = []
+    total = 0.0
+    for family in text_string_to_metric_families(response.text):
+        if family.name != _LOOP_LAG_METRIC:
+            continue
+        for sample in family.samples:
+            if sample.name.endswith("_bucket"):
+                buckets.append((float(sample.labels["le"]), sample.value))
+            elif sample.name.endswith("_sum"):
+                total = sample.value
+    return sorted(buckets), total
+
+
+def _loop_lag_delta(
+    before: Tuple[List[Tuple[float, float]], float],
+    after: Tuple[List[Tuple[float, float]], float],
+) -> dict:
+    """Loop lag (ms) observed by the service between two scrapes."""
+    previous = dict(before[0])
+    buckets = [(bound, count - previous.get(bound, 0.0)) for bound, count in after[0]]
+    count = buckets[-1][1] if buckets else 0.0
+    # Upper bound of the bucket holding the largest sample (None: past the
+    # last finite bound)
+    top = next((bound for bound, n in buckets if count and n >= count), 0.0)
+    return {
+        "mean": round((after[1] - before[1]) / max(1.0, count) * 1000, 3),
+        "p99": round(histogram_quantile(buckets, 99) * 1000, 3),
+        "max": None if top == float("inf") else round(top * 1000, 3),
+    }
+
+
+async def _run_level(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    concurrency: int,
+    first_index: int,
+    server_pid: Optional[int],
+) -> dict:
+    """Run `args.requests` requests with `concurrency` closed-loop clients."""
+    pending = iter(range(first_index, first_index + args.requests))
+    latencies: List[float] = []
+    failed = 0
+
+    async def client_loop() -> None:
+        nonlocal failed
+        for index in pending:
+            started = time.perf_counter()
+            try:
+                ok = await _send(client, args.endpoint, _request_body(args, index))
+            except httpx.HTTPError as exc:
+                logger.warning("Request %d failed: %s", index, exc)
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                failed += 1
+
+    if server_pid is None:
+        gc.collect()
+    else:
+        lag_before = await _scrape_loop_lag(client)
+    baseline_rss = _rss_bytes(server_pid)
+    monitor = _LoopMonitor(server_pid)
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    wall_time_s = time.perf_counter() - started
+    await monitor.stop()
+
+    memory_per_run_kb = None
+    if baseline_rss is not None and monitor.peak_rss is not None:
+        growth = max(0, monitor.peak_rss - baseline_rss)
+        memory_per_run_kb = round(growth / concurrency / 1024, 1)
+
+    if server_pid is None:
+        lags_ms = [lag * 1000 for lag in monitor.lags_s]
+        loop_lag_ms = {
+            "mean": round(sum(lags_ms) / max(1, len(lags_ms)), 3),
+            "p99": round(percentile(lags_ms, 99), 3),
+            "max": round(max(lags_ms, default=0.0), 3),
+        }
+    else:
+        loop_lag_ms = _loop_lag_delta(lag_before, await _scrape_loop_lag(client))
+    succeeded = len(latencies) - failed
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "succeeded": succeeded,
+        "failed": failed,
+        "error_rate": round(failed / len(latencies), 4),
+        "wall_time_s": round(wall_time_s, 3),
+        # Failed requests do not count: injected errors would inflate it
+        "throughput_rps": round(succeeded / wall_time_s, 3),
+        "latency_s": {
+            "mean": round(sum(latencies) / len(latencies), 4),
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4),
+        },
+        "loop_lag_ms": loop_lag_ms,
+        "rss_baseline_mb": (
+            round(baseline_rss / 2**20, 1) if baseline_rss is not None else None
+        ),
+        "rss_peak_mb": (
+            round(monitor.peak_rss / 2**20, 1) if monitor.peak_rss is not None else None
+        ),
+        "memory_per_inflight_run_kb": memory_per_run_kb,
+    }
+
+
+def saturation_concurrency(levels: List[dict]) -> Optional[int]:
+    """Lowest concurrency after which raising it gains < 10% throughput."""
+    ordered = sorted(levels, key=lambda level: level["concurrency"])
+    for previous, level in zip(ordered, ordered[1:]):
+        if not previous["throughput_rps"]:
+            continue
+        gain = level["throughput_rps"] / previous["throughput_rps"] - 1.0
+        if gain < _SATURATION_GAIN:
+            return previous["concurrency"]
+    return None  # still scaling at the highest level measured
+
+
+async def run_benchmark(
+    args: argparse.Namespace, server_pid: Optional[int] = None
+) -> List[dict]:
+    """
+    Warm up, then measure every concurrency level in order: against the
+    service running as `server_pid` on `--port`, or in-process if None.
+    """
+    if server_pid is None:
+        # Imported late: the service reads its settings from the environment
+        # (set up by `main`) at import time
+        from .api import app
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://benchmark",
+            timeout=None,
+        )
+    else:
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}",
+            timeout=None,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+        )
+    levels = []
+    async with client:
+        for index in range(args.warmup):
+            await _send(client, args.endpoint, _request_body(args, -1 - index))
+
+        first_index = 0
+        for concurrency in args.concurrency:
+            level = await _run_level(
+                client, args, concurrency, first_index, server_pid
+            )
+            first_index += args.requests
+            levels.append(level)
+            print(_format_level(level), flush=True)
+    return levels
+
+
+def _format_level(level: dict) -> str:
+    latency, lag = level["latency_s"], level["loop_lag_ms"]
+    memory = level["memory_per_inflight_run_kb"]
+    lag_p99 = "n/a" if lag is None else f"{lag['p99']:.1f}ms"
+    return (
+        f"c={level['concurrency']:<4} {level['throughput_rps']:>8.2f} req/s  "
+        f"p50={latency['p50']:.3f}s p95={latency['p95']:.3f}s "
+        f"p99={latency['p99']:.3f}s  "
+        f"lag p99={lag_p99}  "
+        f"mem/run={'n/a' if memory is None else f'{memory:.0f}KB'}  "
+        f"errors={level['failed']}/{level['requests']}"
+    )
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    """
+    Regressions of `results` against `baseline` at shared concurrency levels:
+    throughput lower, or p95 latency higher, by more than `max_regression`.
+    """
+    if results.get("server") != baseline.get("server", "in-process"):
+        print(
+            f"⚠️ Comparing a {results.get('server')} run against a "
+            f"{baseline.get('server', 'in-process')} baseline"
+        )
+    base_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    regressions = []
+    for level in results["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if base is None or not base["throughput_rps"]:
+            continue
+        throughput = level["throughput_rps"] / base["throughput_rps"] - 1.0
+        p95 = level["latency_s"]["p95"] / base["latency_s"]["p95"] - 1.0
+        print(
+            f"c={level['concurrency']:<4} throughput {throughput:+.1%}  "
+            f"p95 {p95:+.1%}  (vs {baseline.get('commit') or 'baseline'})"
+        )
+        if throughput < -max_regression:
+            regressions.append(
+                f"c={level['concurrency']}: throughput {throughput:+.1%}"
+            )
+        if p95 > max_regression:
+            regressions.append(f"c={level['concurrency']}: p95 latency {p95:+.1%}")
+    return regressions
+
+
+def _service_env(args: argparse.Namespace, work_dir: Path) -> Dict[str, str]:
+    env = {
+        "LLM_FAST_MODEL": "local:mock-fast",
+        "LLM_STRONG_MODEL": "local:mock-strong",
+        "LLM_TOOL_MODELS": "",
+        "LLM_FALLBACK_MODELS": "",
+        "LLM_LOCAL_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "LLM_LOCAL_API_KEY": "mock",
+        "LLM_RPM_LIMIT": "0",
+        "LLM_TPM_LIMIT": "0",
+        "EXTERNAL_RESEARCH": "false",
+        "OUTPUT_BASE_DIR": str(work_dir / "runs"),
+        "DATABASE_URL": f"sqlite:///{work_dir / 'jobs.db'}",
+        "RESPONSE_CACHE_BACKEND": "memory",
+        "LANGSMITH_TRACING": "false",
+        "LANGCHAIN_TRACING_V2": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    for item in args.set:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--set expects KEY=VALUE, got {item!r}")
+        env[name.strip()] = value
+    return env
+
+
+def _start_mock_server(args: argparse.Namespace) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "app.mock_llm",
+        "--port",
+        str(args.mock_port),
+        "--latency",
+        str(args.latency),
+        "--jitter",
+        str(args.jitter),
+        "--error-rate",
+        str(args.error_rate),
+    ]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+    process = subprocess.Popen(command)
+    _wait_until_up(
+        process, f"http://127.0.0.1:{args.mock_port}/health", "Mock LLM server"
+    )
+    return process
+
+
+def _start_service(args: argparse.Namespace) -> subprocess.Popen:
+    """The service under uvicorn, reading its settings from our environment."""
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.api:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(args.port),
+        "--log-level",
+        "warning",
+    ]
+    process = subprocess.Popen(command)
+    _wait_until_up(process, f"http://127.0.0.1:{args.port}/metrics", "Service")
+    return process
+
+
+def _wait_until_up(process: subprocess.Popen, url: str, name: str) -> None:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{name} exited during startup")
+        try:
+            httpx.get(url, timeout=1).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"{name} did not start within 30s")
+
+
+def _stop(process: Optional[subprocess.Popen]) -> None:
+    if process is not None:
+        process.terminate()
+        process.wait()
+
+
+def _parse_levels(value: str) -> List[int]:
+    levels = [int(part) for part in value.split(",") if part.strip()]
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("concurrency levels must be >= 1")
+    return levels
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BIG – API load test (offline)")
+    parser.add_argument(
+        "--concurrency",
+        type=_parse_levels,
+        default=[1, 4, 16],
+        help="comma-separated concurrency levels to measure (default: 1,4,16)",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=32, help="requests per level (default: 32)"
+    )
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests")
+    parser.add_argument("--endpoint", choices=("/run", "/run/stream"), default="/run")
+    parser.add_argument("--axis", default="DEMOGRAPHIC CHANGES")
+    parser.add_argument("--unit", default="POPULATION OVER 75 YEARS")
+    parser.add_argument("--ideal-roles", type=int, default=5)
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="mock LLM mean latency (s)"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.1, help="mock LLM latency jitter (s)"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of mock 429/5xx replies"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--mock-port", type=int, default=18001)
+    parser.add_argument(
+        "--server",
+        choices=("process", "in-process"),
+        default="process",
+        help="run the service under uvicorn in a subprocess (default) or "
+        "in this process through an ASGI transport",
+    )
+    parser.add_argument(
+        "--port", type=int, default=18000, help="service port (--server process)"
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="override a service setting (repeatable)",
+    )
+    parser.add_argument(
+        "--output", default="benchmark.json", help="machine-readable results"
+    )
+    parser.add_argument(
+        "--compare", metavar="BASELINE_JSON", help="results of an earlier run"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.10,
+        help="tolerated relative throughput / p95 regression (default: 0.10)",
+    )
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="big-benchmark-"))
+    service_env = _service_env(args, work_dir)
+    os.environ.update(service_env)
+
+    mock = _start_mock_server(args)
+    service = None
+    try:
+        if args.server == "process":
+            service = _start_service(args)
+        else:
+            print(
+                "⚠️ In-process server: client overhead counts as server latency "
+                "and client and service share one event loop",
+                flush=True,
+            )
+        levels = asyncio.run(
+            run_benchmark(args, service.pid if service is not None else None)
+        )
+    finally:
+        _stop(service)
+        _stop(mock)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "server": args.server,
+        "endpoint": args.endpoint,
+        "requests_per_level": args.requests,
+        "mock_llm": {
+            "latency_s": args.latency,
+            "jitter_s": args.jitter,
+            "error_rate": args.error_rate,
+        },
+        "service_settings": {
+            name: value
+            for name, value in service_env.items()
+            if name not in ("OUTPUT_BASE_DIR", "DATABASE_URL")
+        },
+        "saturation_concurrency": saturation_concurrency(levels),
+        "levels": levels,
+    }
+    Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\n📝 Results saved to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print("❌ Regressions: " + "; ".join(regressions))
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
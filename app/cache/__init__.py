@@ -0,0 +1,86 @@
+import logging
+import threading
+from typing import Optional
+
+from ..config import Settings
+from .base import ResponseCache, make_cache_key
+from .memory import InMemoryLRUCache
+from .semantic import SemanticCache, SemanticHit
+from .sqlite import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+_cache: Optional[ResponseCache] = None
+_cache_built = False
+_cache_lock = threading.Lock()
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_built = False
+
+
+def build_cache(settings: Settings) -> Optional[ResponseCache]:
+    """Create the response cache selected by RESPONSE_CACHE_BACKEND."""
+    backend = (settings.RESPONSE_CACHE_BACKEND or "none").lower()
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return InMemoryLRUCache(
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        )
+    if backend == "sqlite":
+        return SQLiteCache(
+            path=settings.RESPONSE_CACHE_SQLITE_PATH,
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        )
+    raise ValueError(
+        f"Unknown RESPONSE_CACHE_BACKEND: {settings.RESPONSE_CACHE_BACKEND!r}"
+    )
+
+
+def get_response_cache(settings: Settings) -> Optional[ResponseCache]:
+    """Return the process-wide response cache (built on first use)."""
+    global _cache, _cache_built
+    if not _cache_built:
+        with _cache_lock:
+            if not _cache_built:
+                _cache = build_cache(settings)
+                _cache_built = True
+                logger.info(
+                    "Response cache backend: %s",
+                    type(_cache).__name__ if _cache else "disabled",
+                )
+    return _cache
+
+
+def get_semantic_cache(settings: Settings) -> Optional[SemanticCache]:
+    """Return the process-wide semantic cache, or None if disabled."""
+    global _semantic_cache, _semantic_cache_built
+    if not _semantic_cache_built:
+        with _cache_lock:
+            if not _semantic_cache_built:
+                if settings.SEMANTIC_CACHE_ENABLED:
+                    _semantic_cache = SemanticCache(
+                        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+                    )
+                    logger.info(
+                        "Semantic cache enabled (threshold %.2f)",
+                        settings.SEMANTIC_CACHE_THRESHOLD,
+                    )
+                _semantic_cache_built = True
+    return _semantic_cache
+
+
+__all__ = [
+    "InMemoryLRUCache",
+    "ResponseCache",
+    "SQLiteCache",
+    "SemanticCache",
+    "SemanticHit",
+    "build_cache",
+    "get_response_cache",
+    "get_semantic_cache",
+    "make_cache_key",
+]
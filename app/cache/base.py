@@ -0,0 +1,47 @@
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Mapping, Optional
+
+
+def make_cache_key(
+    model: str,
+    temperature: float,
+    template: str,
+    template_version: str,
+    inputs: Mapping[str, Any],
+) -> str:
+    """Content-address a response by everything that determines it.
+
+    The key is a SHA-256 over a canonical JSON encoding of the model name,
+    temperature, prompt template name + version and the tool inputs.
+    """
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "template": template,
+        "template_version": template_version,
+        "inputs": dict(inputs),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """Key/value store for LLM responses with TTL and size-based eviction."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None on miss / expiry."""
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """Store a value, evicting the least recently used entries if full."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every entry."""
@@ -0,0 +1,229 @@
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Tokens that do not change what a topic is about
+_STOPWORDS = frozenset("a an and at by for from in into of on or the to with".split())
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+# Fields of at most this many words are topic labels (an axis, a unit)
+_LABEL_MAX_WORDS = 12
+# Character 3-gram overlap (Jaccard) of two spellings of the same word
+_SPELLING_SIMILARITY = 0.6
+
+
+def normalize_text(text: str) -> str:
+    """Casefolded, accent-free, punctuation-free form of `text`."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_TOKEN_RE.findall(text.casefold()))
+
+
+def _trigrams(word: str) -> List[str]:
+    padded = f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _features(text: str) -> List[str]:
+    """Word and character 3-gram features of a normalized text."""
+    words = [word for word in text.split() if word not in _STOPWORDS]
+    features = [f"w:{word}" for word in words]
+    for word in words:
+        features.extend(f"c:{gram}" for gram in _trigrams(word))
+    return features
+
+
+def hash_embed(text: str, dim: int) -> np.ndarray:
+    """
+    L2-normalized hashing-vectorizer embedding of `text`.
+
+    Each feature is hashed (CRC32) into one of `dim` buckets with a sign
+    taken from the hash's top bit, so collisions tend to cancel out.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in _features(normalize_text(text)):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def _numbers(text: str) -> FrozenSet[str]:
+    return frozenset(_NUMBER_RE.findall(text))
+
+
+def _label_words(text: str) -> Optional[FrozenSet[str]]:
+    """The words of a topic label, or None for a longer text."""
+    words = [word for word in normalize_text(text).split() if word not in _STOPWORDS]
+    return frozenset(words) if len(words) <= _LABEL_MAX_WORDS else None
+
+
+def _spelled_in(word: str, words: FrozenSet[str]) -> bool:
+    grams = set(_trigrams(word))
+    for other in words:
+        other_grams = set(_trigrams(other))
+        overlap = len(grams & other_grams) / len(grams | other_grams)
+        if overlap >= _SPELLING_SIMILARITY:
+            return True
+    return False
+
+
+def _same_label(a: Optional[FrozenSet[str]], b: Optional[FrozenSet[str]]) -> bool:
+    """
+    Whether two labels use the same words up to spelling ("changes" ~
+    "change"): a qualifier such as "rural" or "under" makes another topic.
+    """
+    if a is None or b is None:
+        return a is b
+    return all(_spelled_in(word, b) for word in a - b) and all(
+        _spelled_in(word, a) for word in b - a
+    )
+
+
+def _labels(fields: Mapping[str, str]) -> Dict[str, Optional[FrozenSet[str]]]:
+    return {name: _label_words(text) for name, text in fields.items()}
+
+
+@dataclass
+class SemanticHit:
+    value: str
+    similarity: float
+    # Field values of the entry that matched
+    matched: Dict[str, str]
+
+
+class _Namespace:
+    """Vectors (one matrix per field) and values of one exact-input group."""
+
+    def __init__(self, fields: Tuple[str, ...], dim: int):
+        self.fields = fields
+        self.vectors = {field: np.empty((0, dim), dtype=np.float32) for field in fields}
+        self.numbers: List[FrozenSet[str]] = []
+        self.labels: List[Dict[str, Optional[FrozenSet[str]]]] = []
+        self.entries: List[Tuple[Dict[str, str], str, float]] = []
+
+
+class SemanticCache:
+    """
+    In-process near-duplicate cache keyed by the meaning of text inputs.
+
+    Entries live in namespaces (e.g. one per tool, model, template version and
+    non-text inputs); within one, each text field is embedded with a hashing
+    vectorizer and the entry whose *least* similar field still reaches
+    `threshold` (cosine) is returned. Texts quoting different numbers (65 vs
+    75) never match, however similar the rest is, and neither do short
+    fields (topic labels) whose words differ beyond spelling ("rural" vs
+    "urban" population).
+
+    Lookups are a NumPy matrix-vector product per field, fine for the
+    thousands of entries `max_entries` allows; the oldest entries are evicted
+    first, and expired ones are dropped on the next write to their namespace.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        max_entries: int,
+        ttl_seconds: float,
+        dim: int = 4096,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._namespaces: "OrderedDict[str, _Namespace]" = OrderedDict()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _embed(self, fields: Mapping[str, str]) -> Dict[str, np.ndarray]:
+        return {name: hash_embed(text, self.dim) for name, text in fields.items()}
+
+    def get(self, namespace: str, fields: Mapping[str, str]) -> Optional[SemanticHit]:
+        """The closest entry at or above the threshold, or None."""
+        query = self._embed(fields)
+        numbers = _numbers(" ".join(fields.values()))
+        labels = _labels(fields)
+        now = time.time()
+        with self._lock:
+            space = self._namespaces.get(namespace)
+            if space is None or not space.entries:
+                return None
+            # Per entry: similarity of its least similar field
+            scores = np.min(
+                np.stack([space.vectors[name] @ query[name] for name in space.fields]),
+                axis=0,
+            )
+            for index in np.argsort(-scores):
+                score = float(scores[index])
+                if score < self.threshold:
+                    return None
+                matched, value, created_at = space.entries[index]
+                if (
+                    space.numbers[index] == numbers
+                    and all(
+                        _same_label(space.labels[index].get(name), label)
+                        for name, label in labels.items()
+                    )
+                    and not self._is_expired(created_at, now)
+                ):
+                    return SemanticHit(value, score, dict(matched))
+        return None
+
+    def set(self, namespace: str, fields: Mapping[str, str], value: str) -> None:
+        """Index `value` under the texts in `fields`."""
+        vectors = self._embed(fields)
+        now = time.time()
+        with self._lock:
+            space = self._namespaces.get(namespace)
+            if space is None:
+                space = self._namespaces[namespace] = _Namespace(
+                    tuple(sorted(fields)), self.dim
+                )
+            keep = [
+                i
+                for i, (_, _, created_at) in enumerate(space.entries)
+                if not self._is_expired(created_at, now)
+            ]
+            if len(keep) < len(space.entries):
+                self._take(space, keep)
+            for name in space.fields:
+                space.vectors[name] = np.vstack([space.vectors[name], vectors[name]])
+            space.numbers.append(_numbers(" ".join(fields.values())))
+            space.labels.append(_labels(fields))
+            space.entries.append((dict(fields), value, now))
+            self._namespaces.move_to_end(namespace)
+            self._evict()
+
+    def _take(self, space: _Namespace, keep: List[int]) -> None:
+        for name in space.fields:
+            space.vectors[name] = space.vectors[name][keep]
+        space.numbers = [space.numbers[i] for i in keep]
+        space.labels = [space.labels[i] for i in keep]
+        space.entries = [space.entries[i] for i in keep]
+
+    def _evict(self) -> None:
+        # Oldest entries first, starting with the least recently written space
+        while len(self) > self.max_entries and self._namespaces:
+            namespace, space = next(iter(self._namespaces.items()))
+            excess = len(self) - self.max_entries
+            if excess >= len(space.entries):
+                del self._namespaces[namespace]
+            else:
+                self._take(space, list(range(excess, len(space.entries))))
+
+    def __len__(self) -> int:
+        return sum(len(space.entries) for space in self._namespaces.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._namespaces.clear()
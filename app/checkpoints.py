@@ -0,0 +1,76 @@
+"""Per-step checkpoints, so a failed run can resume without redoing finished steps."""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .artefacts import RunNotFoundError, StoredRun
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILENAME = "checkpoints.json"
+
+__all__ = ["CHECKPOINT_FILENAME", "RunCheckpoints", "RunNotFoundError"]
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RunCheckpoints:
+    """
+    Completed steps of one run, stored as its `checkpoints.json` artefact.
+
+    Each entry records the hash of the step's inputs (tool, model, inputs and
+    the settings the tool reads) and of the artefact it produced. A step is
+    only reused when both still match, so resuming with changed settings or
+    after an upstream step was redone recomputes it.
+    """
+
+    def __init__(self, run: StoredRun):
+        self.run = run
+        self._steps: Dict[str, Dict[str, Any]] = self._read()
+        # Steps of one run may complete (and be saved) concurrently
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            raw = self.run.read(CHECKPOINT_FILENAME)
+            if raw is None:
+                return {}
+            data = json.loads(raw)
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable checkpoints of run %s", self.run)
+            return {}
+        return data.get("steps", {})
+
+    def load(self, step: str, input_hash: str) -> Optional[str]:
+        """The step's saved output if it completed with the same inputs."""
+        entry = self._steps.get(step)
+        if entry is None or entry.get("input_hash") != input_hash:
+            return None
+        try:
+            content = self.run.read(entry["artefact"])
+        except OSError:
+            return None
+        if content is None:
+            return None
+        if _sha256(content) != entry.get("output_hash"):
+            logger.warning("Artefact of checkpointed step %s changed; redoing", step)
+            return None
+        return content
+
+    def save(self, step: str, input_hash: str, artefact: str, content: str) -> None:
+        """Record a completed step (its artefact must already be written)."""
+        entry = {
+            "input_hash": input_hash,
+            "artefact": artefact,
+            "output_hash": _sha256(content),
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._steps[step] = entry
+            payload = {"run_id": self.run.run_id, "steps": self._steps}
+            self.run.write(CHECKPOINT_FILENAME, json.dumps(payload, indent=2))
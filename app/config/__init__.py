@@ -1,4 +1,16 @@
-from .settings import Settings
-from .loader import load_settings
+from .settings import (
+    FrozenSettings,
+    Settings,
+    freeze_settings,
+    sqlite_path_from_url,
+)
+from .loader import get_settings, load_settings
 
-__all__ = ["Settings", "load_settings"]
+__all__ = [
+    "FrozenSettings",
+    "Settings",
+    "freeze_settings",
+    "get_settings",
+    "load_settings",
+    "sqlite_path_from_url",
+]
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from dotenv import load_dotenv
 
 from .settings import Settings
@@ -11,3 +13,12 @@ def load_settings() -> Settings:
     # Ensure .env is loaded (if present)
     load_dotenv()
     return Settings()
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide Settings, loading `.env` only once.
+
+    Use this on hot paths (e.g. per tool call) instead of `load_settings()`.
+    """
+    return load_settings()
@@ -1,4 +1,4 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 
@@ -14,14 +14,102 @@ class Settings(BaseSettings):
     CONSTRAINTS: str = ""
     COMPLEX_UNIT: bool = False
 
-    # Whether to use a static TODO plan (true) or dynamic planning (future use)
+    # Agent mode: follow the fixed 3-step TODO plan (true) or let the
+    # coordinator plan its own tool calls (false)
     STATIC_TODO: bool = True
 
+    # pipeline: fixed 3-step DAG | agent: ReAct coordinator calling the tools
+    EXECUTION_MODE: str = "pipeline"
+    # Agent mode step budget (graph super-steps, i.e. LangGraph's recursion
+    # limit; the agent sees what is left as `remaining_steps`)
+    AGENT_MAX_STEPS: int = 12
+    # Agent thread persistence: memory (tests) | sqlite (DATABASE_URL) | none
+    AGENT_CHECKPOINTER: str = "sqlite"
+    # Estimated tokens of message history kept per agent thread (0 = no
+    # limit); older messages are dropped (trim) or condensed (summarize)
+    AGENT_HISTORY_MAX_TOKENS: int = 32000
+    AGENT_HISTORY_STRATEGY: str = "trim"
+
     # Number of roles to infer in step 2
     IDEAL_ROLES: int = 7
 
     # Base directory where run artefacts will be stored (can be relative or absolute)
     OUTPUT_BASE_DIR: str = "runs"
+    # Run artefact storage: directory (one folder per run under
+    # OUTPUT_BASE_DIR) | sqlite (one compressed database); both are indexed
+    ARTEFACT_STORE_BACKEND: str = "directory"
+    # sqlite backend database (default: OUTPUT_BASE_DIR/artefacts.sqlite3)
+    ARTEFACT_STORE_SQLITE_PATH: str = ""
+
+    # Model routing, as `provider:model` specs (providers: openai, anthropic,
+    # local = OpenAI-compatible server at LLM_LOCAL_BASE_URL, fake = offline
+    # deterministic stand-in). Steps 1-2 use the fast model, step 3 the strong
+    LLM_FAST_MODEL: str = "openai:gpt-4.1-mini"
+    LLM_STRONG_MODEL: str = "openai:gpt-4.1"
+    # Per-tool overrides, e.g. "generate_ideal_roles=anthropic:claude-3-5-haiku-latest"
+    LLM_TOOL_MODELS: str = ""
+    # Comma-separated specs tried when the routed model fails
+    LLM_FALLBACK_MODELS: str = ""
+    # fallback: keep the configured order | latency: fastest healthy model first
+    LLM_ROUTING_STRATEGY: str = "fallback"
+    # Models whose last request failed are tried last for this long
+    LLM_FAILURE_COOLDOWN_S: float = 30.0
+    LLM_LOCAL_BASE_URL: str = "http://localhost:8001/v1"
+    LLM_LOCAL_API_KEY: str = ""
+    # Simulated response time of the fake backend (load tests)
+    FAKE_LLM_LATENCY_S: float = 0.0
+
+    # Max concurrent LLM requests per (model, temperature, API key); the
+    # adaptive limit moves between LLM_MIN_CONCURRENCY and this value
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_MIN_CONCURRENCY: int = 1
+    # Retries on transient upstream errors (429 / 5xx / connection), with
+    # jittered exponential backoff
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_DELAY_S: float = 1.0
+    LLM_RETRY_MAX_DELAY_S: float = 30.0
+
+    # Upstream quotas per model key (0 = unlimited): requests and tokens/minute
+    LLM_RPM_LIMIT: int = 500
+    LLM_TPM_LIMIT: int = 200_000
+    # Completion tokens assumed per request when budgeting TPM
+    LLM_EXPECTED_OUTPUT_TOKENS: int = 1000
+    # Shrink concurrency when a request (or a stream's first token) takes
+    # longer than this (0 = off)
+    LLM_LATENCY_TARGET_S: float = 60.0
+
+    # max_tokens per tool = its output length target x this (0 = no limit),
+    # never below LLM_MIN_OUTPUT_TOKENS
+    LLM_OUTPUT_BUDGET_HEADROOM: float = 2.0
+    LLM_MIN_OUTPUT_TOKENS: int = 1024
+    # Stop streaming (and generating) once a prompt's end marker is produced
+    LLM_STOP_AT_END_MARKER: bool = True
+    # Regenerate a step output failing its structural checks (markers, role
+    # count, brief headings) up to this many times; checked while streaming
+    # so a bad generation is dropped early (0 = validate and report only)
+    STEP_VALIDATION_RETRIES: int = 1
+
+    # Send step 3's static prompt part ahead (1-token completion) while step 2
+    # runs, for models with automatic prompt caching
+    PROMPT_CACHE_WARMUP: bool = False
+
+    # Max pipeline runs in flight per batch (POST /runs/batch, --batch CLI)
+    BATCH_CONCURRENCY: int = 4
+
+    # Background job workers (POST /jobs); jobs are stored in DATABASE_URL
+    JOB_WORKERS: int = 4
+
+    # Response cache for step 1 general contexts: none | memory | sqlite
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_SQLITE_PATH: str = ".cache/responses.sqlite3"
+    # In-process near-duplicate cache for steps 1 and 2: inputs whose hashed
+    # word/char n-gram vectors reach this cosine similarity share a response
+    # (short labels must also use the same words, up to spelling)
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.85
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
 
     # API keys
     OPENAI_API_KEY: str = ""
@@ -53,3 +141,30 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
         # Important: don't crash when .env has extra keys
         extra = "ignore"
+
+
+class FrozenSettings(Settings):
+    """Immutable Settings snapshot, safe to share across concurrent runs."""
+
+    model_config = SettingsConfigDict(frozen=True)
+
+
+def freeze_settings(settings: Settings) -> FrozenSettings:
+    """Snapshot settings without re-reading the environment or `.env`."""
+    if isinstance(settings, FrozenSettings):
+        return settings
+    return FrozenSettings.model_construct(**settings.model_dump())
+
+
+def sqlite_path_from_url(database_url: str) -> str:
+    """
+    Map a `sqlite:///relative.db` or `sqlite:////abs/path.db` URL to a path.
+
+    Only SQLite is supported for the local stores (jobs, agent threads).
+    """
+    prefix = "sqlite:///"
+    if not database_url.startswith(prefix):
+        raise ValueError(
+            f"Local stores need a sqlite:/// DATABASE_URL, got {database_url!r}"
+        )
+    return database_url[len(prefix):] or ":memory:"
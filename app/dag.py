@@ -0,0 +1,120 @@
+"""A small async DAG executor: runs tasks as soon as their dependencies finish."""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+TaskFn = Callable[..., Awaitable[Any]]
+
+
+@dataclass
+class TaskTiming:
+    start_s: float
+    end_s: float
+
+    @property
+    def duration_s(self) -> float:
+        return self.end_s - self.start_s
+
+
+class TaskGraph:
+    """
+    Independent tasks run concurrently; each task starts once all of its
+    dependencies have finished and receives their results as positional
+    arguments, in the order the dependencies were listed.
+
+    Usage:
+        dag = TaskGraph()
+        dag.add("context", fetch_context)
+        dag.add("roles", make_roles, deps=["context"])
+        dag.add("save", save_context, deps=["context"])
+        results = await dag.run()
+
+    If a task fails, the tasks depending on it fail with the same error while
+    independent ones still finish (e.g. saving the checkpoint of a step that
+    did succeed); the first error is then raised. Cancelling `run` cancels
+    every task. Timings are recorded relative to the start of `run`, so the
+    critical path (the chain of dependencies that determined the total
+    latency) can be reported afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, Tuple[TaskFn, Tuple[str, ...]]] = {}
+        self.timings: Dict[str, TaskTiming] = {}
+
+    def add(self, name: str, fn: TaskFn, deps: Sequence[str] = ()) -> None:
+        """Register a task; its dependencies must already be registered."""
+        if name in self._tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        missing = [dep for dep in deps if dep not in self._tasks]
+        if missing:
+            raise ValueError(f"Task {name} depends on unknown tasks: {missing}")
+        self._tasks[name] = (fn, tuple(deps))
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every task and return their results by name."""
+        started = time.perf_counter()
+        futures: Dict[str, asyncio.Future] = {}
+
+        async def run_task(name: str) -> Any:
+            fn, deps = self._tasks[name]
+            args = [await futures[dep] for dep in deps]
+            task_started = time.perf_counter()
+            try:
+                return await fn(*args)
+            finally:
+                self.timings[name] = TaskTiming(
+                    task_started - started, time.perf_counter() - started
+                )
+
+        # Registration order is a topological order (deps are added first)
+        for name in self._tasks:
+            futures[name] = asyncio.ensure_future(run_task(name))
+        try:
+            outcomes = await asyncio.gather(*futures.values(), return_exceptions=True)
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            await asyncio.gather(*futures.values(), return_exceptions=True)
+            raise
+        for outcome in outcomes:
+            # In topological order, so the root cause comes first
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return dict(zip(futures, outcomes))
+
+    def critical_path(self) -> List[str]:
+        """
+        The dependency chain ending at the last task to finish.
+
+        Walking back from it, each step picks the dependency that finished
+        last, i.e. the one the task was actually waiting on.
+        """
+        if not self.timings:
+            return []
+        current = max(self.timings, key=lambda name: self.timings[name].end_s)
+        path = [current]
+        while True:
+            deps = [dep for dep in self._tasks[current][1] if dep in self.timings]
+            if not deps:
+                break
+            current = max(deps, key=lambda name: self.timings[name].end_s)
+            path.append(current)
+        return path[::-1]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Per-task timings plus the critical path and its latency."""
+        path = self.critical_path()
+        return {
+            "tasks": {
+                name: {
+                    "deps": list(self._tasks[name][1]),
+                    "start_s": round(timing.start_s, 4),
+                    "end_s": round(timing.end_s, 4),
+                    "duration_s": round(timing.duration_s, 4),
+                }
+                for name, timing in self.timings.items()
+            },
+            "critical_path": path,
+            "critical_path_s": round(self.timings[path[-1]].end_s, 4) if path else 0.0,
+        }
@@ -0,0 +1,360 @@
+"""
+Fan-out runs: one AXIS × UNIT, many COUNTRY / CONSTRAINTS variants.
+
+Steps 1 and 2 do not read COUNTRY, CONSTRAINTS or COMPLEX_UNIT, so a fan-out
+computes them once and runs only step 3 per variant, all variants in
+parallel. N variants cost N + 2 LLM calls instead of 3N, with about the wall
+time of a single run.
+
+Artefacts share one run:
+
+    <run>/
+      step1_general_context.md
+      step2_ideal_roles_prompt.md
+      variants.json                      # variant list + status
+      variants/<variant_id>/step3_actionable_context_brief.md
+      validation.json                    # per artefact, see agents.validation
+      call_graph.mmd
+      run_metrics.json
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .agents.context import RunContext
+from .agents.prompts import template_versions
+from .agents.tools import (
+    generate_actionable_context,
+    generate_axis_unit_context,
+    generate_ideal_roles,
+    warm_actionable_context_cache,
+)
+from .artefacts import StoredRun, get_artefact_store, make_slug
+from .config.settings import Settings
+from .graph_tracer import record_run_totals, run_call_graph, trace_node
+from .steps import (
+    EventCallback,
+    agenerate_general_context,
+    agenerate_ideal_roles,
+    arun_tool,
+    awrite_step_output,
+    emit,
+    validation_report,
+)
+
+logger = logging.getLogger(__name__)
+
+# Root node of a fan-out run in the call graph
+FANOUT_RUN_NODE = "fanout"
+
+# step -> artefact of the shared steps
+_STEP_ARTEFACTS = {1: "step1_general_context.md", 2: "step2_ideal_roles_prompt.md"}
+STEP3_ARTEFACT = "step3_actionable_context_brief.md"
+
+
+@dataclass(frozen=True)
+class Variant:
+    """The step 3 settings of one fan-out branch."""
+
+    country: str
+    constraints: str
+
+    @property
+    def variant_id(self) -> str:
+        """
+        Readable slugs plus a hash of the exact settings: slugs are truncated
+        and drop non-ASCII text, so different variants can share them.
+        """
+        key = f"{self.country}\0{self.constraints}".encode("utf-8")
+        digest = hashlib.sha256(key).hexdigest()[:8]
+        country = make_slug(self.country)
+        return f"{country}__{make_slug(self.constraints or 'none')}__{digest}"
+
+    @property
+    def artefact(self) -> str:
+        return f"variants/{self.variant_id}/{STEP3_ARTEFACT}"
+
+
+def build_variants(
+    settings: Settings,
+    countries: List[str],
+    constraint_variants: Optional[List[str]] = None,
+) -> List[Variant]:
+    """
+    Every country × constraint variant, without exact duplicates.
+
+    An empty `constraint_variants` keeps the run's CONSTRAINTS.
+    """
+    constraints = constraint_variants or [settings.CONSTRAINTS]
+    # Variant is frozen: equal (country, constraints) pairs dedupe
+    variants = dict.fromkeys(
+        Variant(country.strip(), (constraint or "").strip())
+        for country in countries
+        for constraint in constraints
+    )
+    if not variants:
+        raise ValueError("A fan-out run needs at least one country")
+    ids = [variant.variant_id for variant in variants]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Fan-out variant ids collide: {sorted(ids)}")
+    return list(variants)
+
+
+def _variant_context(context: RunContext, variant: Variant) -> RunContext:
+    """The run's context with the variant's step 3 settings (same routes)."""
+    settings = context.settings.model_copy(
+        update={"COUNTRY": variant.country, "CONSTRAINTS": variant.constraints}
+    )
+    return RunContext(settings=settings, router=context.router)
+
+
+def _tagged(
+    on_event: Optional[EventCallback], variant_id: str
+) -> Optional[EventCallback]:
+    """`on_event` with each event tagged with the variant it belongs to."""
+    if on_event is None:
+        return None
+
+    async def tagged(event: Dict[str, Any]) -> None:
+        await on_event({**event, "variant": variant_id})
+
+    return tagged
+
+
+async def execute_fanout_async(
+    settings: Settings,
+    countries: List[str],
+    constraint_variants: Optional[List[str]] = None,
+    use_cache: bool = True,
+    on_event: Optional[EventCallback] = None,
+) -> dict:
+    """
+    Run steps 1-2 once and step 3 for every country × constraint variant.
+
+    Step 1 goes through the response (and semantic) cache like a pipeline
+    run; the step 3 prompt cache is warmed while step 2 runs when
+    PROMPT_CACHE_WARMUP is set, so the parallel step 3 calls share their
+    prefix. A failing variant does not stop the others; its error is
+    reported in its entry.
+
+    Events are the pipeline's, with step 3 events (incl. `token`) tagged
+    with their `variant`. Returns steps 1-2 outputs and `validation`,
+    `variants` (one entry per variant: ids, settings, status, artefact,
+    output and validation, or error) and the run's call graph and metrics.
+    """
+    context = RunContext.from_settings(settings)
+    settings = context.settings
+    variants = build_variants(settings, countries, constraint_variants)
+    run: StoredRun = await asyncio.to_thread(
+        get_artefact_store(settings).create_run,
+        settings.AXIS_OF_EXPLORATION,
+        settings.UNIT_OF_ANALYSIS,
+        ", ".join(dict.fromkeys(variant.country for variant in variants)),
+    )
+    logger.info("Fan-out run %s: %d step 3 variants", run, len(variants))
+    writes = []
+
+    with run_call_graph() as call_graph, trace_node(FANOUT_RUN_NODE):
+        await emit(
+            on_event,
+            {
+                "event": "run_start",
+                "run_dir": run.location,
+                "variants": [variant.variant_id for variant in variants],
+            },
+        )
+        started = time.perf_counter()
+
+        async def step(number: int, tool, compute) -> tuple:
+            await emit(
+                on_event, {"event": "step_start", "step": number, "name": tool.name}
+            )
+            with trace_node(tool.name):
+                output, cache_hit = await compute()
+            await emit(
+                on_event,
+                {
+                    "event": "step_complete",
+                    "step": number,
+                    "name": tool.name,
+                    "artefact": _STEP_ARTEFACTS[number],
+                    "output": output,
+                    "resumed": False,
+                    "cache_hit": cache_hit,
+                },
+            )
+            writes.append(
+                asyncio.create_task(
+                    awrite_step_output(run, _STEP_ARTEFACTS[number], output)
+                )
+            )
+            return output, cache_hit
+
+        write_error: Optional[Exception] = None
+        try:
+            context_block, step1_cache_hit = await step(
+                1,
+                generate_axis_unit_context,
+                lambda: agenerate_general_context(context, use_cache, on_event),
+            )
+
+            async def warm_step3_cache() -> None:
+                with trace_node("prompt_cache_warmup"):
+                    try:
+                        await warm_actionable_context_cache(context, context_block)
+                    except Exception as exc:  # an optimisation only, never fatal
+                        logger.warning("Prompt cache warmup failed: %s", exc)
+
+            roles_inputs = {"context": context_block, "n_roles": settings.IDEAL_ROLES}
+            step2 = step(
+                2,
+                generate_ideal_roles,
+                lambda: agenerate_ideal_roles(
+                    context, roles_inputs, use_cache, on_event
+                ),
+            )
+            if settings.PROMPT_CACHE_WARMUP:
+                (roles_block, step2_cache_hit), _ = await asyncio.gather(
+                    step2, warm_step3_cache()
+                )
+            else:
+                roles_block, step2_cache_hit = await step2
+
+            async def step3(variant: Variant) -> Dict[str, Any]:
+                on_variant_event = _tagged(on_event, variant.variant_id)
+                entry: Dict[str, Any] = {
+                    "variant_id": variant.variant_id,
+                    "country": variant.country,
+                    "constraints": variant.constraints,
+                    "artefact": variant.artefact,
+                }
+                await emit(
+                    on_variant_event,
+                    {
+                        "event": "step_start",
+                        "step": 3,
+                        "name": generate_actionable_context.name,
+                    },
+                )
+                inputs = {"roles_prompt": roles_block, "general_context": context_block}
+                try:
+                    with trace_node(generate_actionable_context.name):
+                        output = await arun_tool(
+                            generate_actionable_context,
+                            inputs,
+                            3,
+                            on_variant_event,
+                            _variant_context(context, variant),
+                        )
+                    await awrite_step_output(run, variant.artefact, output)
+                except Exception as exc:
+                    logger.exception("Fan-out variant %s failed", variant.variant_id)
+                    entry.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+                    return entry
+                await emit(
+                    on_variant_event,
+                    {
+                        "event": "step_complete",
+                        "step": 3,
+                        "name": generate_actionable_context.name,
+                        "artefact": variant.artefact,
+                        "output": output,
+                        "resumed": False,
+                    },
+                )
+                report = validation_report(
+                    settings,
+                    {variant.artefact: (generate_actionable_context.name, output)},
+                )
+                entry.update(
+                    status="succeeded",
+                    step3_actionable_context_brief=output,
+                    validation=report.get(variant.artefact),
+                )
+                return entry
+
+            results = await asyncio.gather(
+                *(step3(variant) for variant in variants)
+            )
+        finally:
+            # Awaited even if a step failed, so no write error goes unseen
+            for outcome in await asyncio.gather(*writes, return_exceptions=True):
+                if isinstance(outcome, Exception):
+                    logger.error("Fan-out artefact write failed: %s", outcome)
+                    write_error = write_error or outcome
+        if write_error is not None:
+            raise write_error
+        wall_time = time.perf_counter() - started
+
+    succeeded = sum(1 for entry in results if entry["status"] == "succeeded")
+    validation = validation_report(
+        settings,
+        {
+            _STEP_ARTEFACTS[1]: (generate_axis_unit_context.name, context_block),
+            _STEP_ARTEFACTS[2]: (generate_ideal_roles.name, roles_block),
+        },
+    )
+    all_validation = {
+        **validation,
+        **{
+            entry["artefact"]: entry["validation"]
+            for entry in results
+            if entry.get("validation")
+        },
+    }
+    mermaid_flowchart = call_graph.as_mermaid_flowchart(direction="LR")
+    run_metrics = call_graph.metrics_as_dict()
+    run_metrics["mode"] = "fanout"
+    run_metrics["fanout"] = {
+        "variants": len(variants),
+        "succeeded": succeeded,
+        "failed": len(variants) - succeeded,
+        "wall_time_s": round(wall_time, 3),
+    }
+    run_metrics["prompt_templates"] = template_versions()
+    record_run_totals("fanout", run_metrics["totals"])
+
+    # Outputs are in the variants' own artefacts
+    manifest = [
+        {k: v for k, v in entry.items() if k != "step3_actionable_context_brief"}
+        for entry in results
+    ]
+    await asyncio.gather(
+        awrite_step_output(run, "variants.json", json.dumps(manifest, indent=2)),
+        awrite_step_output(run, "call_graph.mmd", mermaid_flowchart),
+        awrite_step_output(
+            run, "run_metrics.json", json.dumps(run_metrics, indent=2)
+        ),
+        awrite_step_output(
+            run, "validation.json", json.dumps(all_validation, indent=2)
+        ),
+    )
+    logger.info(
+        "Fan-out completed: %d/%d variants in %.1fs (%d LLM calls), stored at %s",
+        succeeded,
+        len(variants),
+        wall_time,
+        run_metrics["totals"]["llm_calls"],
+        run,
+    )
+
+    result = {
+        "run_id": run.run_id,
+        "run_dir": run.location,
+        "step1_general_context": context_block,
+        "step1_cache_hit": step1_cache_hit,
+        "step2_ideal_roles_prompt": roles_block,
+        "step2_cache_hit": step2_cache_hit,
+        "validation": validation,
+        "variants": results,
+        "mermaid_flowchart": mermaid_flowchart,
+        "call_graph": call_graph.as_dict(),
+        "run_metrics": run_metrics,
+    }
+    await emit(on_event, {"event": "run_complete", "result": result})
+    return result
+
@@ -1,9 +1,11 @@
 # app/graph_tracer.py
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Set, Tuple, Optional
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Set, Tuple, Optional
 import contextvars
+import time
 
 
 # Context variable to know "who is the current node"
@@ -11,41 +13,323 @@ _current_node: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
     "current_node", default=None
 )
 
+# Context variable holding the graph of the run being executed. Each run (and
+# each asyncio task it spawns) sees its own graph, so concurrent runs never
+# share state and no lock is needed.
+_current_graph: contextvars.ContextVar[Optional["CallGraph"]] = contextvars.ContextVar(
+    "current_graph", default=None
+)
+
+
+@dataclass
+class NodeMetrics:
+    """Timing and token counters accumulated for one traced node."""
+
+    calls: int = 0
+    wall_time_s: float = 0.0
+    # Time spent inside LLM requests issued from this node (incl. retry backoff)
+    llm_wait_s: float = 0.0
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    # Part of prompt_tokens served from the provider's prompt cache
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    # Outputs cut off by their max_tokens budget / stopped at their end marker
+    truncated: int = 0
+    early_stops: int = 0
+    # Outputs rejected by their validator and regenerated
+    invalid_outputs: int = 0
+
 
 @dataclass
 class CallGraph:
     nodes: Set[str] = field(default_factory=set)
     edges: Set[Tuple[str, str]] = field(default_factory=set)
+    metrics: Dict[str, NodeMetrics] = field(default_factory=dict)
+    # cache -> {"hits": n, "misses": n} for the lookups made during the run
+    cache_lookups: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # Near-duplicate hits: which cached call served which lookup
+    semantic_hits: List[Dict[str, Any]] = field(default_factory=list)
 
     def add_edge(self, src: str, dst: str) -> None:
         self.nodes.add(src)
         self.nodes.add(dst)
         self.edges.add((src, dst))
 
+    def node_metrics(self, name: str) -> NodeMetrics:
+        metrics = self.metrics.get(name)
+        if metrics is None:
+            metrics = self.metrics[name] = NodeMetrics()
+        return metrics
+
     def clear(self) -> None:
         self.nodes.clear()
         self.edges.clear()
+        self.metrics.clear()
+        self.cache_lookups.clear()
+        self.semantic_hits.clear()
+
+    def metrics_as_dict(self) -> Dict[str, Any]:
+        """Per-node metrics plus totals over the LLM-calling nodes."""
+        nodes = {name: asdict(m) for name, m in sorted(self.metrics.items())}
+        totals = {
+            key: sum(m[key] for m in nodes.values())
+            for key in (
+                "llm_wait_s",
+                "llm_calls",
+                "prompt_tokens",
+                "cached_prompt_tokens",
+                "completion_tokens",
+                "retries",
+                "truncated",
+                "early_stops",
+                "invalid_outputs",
+            )
+        }
+        return {
+            "nodes": nodes,
+            "totals": totals,
+            "cache_lookups": dict(sorted(self.cache_lookups.items())),
+            "semantic_hits": list(self.semantic_hits),
+        }
+
+    def as_dict(self) -> Dict[str, List]:
+        """JSON-friendly view of the graph (sorted for stable output)."""
+        return {
+            "nodes": sorted(self.nodes),
+            "edges": [list(edge) for edge in sorted(self.edges)],
+        }
 
     def as_mermaid_flowchart(self, direction: str = "LR") -> str:
         """
         Build a Mermaid flowchart definition based on the recorded edges.
 
+        Edges are labelled with the callee's wall time when it was measured.
+
         Example output:
 
         flowchart LR
-          pipeline --> generate_axis_unit_context
-          generate_axis_unit_context --> generate_ideal_roles
+          pipeline -->|12.31s| generate_axis_unit_context
+          generate_axis_unit_context -->|8.02s| generate_ideal_roles
           ...
         """
         lines = [f"flowchart {direction}"]
         # deterministic order for nicer diffs
         for src, dst in sorted(self.edges):
-            lines.append(f"  {src} --> {dst}")
+            metrics = self.metrics.get(dst)
+            if metrics is not None and metrics.calls:
+                lines.append(f"  {src} -->|{metrics.wall_time_s:.2f}s| {dst}")
+            else:
+                lines.append(f"  {src} --> {dst}")
         return "\n".join(lines)
 
 
-# Global graph instance for "last run"
-call_graph = CallGraph()
+@contextmanager
+def run_call_graph() -> Iterator[CallGraph]:
+    """
+    Scope a fresh CallGraph to the current run.
+
+    Usage:
+        with run_call_graph() as graph, trace_node("pipeline"):
+            ...
+        graph.as_mermaid_flowchart()
+    """
+    graph = CallGraph()
+    token = _current_graph.set(graph)
+    try:
+        yield graph
+    finally:
+        _current_graph.reset(token)
+
+
+class TraceObserver:
+    """
+    Process-wide hook notified of tracing events (e.g. to export metrics).
+
+    Subclasses override what they need; every method is a no-op by default.
+    Observers are called inline, so they must be cheap and must not raise.
+    """
+
+    def on_node_start(self, name: str) -> None:
+        pass
+
+    def on_node_end(self, name: str, elapsed_s: float, failed: bool) -> None:
+        pass
+
+    def on_llm_call(
+        self,
+        node: Optional[str],
+        model: Optional[str],
+        duration_s: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        retries: int,
+        cached_tokens: int = 0,
+    ) -> None:
+        pass
+
+    def on_llm_error(
+        self, node: Optional[str], model: Optional[str], error: str
+    ) -> None:
+        pass
+
+    def on_cache_lookup(self, cache: str, hit: bool) -> None:
+        pass
+
+    def on_output_stop(
+        self, node: Optional[str], model: Optional[str], reason: str
+    ) -> None:
+        pass
+
+    def on_llm_concurrency(self, model: str, limit: int) -> None:
+        pass
+
+    def on_run_complete(self, mode: str, totals: Dict[str, Any]) -> None:
+        pass
+
+
+_observers: List[TraceObserver] = []
+
+
+def register_observer(observer: TraceObserver) -> None:
+    """Subscribe an observer to tracing events (idempotent)."""
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def unregister_observer(observer: TraceObserver) -> None:
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def current_call_graph() -> Optional[CallGraph]:
+    """Return the graph of the run executing in this context, if any."""
+    return _current_graph.get()
+
+
+def _record_edge(parent: Optional[str], name: str) -> None:
+    graph = _current_graph.get()
+    if graph is not None and parent is not None and parent != name:
+        graph.add_edge(parent, name)
+
+
+def _record_node_start(name: str) -> None:
+    for observer in _observers:
+        observer.on_node_start(name)
+
+
+def _record_node_end(name: str, elapsed_s: float, failed: bool) -> None:
+    graph = _current_graph.get()
+    if graph is not None:
+        metrics = graph.node_metrics(name)
+        metrics.calls += 1
+        metrics.wall_time_s += elapsed_s
+    for observer in _observers:
+        observer.on_node_end(name, elapsed_s, failed)
+
+
+def record_llm_call(
+    duration_s: float,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    retries: int = 0,
+    model: Optional[str] = None,
+    cached_tokens: int = 0,
+) -> None:
+    """
+    Attribute one LLM request to the node currently executing.
+
+    Called by the model layer after each request. Per-run metrics are only
+    recorded inside a run; observers are always notified.
+    """
+    graph = _current_graph.get()
+    node = _current_node.get()
+    for observer in _observers:
+        observer.on_llm_call(
+            node,
+            model,
+            duration_s,
+            prompt_tokens,
+            completion_tokens,
+            retries,
+            cached_tokens,
+        )
+    if graph is None or node is None:
+        return
+    metrics = graph.node_metrics(node)
+    metrics.llm_calls += 1
+    metrics.llm_wait_s += duration_s
+    metrics.prompt_tokens += prompt_tokens
+    metrics.cached_prompt_tokens += cached_tokens
+    metrics.completion_tokens += completion_tokens
+    metrics.retries += retries
+
+
+def record_output_stop(reason: str, model: Optional[str] = None) -> None:
+    """
+    Report an LLM output that ended before the model finished it: "max_tokens"
+    (cut off by its token budget), "boundary" (stopped at its end marker) or
+    "invalid" (rejected by its validator, to be regenerated).
+    """
+    graph = _current_graph.get()
+    node = _current_node.get()
+    for observer in _observers:
+        observer.on_output_stop(node, model, reason)
+    if graph is None or node is None:
+        return
+    metrics = graph.node_metrics(node)
+    if reason == "max_tokens":
+        metrics.truncated += 1
+    elif reason == "invalid":
+        metrics.invalid_outputs += 1
+    else:
+        metrics.early_stops += 1
+
+
+def record_llm_error(error: BaseException, model: Optional[str] = None) -> None:
+    """Report a failed LLM attempt (retried or not) to the observers."""
+    node = _current_node.get()
+    for observer in _observers:
+        observer.on_llm_error(node, model, type(error).__name__)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Report a cache lookup outcome (e.g. the step 1 response cache)."""
+    graph = _current_graph.get()
+    if graph is not None:
+        counts = graph.cache_lookups.setdefault(cache, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+    for observer in _observers:
+        observer.on_cache_lookup(cache, hit)
+
+
+def record_semantic_hit(
+    cache: str, source_key: str, similarity: float, matched: Dict[str, str]
+) -> None:
+    """Report which cached call (`source_key`) a near-duplicate hit reused."""
+    graph = _current_graph.get()
+    if graph is not None:
+        graph.semantic_hits.append(
+            {
+                "cache": cache,
+                "source_key": source_key,
+                "similarity": round(similarity, 4),
+                "matched": matched,
+            }
+        )
+
+
+def record_llm_concurrency(model: str, limit: int) -> None:
+    """Report a change of the adaptive LLM concurrency limit."""
+    for observer in _observers:
+        observer.on_llm_concurrency(model, limit)
+
+
+def record_run_totals(mode: str, totals: Dict[str, Any]) -> None:
+    """Report a finished run's LLM totals (see `CallGraph.metrics_as_dict`)."""
+    for observer in _observers:
+        observer.on_run_complete(mode, totals)
 
 
 class trace_node:
@@ -62,21 +346,27 @@ class trace_node:
             ...
 
     Whenever a traced node is entered from another traced node, we record
-    an edge (caller -> callee).
+    an edge (caller -> callee) in the graph of the current run (see
+    `run_call_graph`), together with the node's wall time. Outside of a run,
+    nothing is recorded.
     """
 
     def __init__(self, name: str):
         self.name = name
         self._token = None
+        self._started = 0.0
 
     def __enter__(self):
-        parent = _current_node.get()
-        if parent is not None and parent != self.name:
-            call_graph.add_edge(parent, self.name)
+        _record_edge(_current_node.get(), self.name)
         self._token = _current_node.set(self.name)
+        _record_node_start(self.name)
+        self._started = time.perf_counter()
         return self
 
     def __exit__(self, exc_type, exc, tb):
+        _record_node_end(
+            self.name, time.perf_counter() - self._started, exc_type is not None
+        )
         if self._token is not None:
             _current_node.reset(self._token)
 
@@ -85,13 +375,17 @@ class trace_node:
         name = self.name
 
         def wrapper(*args, **kwargs):
-            parent = _current_node.get()
-            if parent is not None and parent != name:
-                call_graph.add_edge(parent, name)
+            _record_edge(_current_node.get(), name)
             token = _current_node.set(name)
+            _record_node_start(name)
+            started = time.perf_counter()
+            failed = True
             try:
-                return fn(*args, **kwargs)
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
             finally:
+                _record_node_end(name, time.perf_counter() - started, failed)
                 _current_node.reset(token)
 
         wrapper.__name__ = fn.__name__
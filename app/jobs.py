@@ -0,0 +1,215 @@
+"""Background job mode: queued pipeline runs with polling, backed by SQLite."""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .agents.scheduler import PRIORITY_BATCH, priority_lane
+from .config.settings import Settings
+from .main import execute_pipeline_async
+from .schemas import RunRequest, settings_for_request
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobStore:
+    """Persists jobs (request, status, partial step outputs) in SQLite."""
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            Path(path).expanduser().resolve().parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                request_json TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                run_dir TEXT,
+                current_step INTEGER,
+                steps_json TEXT NOT NULL DEFAULT '{}',
+                error TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        self._conn.commit()
+
+    def create(self, req: RunRequest) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request_json, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, req.model_dump_json(), _now()),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if not fields:
+            return
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+            )
+            self._conn.commit()
+
+    def record_step(self, job_id: str, step: int, name: str, output: str) -> None:
+        """Store a completed step's output so pollers can read it early."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT steps_json FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            steps = json.loads(row["steps_json"]) if row else {}
+            steps[name] = output
+            self._conn.execute(
+                "UPDATE jobs SET steps_json = ?, current_step = ? WHERE id = ?",
+                (json.dumps(steps, ensure_ascii=False), step, job_id),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job.pop("request_json"))
+        job["steps"] = json.loads(job.pop("steps_json"))
+        return job
+
+    def unfinished(self) -> List[str]:
+        """Ids of jobs that were queued or running, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (JOB_QUEUED, JOB_RUNNING),
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+
+class JobManager:
+    """
+    Bounded pool of asyncio workers draining a queue of job ids.
+
+    Jobs left queued or running by a previous process are re-queued on start.
+    """
+
+    def __init__(self, base_settings: Settings, store: JobStore, workers: int):
+        self.base_settings = base_settings
+        self.store = store
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        for job_id in await asyncio.to_thread(self.store.unfinished):
+            await asyncio.to_thread(self.store.update, job_id, status=JOB_QUEUED)
+            self.queue.put_nowait(job_id)
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name=f"job-worker-{index}")
+            for index in range(self.workers)
+        ]
+        logger.info(
+            "Job manager started with %d workers (%d jobs re-queued)",
+            self.workers,
+            self.queue.qsize(),
+        )
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, req: RunRequest) -> str:
+        job_id = await asyncio.to_thread(self.store.create, req)
+        self.queue.put_nowait(job_id)
+        logger.info("Queued job %s (queue depth %d)", job_id, self.queue.qsize())
+        return job_id
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception:  # never let one job kill the worker
+                logger.exception("Worker %d crashed on job %s", index, job_id)
+            finally:
+                self.queue.task_done()
+
+    async def _run_job(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None:
+            return
+        req = RunRequest.model_validate(job["request"])
+        # A job interrupted mid-run (e.g. by a restart) continues its own run
+        resume = req.resume
+        if job["run_dir"]:
+            resume = Path(job["run_dir"]).name
+        await asyncio.to_thread(
+            self.store.update, job_id, status=JOB_RUNNING, started_at=_now()
+        )
+
+        async def on_event(event: Dict[str, Any]) -> None:
+            if event["event"] == "run_start":
+                await asyncio.to_thread(
+                    self.store.update, job_id, run_dir=event["run_dir"]
+                )
+            elif event["event"] == "step_complete":
+                await asyncio.to_thread(
+                    self.store.record_step,
+                    job_id,
+                    event["step"],
+                    Path(event["artefact"]).stem,
+                    event["output"],
+                )
+
+        try:
+            # Jobs are polled, not awaited: yield to interactive requests
+            with priority_lane(PRIORITY_BATCH):
+                await execute_pipeline_async(
+                    settings_for_request(self.base_settings, req),
+                    emit_console=False,
+                    use_cache=not req.bypass_cache,
+                    on_event=on_event,
+                    resume=resume,
+                    follow_up=req.message,
+                )
+        except Exception as exc:
+            logger.exception("Job %s failed", job_id)
+            await asyncio.to_thread(
+                self.store.update,
+                job_id,
+                status=JOB_FAILED,
+                finished_at=_now(),
+                error=f"{type(exc).__name__}: {exc}",
+            )
+        else:
+            await asyncio.to_thread(
+                self.store.update, job_id, status=JOB_SUCCEEDED, finished_at=_now()
+            )
@@ -1,71 +1,373 @@
+import argparse
+import asyncio
+import hashlib
+import json
 import logging
-import re
-from datetime import datetime
 from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from langchain_core.tools import BaseTool
 
 from .config import load_settings
 from .logging_config import setup_logging
 from .config.settings import Settings
+from .agents.context import RunContext
+from .agents.prompts import template_versions
+from .agents.scheduler import current_priority
 from .agents.tools import (
     generate_axis_unit_context,
     generate_ideal_roles,
     generate_actionable_context,
+    prepare_actionable_context,
+    tool_call_key,
+    warm_actionable_context_cache,
+)
+from .artefacts import StoredRun, get_artefact_store
+from .checkpoints import RunCheckpoints
+from .dag import TaskGraph
+from .graph_tracer import (  # graph utilities
+    record_cache_lookup,
+    record_run_totals,
+    run_call_graph,
+    trace_node,
+)
+from .singleflight import SingleFlight
+from .steps import (
+    EventCallback,
+    agenerate_general_context,
+    agenerate_ideal_roles,
+    arun_tool,
+    awrite_step_output,
+    create_run,
+    emit,
+    print_run_footer,
+    print_run_header,
+    print_step_result,
+    validation_report,
 )
-from .graph_tracer import call_graph, trace_node  # graph utilities
 
 logger = logging.getLogger(__name__)
 
+# Settings that determine a run's outputs
+_RUN_FIELDS = (
+    "AXIS_OF_EXPLORATION",
+    "UNIT_OF_ANALYSIS",
+    "COUNTRY",
+    "IDEAL_ROLES",
+    "EXTERNAL_RESEARCH",
+    "CONSTRAINTS",
+    "COMPLEX_UNIT",
+    "EXECUTION_MODE",
+    "STATIC_TODO",
+)
 
-def _make_slug(text: str, max_len: int = 40) -> str:
-    """Create a simple filesystem-safe slug from a string."""
-    text = text.strip().lower()
-    text = re.sub(r"[^a-z0-9]+", "-", text)
-    text = re.sub(r"-{2,}", "-", text).strip("-")
-    if len(text) > max_len:
-        text = text[:max_len].rstrip("-")
-    return text or "run"
+EXECUTION_MODES = ("pipeline", "agent")
 
+# Coalesce identical concurrent runs into one computation
+_pipeline_flights = SingleFlight()
+# Flight key -> progress events of that run, for the callers sharing it
+_flight_events: Dict[str, "_RunEvents"] = {}
 
-def _create_run_directory(settings: Settings) -> Path:
-    """Create a per-run directory based on .env OUTPUT_BASE_DIR and timestamp."""
-    base_dir = Path(settings.OUTPUT_BASE_DIR).expanduser().resolve()
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    axis_slug = _make_slug(settings.AXIS_OF_EXPLORATION)
-    unit_slug = _make_slug(settings.UNIT_OF_ANALYSIS)
+def _normalize(value: Any) -> Any:
+    """Case- and whitespace-insensitive form of a setting value."""
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return value
 
-    run_name = f"{timestamp}__axis-{axis_slug}__unit-{unit_slug}"
-    run_dir = base_dir / run_name
-    run_dir.mkdir(parents=True, exist_ok=True)
 
-    logger.info("Created run directory at %s", run_dir)
-    return run_dir
+def _run_signature(settings: Settings) -> Dict[str, Any]:
+    """The normalized settings that determine a run's outputs."""
+    return {field: _normalize(getattr(settings, field)) for field in _RUN_FIELDS}
 
 
-def _write_step_output(run_dir: Path, filename: str, content: str) -> Path:
-    """Write a single step's output to a file in the run directory."""
-    path = run_dir / filename
-    path.write_text(content, encoding="utf-8")
-    logger.info("Wrote artefact: %s", path)
-    return path
+def _pipeline_flight_key(
+    settings: Settings,
+    use_cache: bool,
+    resume: Optional[str],
+    follow_up: Optional[str] = None,
+) -> str:
+    payload = {
+        "settings": _run_signature(settings),
+        "use_cache": use_cache,
+        "resume": resume,
+        "follow_up": follow_up,
+        # A flight's LLM calls keep its first caller's lane: an interactive
+        # run must not wait in the batch lane behind a batch run it joined
+        "priority": current_priority(),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class _EventListener:
+    """One caller's callback, fed the run's events in order from the start."""
+
+    def __init__(self, on_event: EventCallback, events: List[Dict[str, Any]]):
+        self.on_event = on_event
+        self.error: Optional[Exception] = None
+        self._events = events
+        self._sent = 0
+        self._lock = asyncio.Lock()
+
+    async def catch_up(self) -> None:
+        async with self._lock:
+            while self._sent < len(self._events) and self.error is None:
+                event = self._events[self._sent]
+                self._sent += 1
+                try:
+                    await self.on_event(event)
+                except Exception as exc:
+                    # This caller's failure only: the shared run goes on
+                    logger.exception("Event callback failed")
+                    self.error = exc
+
+
+class _RunEvents:
+    """
+    Progress events of a coalesced run. A caller joining late first gets the
+    events emitted so far, so every caller sees the whole run.
+    """
 
+    def __init__(self) -> None:
+        self._events: List[Dict[str, Any]] = []
+        self._listeners: List[_EventListener] = []
+
+    def join(self, on_event: EventCallback) -> _EventListener:
+        listener = _EventListener(on_event, self._events)
+        self._listeners.append(listener)
+        return listener
+
+    def leave(self, listener: _EventListener) -> None:
+        self._listeners.remove(listener)
+
+    async def emit(self, event: Dict[str, Any]) -> None:
+        self._events.append(event)
+        for listener in list(self._listeners):
+            await listener.catch_up()
+
+
+class _StepResult(NamedTuple):
+    output: str
+    resumed: bool
+    input_hash: str
+    cache_hit: bool = False
+
+
+async def _load_checkpoint(
+    checkpoints: RunCheckpoints, tool: BaseTool, input_hash: str
+) -> Optional[str]:
+    """The output of a step already completed with these inputs, if any."""
+    output = await asyncio.to_thread(checkpoints.load, tool.name, input_hash)
+    if output is not None:
+        logger.info("Resuming `%s` from its checkpoint", tool.name)
+    return output
+
+
+async def _save_step(
+    run: StoredRun,
+    checkpoints: RunCheckpoints,
+    tool: BaseTool,
+    input_hash: str,
+    filename: str,
+    content: str,
+) -> None:
+    """Write a step's artefact, then checkpoint it as completed."""
+    await awrite_step_output(run, filename, content)
+    await asyncio.to_thread(checkpoints.save, tool.name, input_hash, filename, content)
+
+
+async def _aresume_or_run(
+    step: int,
+    tool: BaseTool,
+    inputs: Dict[str, Any],
+    compute: Callable[[], Awaitable[str]],
+    context: RunContext,
+    checkpoints: RunCheckpoints,
+    on_event: Optional[EventCallback],
+) -> _StepResult:
+    """Run one traced step, unless its checkpoint (same inputs) can be reused."""
+    await emit(on_event, {"event": "step_start", "step": step, "name": tool.name})
+    input_hash = tool_call_key(context, tool.name, inputs)
+    with trace_node(tool.name):
+        output = await _load_checkpoint(checkpoints, tool, input_hash)
+        if output is not None:
+            return _StepResult(output, True, input_hash)
+        return _StepResult(await compute(), False, input_hash)
+
+
+async def execute_pipeline_async(
+    settings: Settings,
+    emit_console: bool = False,
+    use_cache: bool = True,
+    on_event: Optional[EventCallback] = None,
+    shared_step1: Optional[Dict[tuple, "asyncio.Future"]] = None,
+    resume: Optional[str] = None,
+    follow_up: Optional[str] = None,
+) -> dict:
+    """
+    Run the pipeline, coalescing identical concurrent runs.
+
+    Non-console runs whose normalized settings and priority lane match a run
+    already in flight share that run's result, including its run_dir;
+    `result["coalesced"]` tells whether this call did the work. A caller
+    with `on_event` gets all of the shared run's events, replayed from the
+    start if it joins late. Console runs always execute, but still share
+    identical step calls (see `arun_tool`). See `_execute_pipeline_async`
+    for the result contents.
+
+    `follow_up` is an instruction for an agent-mode thread (with `resume`).
+    """
+    if emit_console:
+        return await _execute_run_async(
+            settings,
+            emit_console,
+            use_cache,
+            on_event,
+            shared_step1,
+            resume,
+            follow_up,
+        )
 
-def execute_pipeline(settings: Settings, emit_console: bool = True) -> dict:
+    key = _pipeline_flight_key(settings, use_cache, resume, follow_up)
+    # No await until the flight is joined: the events always match it
+    events = _flight_events.get(key)
+    if events is None:
+        events = _flight_events[key] = _RunEvents()
+    listener = events.join(on_event) if on_event is not None else None
+
+    async def run() -> dict:
+        try:
+            return await _execute_run_async(
+                settings,
+                emit_console,
+                use_cache,
+                events.emit,
+                shared_step1,
+                resume,
+                follow_up,
+            )
+        finally:
+            if _flight_events.get(key) is events:
+                del _flight_events[key]
+
+    if listener is None:
+        result, shared = await _pipeline_flights.do(key, run)
+    else:
+        # Replays what an in-flight run already emitted
+        replay = asyncio.ensure_future(listener.catch_up())
+        try:
+            result, shared = await _pipeline_flights.do(key, run)
+            await replay
+            await listener.catch_up()
+        finally:
+            replay.cancel()
+            events.leave(listener)
+        if listener.error is not None:
+            raise listener.error
+    record_cache_lookup("pipeline_singleflight", shared)
+    if shared:
+        logger.info("Coalesced with an identical in-flight run: %s", result["run_dir"])
+    return {**result, "coalesced": shared}
+
+
+async def _execute_run_async(
+    settings: Settings,
+    emit_console: bool,
+    use_cache: bool,
+    on_event: Optional[EventCallback],
+    shared_step1: Optional[Dict[tuple, "asyncio.Future"]],
+    resume: Optional[str] = None,
+    follow_up: Optional[str] = None,
+) -> dict:
+    """
+    Execute a run in its EXECUTION_MODE.
+
+    Agent mode (see `agent_mode.py`) does not use the step 1 cache or
+    `shared_step1`; `resume` continues its persisted agent thread.
+    """
+    if settings.EXECUTION_MODE not in EXECUTION_MODES:
+        raise ValueError(f"EXECUTION_MODE must be one of {EXECUTION_MODES}")
+    if settings.EXECUTION_MODE == "pipeline":
+        if follow_up:
+            raise ValueError("Follow-up messages need EXECUTION_MODE='agent'")
+        return await _execute_pipeline_async(
+            settings, emit_console, use_cache, on_event, shared_step1, resume
+        )
+
+    from .agent_mode import execute_agent_async
+
+    return await execute_agent_async(
+        settings, emit_console, on_event, resume, follow_up
+    )
+
+
+async def _execute_pipeline_async(
+    settings: Settings,
+    emit_console: bool,
+    use_cache: bool,
+    on_event: Optional[EventCallback],
+    shared_step1: Optional[Dict[tuple, "asyncio.Future"]],
+    resume: Optional[str] = None,
+) -> dict:
     """
     Core pipeline logic, reusable from CLI and FastAPI.
 
-    Sequential steps:
+    Three dependent LLM steps (awaited via the tools' `ainvoke`):
 
       1. Generate the general context for AXIS × UNIT.
       2. From that context, generate the ideal roles prompt opening.
       3. From roles + context, generate an actionable analytical context brief.
 
+    The run is executed as a small DAG (`TaskGraph`), so work that does not
+    depend on the previous LLM call overlaps with it: each step's artefact
+    and checkpoint are written while the next step runs, and step 3's static
+    prompt part is assembled and token-counted (and, with
+    PROMPT_CACHE_WARMUP, sent ahead to warm the prompt cache) while step 2
+    is in flight. `run_metrics["dag"]` holds the task timings and the
+    critical path that determined the run's latency.
+
+    Step 1 only depends on AXIS × UNIT, so it is served from the response
+    cache when possible; pass `use_cache=False` to force a fresh generation.
+    Runs started together can pass the same `shared_step1` dict to compute
+    step 1 only once per AXIS × UNIT.
+
+    Each completed step is checkpointed in the run directory with a hash of
+    its inputs. Passing `resume=<run_id>` (the name of an earlier run's
+    directory) continues that run: steps whose inputs are unchanged are
+    loaded from their artefacts instead of calling the LLM again. An unknown
+    run ID raises `RunNotFoundError`.
+
+    If `on_event` is given, progress is reported as it happens and each
+    step's LLM call is streamed. Events are dicts with an `event` key:
+
+      - run_start      {run_dir}
+      - step_start     {step, name}
+      - token          {step, delta}
+      - step_retry     {step, attempt, errors}
+      - step_complete  {step, name, artefact, output, resumed[, cache_hit]}
+      - run_complete   {result}
+
+    `step_complete` is sent as soon as the output is known; its artefact is
+    written concurrently with the next step. Each step's output is validated
+    while it streams (see `agenerate_validated`); `step_retry` means the
+    step's tokens so far were rejected and are being regenerated.
+
     Returns a dict with:
+      - run_id (str): the run directory's name, usable with `resume`
       - run_dir (str)
+      - resumed_steps (list of int): steps loaded from checkpoints
       - step1_general_context
+      - step1_cache_hit (bool): step 1 was served without its own LLM call
       - step2_ideal_roles_prompt
       - step3_actionable_context_brief
+      - validation (dict): per step artefact, whether its output passed its
+        structural checks and the errors found (also in validation.json)
       - mermaid_flowchart (str)
+      - call_graph (dict): nodes and edges traced during this run only
+      - run_metrics (dict): per-node timings, token counts (incl. prompt-cache
+        reads) and retries, DAG task timings and critical path, and the
+        prompt template versions used
     """
     logger.info(
         "Executing pipeline: axis=%s | unit=%s | ideal_roles=%s",
@@ -74,147 +376,431 @@ def execute_pipeline(settings: Settings, emit_console: bool = True) -> dict:
         settings.IDEAL_ROLES,
     )
 
-    # Reset call graph for this run
-    call_graph.clear()
-
-    # Create run directory
-    run_dir = _create_run_directory(settings)
+    # Resolve the run's frozen settings + model routes once; tools get them
+    # through their RunnableConfig instead of re-reading the environment
+    context = RunContext.from_settings(settings)
+    settings = context.settings
 
-    # Trace the overall pipeline
-    with trace_node("pipeline"):
+    # Create the run, or reopen the one being resumed
+    if resume:
+        run = await asyncio.to_thread(
+            get_artefact_store(settings).open_run, resume
+        )
+        logger.info("Resuming run %s", run)
+    else:
+        run = await asyncio.to_thread(create_run, settings)
+    checkpoints = await asyncio.to_thread(RunCheckpoints, run)
+    resumed_steps: List[int] = []
+
+    # Trace the overall pipeline into a graph scoped to this run
+    with run_call_graph() as call_graph, trace_node("pipeline"):
         if emit_console:
-            print("\n🌐 BIG – Agentic Pipeline Run")
-            print("====================================")
-            print("We will now perform three internal steps:")
-            print("  1️⃣ Generate a general analytical context for your AXIS × UNIT")
-            print("  2️⃣ From that context, generate the ideal roles prompt opening")
-            print(
-                "  3️⃣ Using both, generate a rigorous, actionable analytical context brief\n"
-            )
-
-            print(f"   AXIS_OF_EXPLORATION: {settings.AXIS_OF_EXPLORATION}")
-            print(f"   UNIT_OF_ANALYSIS   : {settings.UNIT_OF_ANALYSIS}")
-            print(f"   COUNTRY            : {settings.COUNTRY}")
-            print(f"   IDEAL_ROLES        : {settings.IDEAL_ROLES}")
-            print(
-                f"   EXTERNAL_RESEARCH  : "
-                f"{'yes' if settings.EXTERNAL_RESEARCH else 'no'}"
-            )
-            print(f"   CONSTRAINTS        : {settings.CONSTRAINTS or 'none specified'}")
-            print(f"   COMPLEX_UNIT       : {'yes' if settings.COMPLEX_UNIT else 'no'}\n")
-
-            print(f"📁 This run will be saved to: {run_dir}\n")
-            print("🚀 Launching sub-agents...\n")
+            print_run_header(settings, run)
+        await emit(on_event, {"event": "run_start", "run_dir": run.location})
 
         # ---------------------------
         # STEP 1: General context
         # ---------------------------
-        logger.info(
-            "Step 1/3: generating general context via `generate_axis_unit_context`"
-        )
-
-        with trace_node("generate_axis_unit_context"):
-            context_block = generate_axis_unit_context.invoke(
+        async def step1() -> _StepResult:
+            logger.info(
+                "Step 1/3: generating general context via `generate_axis_unit_context`"
+            )
+            cache_hit = False
+
+            async def compute() -> str:
+                nonlocal cache_hit
+                block, cache_hit = await agenerate_general_context(
+                    context, use_cache, on_event, shared_step1
+                )
+                return block
+
+            result = await _aresume_or_run(
+                1,
+                generate_axis_unit_context,
                 {
                     "axis": settings.AXIS_OF_EXPLORATION,
                     "unit": settings.UNIT_OF_ANALYSIS,
-                }
+                },
+                compute,
+                context,
+                checkpoints,
+                on_event,
             )
-
-        _write_step_output(run_dir, "step1_general_context.md", context_block)
-
-        if emit_console:
-            print("✅ Step 1/3 completed.\n")
-            print("====================================")
-            print("STEP 1/3 – General context for AXIS × UNIT")
-            print("====================================\n")
-            print(context_block)
-            print("\n------------------------------------\n")
+            if result.resumed:
+                resumed_steps.append(1)
+            # A resumed step 1 did not need its own LLM call either
+            cache_hit = cache_hit or result.resumed
+            await emit(
+                on_event,
+                {
+                    "event": "step_complete",
+                    "step": 1,
+                    "name": "generate_axis_unit_context",
+                    "artefact": "step1_general_context.md",
+                    "output": result.output,
+                    "resumed": result.resumed,
+                    "cache_hit": cache_hit,
+                },
+            )
+            if emit_console:
+                print_step_result(
+                    1, "General context for AXIS × UNIT", result.output, result.resumed
+                )
+            return result._replace(cache_hit=cache_hit)
 
         # ---------------------------
         # STEP 2: Ideal roles prompt
         # ---------------------------
-        logger.info("Step 2/3: generating ideal roles via `generate_ideal_roles`")
-
-        with trace_node("generate_ideal_roles"):
-            roles_block = generate_ideal_roles.invoke(
+        async def step2(context_result: _StepResult) -> _StepResult:
+            logger.info("Step 2/3: generating ideal roles via `generate_ideal_roles`")
+            inputs = {
+                "context": context_result.output,
+                "n_roles": settings.IDEAL_ROLES,
+            }
+            cache_hit = False
+
+            async def compute() -> str:
+                nonlocal cache_hit
+                block, cache_hit = await agenerate_ideal_roles(
+                    context, inputs, use_cache, on_event
+                )
+                return block
+
+            result = await _aresume_or_run(
+                2,
+                generate_ideal_roles,
+                inputs,
+                compute,
+                context,
+                checkpoints,
+                on_event,
+            )
+            if result.resumed:
+                resumed_steps.append(2)
+            await emit(
+                on_event,
                 {
-                    "context": context_block,
-                    "n_roles": settings.IDEAL_ROLES,
-                }
+                    "event": "step_complete",
+                    "step": 2,
+                    "name": "generate_ideal_roles",
+                    "artefact": "step2_ideal_roles_prompt.md",
+                    "output": result.output,
+                    "resumed": result.resumed,
+                    "cache_hit": cache_hit,
+                },
             )
+            if emit_console:
+                print_step_result(
+                    2, "Ideal roles prompt opening", result.output, result.resumed
+                )
+            return result._replace(cache_hit=cache_hit)
 
-        _write_step_output(run_dir, "step2_ideal_roles_prompt.md", roles_block)
+        # ---------------------------
+        # Step 3 prefetch (runs while step 2 is in flight)
+        # ---------------------------
+        async def prepare_step3(context_result: _StepResult) -> int:
+            # Build + token-count the part of step 3's prompt that does not
+            # depend on step 2 (static rules + general context): its
+            # cacheable prefix
+            return await asyncio.to_thread(
+                prepare_actionable_context, context, context_result.output
+            )
 
-        if emit_console:
-            print("✅ Step 2/3 completed.\n")
-            print("====================================")
-            print("STEP 2/3 – Ideal roles prompt opening")
-            print("====================================\n")
-            print(roles_block)
-            print("\n------------------------------------\n")
+        async def warm_step3_cache(context_result: _StepResult, _: int) -> None:
+            with trace_node("prompt_cache_warmup"):
+                try:
+                    await warm_actionable_context_cache(context, context_result.output)
+                except Exception as exc:  # an optimisation only, never fatal
+                    logger.warning("Prompt cache warmup failed: %s", exc)
 
         # ---------------------------
         # STEP 3: Actionable context brief
         # ---------------------------
-        logger.info(
-            "Step 3/3: generating actionable analytical context via "
-            "`generate_actionable_context`"
-        )
-
-        with trace_node("generate_actionable_context"):
-            actionable_block = generate_actionable_context.invoke(
+        async def step3(
+            context_result: _StepResult, roles_result: _StepResult, *_: Any
+        ) -> _StepResult:
+            logger.info(
+                "Step 3/3: generating actionable analytical context via "
+                "`generate_actionable_context`"
+            )
+            inputs = {
+                "roles_prompt": roles_result.output,
+                "general_context": context_result.output,
+            }
+            result = await _aresume_or_run(
+                3,
+                generate_actionable_context,
+                inputs,
+                lambda: arun_tool(
+                    generate_actionable_context, inputs, 3, on_event, context
+                ),
+                context,
+                checkpoints,
+                on_event,
+            )
+            if result.resumed:
+                resumed_steps.append(3)
+            await emit(
+                on_event,
                 {
-                    "roles_prompt": roles_block,
-                    "general_context": context_block,
-                }
+                    "event": "step_complete",
+                    "step": 3,
+                    "name": "generate_actionable_context",
+                    "artefact": "step3_actionable_context_brief.md",
+                    "output": result.output,
+                    "resumed": result.resumed,
+                },
             )
-
-        _write_step_output(
-            run_dir, "step3_actionable_context_brief.md", actionable_block
+            if emit_console:
+                print_step_result(
+                    3,
+                    "Actionable analytical context brief (final output)",
+                    result.output,
+                    result.resumed,
+                )
+            return result
+
+        def save(tool: BaseTool, filename: str) -> Callable[..., Awaitable[None]]:
+            async def save_step(result: _StepResult) -> None:
+                if not result.resumed:
+                    await _save_step(
+                        run,
+                        checkpoints,
+                        tool,
+                        result.input_hash,
+                        filename,
+                        result.output,
+                    )
+
+            return save_step
+
+        # Artefact writes, step 3's prompt assembly and the optional cache
+        # warmup overlap with the LLM calls instead of adding to the latency
+        dag = TaskGraph()
+        dag.add("step1", step1)
+        dag.add(
+            "save_step1",
+            save(generate_axis_unit_context, "step1_general_context.md"),
+            deps=["step1"],
         )
-
-        if emit_console:
-            print("✅ Step 3/3 completed.\n")
-            print("====================================")
-            print("STEP 3/3 – Actionable analytical context brief (final output)")
-            print("====================================\n")
-            print(actionable_block)
-
-            print(
-                f"\n📝 All artefacts for this run are saved under:\n   {run_dir}\n"
-                "   - step1_general_context.md\n"
-                "   - step2_ideal_roles_prompt.md\n"
-                "   - step3_actionable_context_brief.md\n"
+        dag.add("step2", step2, deps=["step1"])
+        dag.add(
+            "save_step2",
+            save(generate_ideal_roles, "step2_ideal_roles_prompt.md"),
+            deps=["step2"],
+        )
+        dag.add("prepare_step3", prepare_step3, deps=["step1"])
+        step3_deps = ["step1", "step2", "prepare_step3"]
+        if settings.PROMPT_CACHE_WARMUP and not resume:
+            dag.add(
+                "prompt_cache_warmup",
+                warm_step3_cache,
+                deps=["step1", "prepare_step3"],
             )
+            step3_deps.append("prompt_cache_warmup")
+        dag.add("step3", step3, deps=step3_deps)
+        dag.add(
+            "save_step3",
+            save(generate_actionable_context, "step3_actionable_context_brief.md"),
+            deps=["step3"],
+        )
+        results = await dag.run()
 
-            print(
-                "🎯 End of run – you can now reuse the final brief above as the "
-                "context input for downstream ideation or opportunity generation."
-            )
+        if emit_console:
+            print_run_footer(run)
+
+    context_block = results["step1"].output
+    step1_cache_hit = results["step1"].cache_hit
+    roles_block = results["step2"].output
+    actionable_block = results["step3"].output
+    validation = validation_report(
+        settings,
+        {
+            "step1_general_context.md": (
+                generate_axis_unit_context.name,
+                context_block,
+            ),
+            "step2_ideal_roles_prompt.md": (generate_ideal_roles.name, roles_block),
+            "step3_actionable_context_brief.md": (
+                generate_actionable_context.name,
+                actionable_block,
+            ),
+        },
+    )
 
     # After the pipeline finishes, build the Mermaid graph
     mermaid_flowchart = call_graph.as_mermaid_flowchart(direction="LR")
-    mermaid_path = _write_step_output(run_dir, "call_graph.mmd", mermaid_flowchart)
-    logger.info("Call graph Mermaid diagram written to %s", mermaid_path)
 
-    logger.info("Run completed successfully. Artefacts stored at %s", run_dir)
+    # Per-node wall time, LLM wait, token usage and retries for this run, plus
+    # the DAG task timings and the critical path that set its latency
+    run_metrics = call_graph.metrics_as_dict()
+    run_metrics["dag"] = dag.as_dict()
+    run_metrics["step3_static_prompt_tokens"] = results["prepare_step3"]
+    run_metrics["prompt_templates"] = template_versions()
+    run_metrics["mode"] = "pipeline"
+    record_run_totals("pipeline", run_metrics["totals"])
+    logger.info(
+        "Critical path %.2fs: %s",
+        run_metrics["dag"]["critical_path_s"],
+        " -> ".join(run_metrics["dag"]["critical_path"]),
+    )
+
+    await asyncio.gather(
+        awrite_step_output(run, "call_graph.mmd", mermaid_flowchart),
+        awrite_step_output(
+            run, "run_metrics.json", json.dumps(run_metrics, indent=2)
+        ),
+        awrite_step_output(run, "validation.json", json.dumps(validation, indent=2)),
+    )
 
-    return {
-        "run_dir": str(run_dir),
+    logger.info("Run completed successfully. Artefacts stored at %s", run)
+
+    result = {
+        "run_id": run.run_id,
+        "run_dir": run.location,
+        "resumed_steps": resumed_steps,
         "step1_general_context": context_block,
+        "step1_cache_hit": step1_cache_hit,
         "step2_ideal_roles_prompt": roles_block,
         "step3_actionable_context_brief": actionable_block,
+        "validation": validation,
         "mermaid_flowchart": mermaid_flowchart,
+        "call_graph": call_graph.as_dict(),
+        "run_metrics": run_metrics,
     }
+    await emit(on_event, {"event": "run_complete", "result": result})
+    return result
+
 
+def execute_pipeline(
+    settings: Settings,
+    emit_console: bool = True,
+    use_cache: bool = True,
+    resume: Optional[str] = None,
+) -> dict:
+    """
+    Synchronous entrypoint around `execute_pipeline_async`.
 
-def run_once() -> None:
+    Runs the async pipeline on a fresh event loop, so it must not be called
+    from inside a running loop (use `execute_pipeline_async` there instead).
+    """
+    return asyncio.run(
+        execute_pipeline_async(
+            settings, emit_console=emit_console, use_cache=use_cache, resume=resume
+        )
+    )
+
+
+def run_once(resume: Optional[str] = None, mode: Optional[str] = None) -> None:
     """CLI entrypoint: load settings, configure logging, execute pipeline with console output."""
     settings: Settings = load_settings()
+    if mode:
+        settings = settings.model_copy(update={"EXECUTION_MODE": mode})
     setup_logging(settings)
-    execute_pipeline(settings, emit_console=True)
+    execute_pipeline(settings, emit_console=True, resume=resume)
+
+
+def run_batch(requests_path: str, concurrency: Optional[int] = None) -> dict:
+    """
+    CLI entrypoint for batch runs.
+
+    `requests_path` is a JSON file holding a list of RunRequest objects, e.g.
+    [{"axis_of_exploration": "...", "unit_of_analysis": "...", "country": "FR"}].
+    Settings not overridden per item come from .env, as for `run_once`.
+    """
+    from .batch import execute_batch_async
+    from .schemas import RunRequest
+
+    settings: Settings = load_settings()
+    setup_logging(settings)
+
+    raw = json.loads(Path(requests_path).read_text(encoding="utf-8"))
+    requests = [RunRequest.model_validate(item) for item in raw]
+
+    summary = asyncio.run(execute_batch_async(settings, requests, concurrency))
+
+    print(
+        f"\n📦 Batch finished: {summary['succeeded']}/{summary['total']} runs "
+        f"succeeded in {summary['wall_time_s']}s "
+        f"({summary['throughput_runs_per_min']} runs/min)"
+    )
+    for item in summary["items"]:
+        marker = "✅" if item["status"] == "succeeded" else "❌"
+        detail = item.get("run_dir") or item.get("error")
+        print(f"  {marker} #{item['index']} {item['unit_of_analysis']}: {detail}")
+    print(f"\n📝 Batch summary saved under:\n   {summary['batch_dir']}\n")
+    return summary
+
+
+def run_fanout(countries: List[str], constraint_variants: List[str]) -> dict:
+    """CLI entrypoint for a fan-out run of the .env AXIS × UNIT."""
+    from .fanout import execute_fanout_async
+
+    settings: Settings = load_settings()
+    setup_logging(settings)
+    result = asyncio.run(
+        execute_fanout_async(settings, countries, constraint_variants)
+    )
+
+    variants = result["variants"]
+    print(f"\n🌍 Fan-out finished: shared steps 1-2 + {len(variants)} briefs")
+    for variant in variants:
+        marker = "✅" if variant["status"] == "succeeded" else "❌"
+        detail = variant["artefact"] if marker == "✅" else variant["error"]
+        print(f"  {marker} {variant['variant_id']}: {detail}")
+    print(f"\n📝 All artefacts for this run are saved under:\n   {result['run_dir']}")
+    return result
+
+
+def _split(value: Optional[str], sep: str) -> List[str]:
+    return [item.strip() for item in (value or "").split(sep) if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BIG – Agentic Pipeline")
+    parser.add_argument(
+        "--batch",
+        metavar="REQUESTS_JSON",
+        help="run every request in this JSON list instead of a single .env run",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="max runs in flight for --batch (default: BATCH_CONCURRENCY)",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="continue an earlier run (its directory name), skipping completed steps",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=EXECUTION_MODES,
+        help="pipeline (fixed 3-step DAG) or agent (ReAct coordinator); "
+        "default: EXECUTION_MODE",
+    )
+    parser.add_argument(
+        "--countries",
+        metavar="A,B,...",
+        help="fan-out: run steps 1-2 once and step 3 for each country",
+    )
+    parser.add_argument(
+        "--constraint-variants",
+        metavar="A|B|...",
+        help="fan-out: CONSTRAINTS variants to run for each country",
+    )
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch(args.batch, args.concurrency)
+    elif args.countries:
+        run_fanout(
+            _split(args.countries, ","), _split(args.constraint_variants, "|")
+        )
+    else:
+        run_once(args.resume, args.mode)
 
 
 if __name__ == "__main__":
-    run_once()
+    main()
@@ -0,0 +1,217 @@
+"""Prometheus metrics for the FastAPI service, fed by the graph tracer hooks."""
+import asyncio
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+from .graph_tracer import TraceObserver, register_observer
+
+# Root node of an end-to-end run -> execution mode (pipeline / agent / fanout)
+RUN_NODES = {"pipeline": "pipeline", "agent_run": "agent", "fanout": "fanout"}
+
+# LLM steps take seconds to minutes; keep resolution around typical p95s
+_LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+# Event-loop lag: healthy is well under a millisecond, a stall is 100ms+
+_LOOP_LAG_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+# Event-loop lag sampling interval
+_LOOP_LAG_INTERVAL_S = 0.01
+
+registry = CollectorRegistry()
+
+RUN_LATENCY = Histogram(
+    "big_run_duration_seconds",
+    "End-to-end run latency per execution mode.",
+    ["mode", "status"],
+    buckets=_LATENCY_BUCKETS,
+    registry=registry,
+)
+STEP_LATENCY = Histogram(
+    "big_step_duration_seconds",
+    "Latency of each traced pipeline step.",
+    ["step", "status"],
+    buckets=_LATENCY_BUCKETS,
+    registry=registry,
+)
+RUN_LLM_CALLS = Counter(
+    "big_run_llm_calls_total",
+    "LLM requests made by completed runs, per execution mode "
+    "(divide by the run count for calls per run).",
+    ["mode"],
+    registry=registry,
+)
+RUN_LLM_TOKENS = Counter(
+    "big_run_llm_tokens_total",
+    "Tokens used by completed runs, per execution mode and kind.",
+    ["mode", "kind"],
+    registry=registry,
+)
+RUNS_IN_FLIGHT = Gauge(
+    "big_runs_in_flight",
+    "Pipeline runs currently executing in this process.",
+    registry=registry,
+)
+JOBS_QUEUED = Gauge(
+    "big_jobs_queued",
+    "Background jobs waiting for a worker (queue depth).",
+    registry=registry,
+)
+CACHE_LOOKUPS = Counter(
+    "big_cache_lookups_total",
+    "Cache lookups by cache and outcome (hit ratio = hit / total).",
+    ["cache", "result"],
+    registry=registry,
+)
+LLM_REQUESTS = Counter(
+    "big_llm_requests_total",
+    "Successful LLM requests.",
+    ["model", "step"],
+    registry=registry,
+)
+LLM_ERRORS = Counter(
+    "big_llm_errors_total",
+    "Failed LLM attempts, including ones that were retried.",
+    ["model", "step", "error"],
+    registry=registry,
+)
+LLM_RETRIES = Counter(
+    "big_llm_retries_total",
+    "Retries needed by successful LLM requests.",
+    ["model", "step"],
+    registry=registry,
+)
+LLM_TOKENS = Counter(
+    "big_llm_tokens_total",
+    "Tokens processed per model (rate() gives token throughput); "
+    "cached_prompt is the part of prompt served from the provider's cache.",
+    ["model", "kind"],
+    registry=registry,
+)
+LLM_OUTPUT_STOPS = Counter(
+    "big_llm_output_stops_total",
+    "LLM outputs ended early: reason=max_tokens (cut off by the tool's "
+    "token budget), boundary (stopped at the output's end marker) or invalid "
+    "(rejected by the step's validator and regenerated).",
+    ["model", "step", "reason"],
+    registry=registry,
+)
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "big_llm_concurrency_limit",
+    "Current adaptive (AIMD) concurrency limit per model.",
+    ["model"],
+    registry=registry,
+)
+EVENT_LOOP_LAG = Histogram(
+    "big_event_loop_lag_seconds",
+    "How late the service's event loop wakes a sleeping task (loop saturation).",
+    buckets=_LOOP_LAG_BUCKETS,
+    registry=registry,
+)
+LLM_LATENCY = Histogram(
+    "big_llm_request_duration_seconds",
+    "Time spent waiting on LLM requests (incl. retry backoff).",
+    ["model"],
+    buckets=_LATENCY_BUCKETS,
+    registry=registry,
+)
+
+
+def _label(value: Optional[str]) -> str:
+    return value or "unknown"
+
+
+class PrometheusObserver(TraceObserver):
+    """Translate tracing events into Prometheus metrics."""
+
+    def on_node_start(self, name: str) -> None:
+        if name in RUN_NODES:
+            RUNS_IN_FLIGHT.inc()
+
+    def on_node_end(self, name: str, elapsed_s: float, failed: bool) -> None:
+        status = "error" if failed else "ok"
+        if name in RUN_NODES:
+            RUNS_IN_FLIGHT.dec()
+            RUN_LATENCY.labels(mode=RUN_NODES[name], status=status).observe(
+                elapsed_s
+            )
+        else:
+            STEP_LATENCY.labels(step=name, status=status).observe(elapsed_s)
+
+    def on_llm_call(
+        self,
+        node: Optional[str],
+        model: Optional[str],
+        duration_s: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        retries: int,
+        cached_tokens: int = 0,
+    ) -> None:
+        model, step = _label(model), _label(node)
+        LLM_REQUESTS.labels(model=model, step=step).inc()
+        LLM_LATENCY.labels(model=model).observe(duration_s)
+        if retries:
+            LLM_RETRIES.labels(model=model, step=step).inc(retries)
+        LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+        LLM_TOKENS.labels(model=model, kind="cached_prompt").inc(cached_tokens)
+
+    def on_llm_error(
+        self, node: Optional[str], model: Optional[str], error: str
+    ) -> None:
+        LLM_ERRORS.labels(model=_label(model), step=_label(node), error=error).inc()
+
+    def on_output_stop(
+        self, node: Optional[str], model: Optional[str], reason: str
+    ) -> None:
+        LLM_OUTPUT_STOPS.labels(
+            model=_label(model), step=_label(node), reason=reason
+        ).inc()
+
+    def on_cache_lookup(self, cache: str, hit: bool) -> None:
+        CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+    def on_llm_concurrency(self, model: str, limit: int) -> None:
+        LLM_CONCURRENCY_LIMIT.labels(model=model).set(limit)
+
+    def on_run_complete(self, mode: str, totals: Dict[str, Any]) -> None:
+        RUN_LLM_CALLS.labels(mode=mode).inc(totals["llm_calls"])
+        for kind, key in (
+            ("prompt", "prompt_tokens"),
+            ("completion", "completion_tokens"),
+            ("cached_prompt", "cached_prompt_tokens"),
+        ):
+            RUN_LLM_TOKENS.labels(mode=mode, kind=kind).inc(totals[key])
+
+
+_observer = PrometheusObserver()
+
+
+def install_metrics() -> None:
+    """Start feeding the Prometheus registry from the tracer (idempotent)."""
+    register_observer(_observer)
+
+
+def track_queue_depth(depth: Callable[[], float]) -> None:
+    """Report the job queue depth at scrape time."""
+    JOBS_QUEUED.set_function(depth)
+
+
+async def monitor_event_loop_lag(interval_s: float = _LOOP_LAG_INTERVAL_S) -> None:
+    """Sample the running loop's lag into EVENT_LOOP_LAG until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval_s)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - interval_s))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Return (body, content type) for a Prometheus scrape."""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,172 @@
+"""
+Mock OpenAI-compatible LLM server for offline load tests.
+
+Serves `POST /v1/chat/completions` (plain and streamed) with the answers of
+the deterministic `FakeChatModel`, after an injected latency, and fails a
+configurable share of requests with 429 / 5xx responses. Point the service
+at it with `local:` model specs:
+
+    python -m app.mock_llm --port 8001 --latency 0.5 --error-rate 0.02
+    LLM_FAST_MODEL="local:mock" LLM_STRONG_MODEL="local:mock" \
+        LLM_LOCAL_BASE_URL="http://127.0.0.1:8001/v1" uvicorn app.api:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from langchain_core.messages import BaseMessage, convert_to_messages
+
+from .agents.fake import FakeChatModel
+
+# Injected failures, in the shape the OpenAI SDK maps to its error classes
+_ERRORS = (
+    (429, "rate_limit_exceeded", "Rate limit reached (injected)"),
+    (500, "server_error", "Internal server error (injected)"),
+    (503, "server_error", "Service unavailable (injected)"),
+)
+
+
+@dataclass
+class MockConfig:
+    # Mean response time and +/- uniform jitter, in seconds
+    latency_s: float = 0.5
+    jitter_s: float = 0.1
+    # Share of requests answered with an injected 429 / 5xx
+    error_rate: float = 0.0
+    # Delay between streamed chunks
+    chunk_delay_s: float = 0.0
+    seed: int | None = None
+
+
+def _messages(payload: Dict[str, Any]) -> List[BaseMessage]:
+    raw = []
+    for message in payload.get("messages", []):
+        content = message.get("content") or ""
+        if isinstance(content, list):  # content blocks
+            content = "".join(block.get("text", "") for block in content)
+        raw.append({"role": message.get("role", "user"), "content": content})
+    return convert_to_messages(raw)
+
+
+def _usage(message: Any) -> Dict[str, int]:
+    usage = message.usage_metadata or {}
+    prompt, completion = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+def create_mock_app(config: MockConfig) -> FastAPI:
+    """Build the mock server app for `config`."""
+    model = FakeChatModel(model_name="mock")
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Mock LLM server")
+    app.state.requests = 0
+    app.state.errors = 0
+
+    def completion_id() -> str:
+        return f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+
+    async def stream(
+        payload: Dict[str, Any], text: str, usage: Dict[str, int]
+    ) -> AsyncIterator[str]:
+        base = {
+            "id": completion_id(),
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+        }
+        for piece in text.splitlines(keepends=True):
+            choice = {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+            yield f"data: {json.dumps({**base, 'choices': [choice]})}\n\n"
+            if config.chunk_delay_s:
+                await asyncio.sleep(config.chunk_delay_s)
+        done = {"index": 0, "delta": {}, "finish_reason": "stop"}
+        yield f"data: {json.dumps({**base, 'choices': [done]})}\n\n"
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            yield f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.get("/health")
+    async def health() -> Dict[str, int]:
+        return {"requests": app.state.requests, "errors": app.state.errors}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        app.state.requests += 1
+        jitter = rng.uniform(-config.jitter_s, config.jitter_s)
+        await asyncio.sleep(max(0.0, config.latency_s + jitter))
+
+        if rng.random() < config.error_rate:
+            app.state.errors += 1
+            status, kind, message = rng.choice(_ERRORS)
+            return JSONResponse(
+                {"error": {"message": message, "type": kind, "code": kind}},
+                status_code=status,
+            )
+
+        response = await model.ainvoke(_messages(payload))
+        text, usage = str(response.content), _usage(response)
+        if payload.get("max_tokens") == 1:  # prompt-cache warm-up requests
+            text = text[:1]
+        if payload.get("stream"):
+            return StreamingResponse(
+                stream(payload, text, usage), media_type="text/event-stream"
+            )
+        return {
+            "id": completion_id(),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of 429/5xx replies"
+    )
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockConfig(
+        latency_s=args.latency,
+        jitter_s=args.jitter,
+        error_rate=args.error_rate,
+        chunk_delay_s=args.chunk_delay,
+        seed=args.seed,
+    )
+    uvicorn.run(
+        create_mock_app(config), host=args.host, port=args.port, log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
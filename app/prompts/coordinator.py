@@ -1,15 +1,48 @@
 from ..config import Settings
 
+_STATIC_PLAN = """### Fixed TODO list for this run
+
+You MUST strictly follow this static TODO list:
+
+1. Call `generate_axis_unit_context` exactly once with:
+   - axis = AXIS_OF_EXPLORATION
+   - unit = UNIT_OF_ANALYSIS
+
+2. Take the full textual output from step 1 and pass it as `context`
+   into a single call to `generate_ideal_roles`, with:
+   - context = output of step 1
+   - n_roles = IDEAL_ROLES
+
+3. Take the full textual output from step 1 (general context) and step 2
+   (ideal roles prompt opening) and pass them into a single call to
+   `generate_actionable_context`, with:
+   - roles_prompt = output of step 2
+   - general_context = output of step 1
+
+"""
+
+_DYNAMIC_PLAN = """### Planning for this run
+
+Plan the calls yourself. The brief produced by `generate_actionable_context`
+needs the general context (`generate_axis_unit_context`) and the roles prompt
+opening (`generate_ideal_roles`, with n_roles = IDEAL_ROLES). You may call a
+tool again if its output is unusable, but every call costs time and money:
+keep the number of calls as low as the quality of the brief allows.
+
+"""
+
 
 def build_coordinator_instructions(settings: Settings) -> str:
     """Build the system prompt / instructions for the ReAct coordinator agent.
 
     This prompt wires in values from the .env so the agent doesn't have to ask
-    for them at runtime, and describes a simple *static TODO* plan with 3 steps.
+    for them at runtime. With STATIC_TODO it describes a fixed 3-step plan;
+    otherwise the agent plans its own tool calls towards the same final brief.
     """
     axis = settings.AXIS_OF_EXPLORATION
     unit = settings.UNIT_OF_ANALYSIS
     ideal_roles = settings.IDEAL_ROLES
+    plan = _STATIC_PLAN if settings.STATIC_TODO else _DYNAMIC_PLAN
 
     instructions = f"""You are the coordinator agent of the Business Idea Generator (BIG).
 
@@ -35,26 +68,7 @@ You have access to the following tools (you will see their JSON schemas separate
    and produces a rigorous, cross-cutting and actionable analytical context brief
    in the exact structure described in its docstring (step 3).
 
-### Fixed TODO list for this run
-
-You MUST strictly follow this static TODO list:
-
-1. Call `generate_axis_unit_context` exactly once with:
-   - axis = AXIS_OF_EXPLORATION
-   - unit = UNIT_OF_ANALYSIS
-
-2. Take the full textual output from step 1 and pass it as `context`
-   into a single call to `generate_ideal_roles`, with:
-   - context = output of step 1
-   - n_roles = IDEAL_ROLES
-
-3. Take the full textual output from step 1 (general context) and step 2
-   (ideal roles prompt opening) and pass them into a single call to
-   `generate_actionable_context`, with:
-   - roles_prompt = output of step 2
-   - general_context = output of step 1
-
-4. Once step 3 has succeeded, you will answer the user with:
+{plan}Once step 3 has succeeded, you will answer the user with:
    - ONLY the final text returned by `generate_actionable_context`
    - NO extra explanation, NO meta-commentary, NO markdown outside of what
      the tool produced.
@@ -0,0 +1,169 @@
+from typing import Dict, List, Literal
+
+from pydantic import BaseModel
+
+from .config.settings import Settings
+
+
+class RunRequest(BaseModel):
+    axis_of_exploration: str
+    unit_of_analysis: str
+    ideal_roles: int | None = None
+    external_research: bool | None = None
+    constraints: str | None = None
+    complex_unit: bool | None = None
+    country: str | None = None
+    # Skip the step 1 response cache and force a fresh generation
+    bypass_cache: bool = False
+    # Run ID of an earlier (e.g. failed) run to continue; completed steps
+    # whose inputs are unchanged are not recomputed
+    resume: str | None = None
+    # Execution mode override (default: EXECUTION_MODE)
+    mode: Literal["pipeline", "agent"] | None = None
+    # Agent mode: follow-up instruction for the thread of run `resume`
+    message: str | None = None
+
+
+class StepValidation(BaseModel):
+    tool: str
+    # Whether the output has its step's structure (markers, roles, headings)
+    valid: bool
+    errors: List[str] = []
+
+
+class RunResponse(BaseModel):
+    run_id: str
+    run_dir: str
+    # Steps loaded from the resumed run's checkpoints
+    resumed_steps: List[int] = []
+    step1_general_context: str
+    step1_cache_hit: bool
+    step2_ideal_roles_prompt: str
+    step3_actionable_context_brief: str
+    # Per step artefact (also stored as the run's validation.json)
+    validation: Dict[str, StepValidation] = {}
+    # Agent mode: thread ID (= run_id) and the coordinator's final answer
+    thread_id: str | None = None
+    agent_reply: str | None = None
+
+
+class FanoutRunRequest(RunRequest):
+    # Step 3 runs once per country × constraint variant; steps 1-2 are shared
+    countries: List[str]
+    # CONSTRAINTS per variant (default: the run's constraints only)
+    constraint_variants: List[str] = []
+
+
+class FanoutVariantResult(BaseModel):
+    variant_id: str
+    country: str
+    constraints: str
+    status: str
+    # Artefact name within the run, e.g. variants/<variant_id>/step3_...md
+    artefact: str
+    step3_actionable_context_brief: str | None = None
+    validation: StepValidation | None = None
+    error: str | None = None
+
+
+class FanoutRunResponse(BaseModel):
+    run_id: str
+    run_dir: str
+    step1_general_context: str
+    step1_cache_hit: bool
+    step2_ideal_roles_prompt: str
+    step2_cache_hit: bool
+    # Steps 1-2; each variant carries its own step 3 validation
+    validation: Dict[str, StepValidation] = {}
+    variants: List[FanoutVariantResult]
+
+
+class BatchRunRequest(BaseModel):
+    runs: List[RunRequest]
+    # Max runs in flight; defaults to BATCH_CONCURRENCY
+    concurrency: int | None = None
+
+
+class BatchItemStatus(BaseModel):
+    index: int
+    axis_of_exploration: str
+    unit_of_analysis: str
+    country: str | None = None
+    status: str
+    duration_s: float
+    run_dir: str | None = None
+    step1_cache_hit: bool | None = None
+    error: str | None = None
+
+
+class BatchRunResponse(BaseModel):
+    batch_dir: str
+    started_at: str
+    finished_at: str
+    concurrency: int
+    total: int
+    succeeded: int
+    failed: int
+    step1_cache_hits: int
+    wall_time_s: float
+    mean_run_duration_s: float
+    throughput_runs_per_min: float
+    items: List[BatchItemStatus]
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: str
+    started_at: str | None = None
+    finished_at: str | None = None
+    run_dir: str | None = None
+    # Last completed step (1-3), if any
+    current_step: int | None = None
+    # Outputs of the steps completed so far, keyed like RunResponse fields
+    steps: Dict[str, str] = {}
+    # Names of artefacts downloadable via /jobs/{id}/artefacts/{name}
+    artefacts: List[str] = []
+    error: str | None = None
+
+
+class RunSummary(BaseModel):
+    run_id: str
+    axis_of_exploration: str
+    unit_of_analysis: str
+    country: str
+    created_at: str
+    run_dir: str
+
+
+class RunListResponse(BaseModel):
+    # Newest first
+    runs: List[RunSummary]
+
+
+def settings_for_request(base_settings: Settings, req: RunRequest) -> Settings:
+    """Start from base settings loaded from .env, then apply request overrides."""
+    update = {
+        "AXIS_OF_EXPLORATION": req.axis_of_exploration,
+        "UNIT_OF_ANALYSIS": req.unit_of_analysis,
+    }
+
+    if req.ideal_roles is not None:
+        update["IDEAL_ROLES"] = req.ideal_roles
+    if req.external_research is not None:
+        update["EXTERNAL_RESEARCH"] = req.external_research
+    if req.constraints is not None:
+        update["CONSTRAINTS"] = req.constraints
+    if req.complex_unit is not None:
+        update["COMPLEX_UNIT"] = req.complex_unit
+    if req.country is not None:
+        update["COUNTRY"] = req.country
+    if req.mode is not None:
+        update["EXECUTION_MODE"] = req.mode
+
+    return base_settings.model_copy(update=update)
@@ -0,0 +1,69 @@
+"""Single-flight coalescing of identical concurrent async computations."""
+import asyncio
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+@dataclass
+class _Flight:
+    future: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Share one in-flight computation between concurrent callers of the same key.
+
+    The first caller for a key starts the computation; callers arriving
+    while it runs await the same result (or exception). Nothing is cached:
+    once the computation finishes, the next call starts a new one.
+
+    The computation is shielded, so a caller being cancelled (e.g. a client
+    disconnecting) does not cancel it for the others; once the last caller
+    waiting for it is cancelled, nobody needs the result and it is cancelled
+    too.
+    """
+
+    def __init__(self) -> None:
+        # Futures are bound to a loop, so keep one table per loop
+        self._inflight: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _table(self) -> Dict[str, _Flight]:
+        loop = asyncio.get_running_loop()
+        table = self._inflight.get(loop)
+        if table is None:
+            table = self._inflight[loop] = {}
+        return table
+
+    async def do(
+        self, key: str, fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Return (result, shared); `shared` is True if another call computed it."""
+        table = self._table()
+        flight = table.get(key)
+        # A finished flight may linger until its done callback has run
+        shared = flight is not None and not flight.future.done()
+        if not shared:
+            flight = table[key] = _Flight(asyncio.ensure_future(fn()))
+
+            def _forget(done: asyncio.Future) -> None:
+                if table.get(key) is flight:
+                    del table[key]
+
+            flight.future.add_done_callback(_forget)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future), shared
+        finally:
+            flight.waiters -= 1
+            # Only a cancelled caller leaves before the result is ready
+            if not flight.waiters and not flight.future.done():
+                if table.get(key) is flight:
+                    del table[key]
+                flight.future.cancel()
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed on the running loop."""
+        return len(self._table())
@@ -0,0 +1,327 @@
+"""
+Helpers shared by the execution modes (pipeline, fan-out, agent): run
+creation, artefact writes, progress events, validation reports, the cached
+steps 1-2 and single-flight tool calls, and the CLI console output.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.tools import BaseTool
+
+from .agents.context import RunContext
+from .agents.scheduler import current_priority
+from .agents.tools import (
+    agenerate_validated,
+    axis_unit_context_cache_key,
+    generate_axis_unit_context,
+    generate_ideal_roles,
+    tool_call_key,
+)
+from .agents.validation import validate_output
+from .artefacts import StoredRun, get_artefact_store
+from .cache import SemanticCache, get_response_cache, get_semantic_cache
+from .config.settings import Settings
+from .graph_tracer import record_cache_lookup, record_semantic_hit
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Async callback receiving pipeline progress events (see `execute_pipeline_async`)
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Coalesce identical concurrent tool calls into one LLM request
+_tool_flights = SingleFlight()
+
+
+def create_run(settings: Settings) -> StoredRun:
+    """Create and index a new run in the ARTEFACT_STORE_BACKEND store."""
+    run = get_artefact_store(settings).create_run(
+        settings.AXIS_OF_EXPLORATION,
+        settings.UNIT_OF_ANALYSIS,
+        settings.COUNTRY,
+    )
+    logger.info("Created run %s", run)
+    return run
+
+
+def write_step_output(run: StoredRun, filename: str, content: str) -> None:
+    """Write a single step's output as an artefact of the run."""
+    run.write(filename, content)
+    logger.info("Wrote artefact: %s/%s", run, filename)
+
+
+async def awrite_step_output(run: StoredRun, filename: str, content: str) -> None:
+    """Async variant of `write_step_output`; the write runs in a thread."""
+    await asyncio.to_thread(write_step_output, run, filename, content)
+
+
+async def emit(on_event: Optional[EventCallback], event: Dict[str, Any]) -> None:
+    if on_event is not None:
+        await on_event(event)
+
+
+def validation_report(
+    settings: Settings, outputs: Dict[str, tuple]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Validation of each artefact in `outputs` ({artefact: (tool name,
+    output)}), as written to the run's validation.json.
+    """
+    report = {}
+    for artefact, (tool_name, output) in outputs.items():
+        result = validate_output(tool_name, output, settings.IDEAL_ROLES)
+        if result is not None:
+            report[artefact] = result.as_dict()
+            if not result.valid:
+                logger.warning(
+                    "Invalid %s: %s", artefact, "; ".join(result.errors)
+                )
+    return report
+
+
+async def arun_tool(
+    tool: BaseTool,
+    inputs: Dict[str, Any],
+    step: int,
+    on_event: Optional[EventCallback],
+    context: RunContext,
+) -> str:
+    """
+    Run a tool asynchronously with the run's context.
+
+    When an event callback is attached, the tool's LLM call is streamed and
+    each text delta is forwarded as a `token` event as soon as it arrives.
+    If the output's validator rejects it, a `step_retry` event (attempt,
+    errors) tells clients to discard the tokens of the step received so far.
+
+    Identical concurrent calls (same tool, model, inputs and the settings the
+    tool reads) share one LLM request. A caller joining a streamed call
+    receives the whole output as a single `token` event.
+    """
+
+    async def call() -> str:
+        if on_event is None:
+            return await tool.ainvoke(inputs, config=context.as_config())
+
+        async def on_delta(delta: str) -> None:
+            await on_event({"event": "token", "step": step, "delta": delta})
+
+        async def on_retry(attempt: int, errors: List[str]) -> None:
+            await on_event(
+                {
+                    "event": "step_retry",
+                    "step": step,
+                    "attempt": attempt,
+                    "errors": errors,
+                }
+            )
+
+        return await agenerate_validated(
+            context, tool.name, inputs, on_delta=on_delta, on_retry=on_retry
+        )
+
+    # Per lane: the shared call runs in its first caller's priority lane
+    key = f"{tool_call_key(context, tool.name, inputs)}:{current_priority()}"
+    output, shared = await _tool_flights.do(key, call)
+    record_cache_lookup("tool_singleflight", shared)
+    if shared:
+        logger.info("Coalesced `%s` with an identical in-flight call", tool.name)
+        await emit(on_event, {"event": "token", "step": step, "delta": output})
+    return output
+
+
+async def agenerate_general_context(
+    context: RunContext,
+    use_cache: bool,
+    on_event: Optional[EventCallback] = None,
+    shared_step1: Optional[Dict[tuple, "asyncio.Future"]] = None,
+) -> tuple:
+    """
+    Run step 1, going through the response cache (then the semantic cache,
+    for near-duplicate axis/unit spellings) unless bypassed.
+
+    `shared_step1` lets a group of runs (e.g. a batch) share one step 1
+    computation per AXIS × UNIT: the first run starts it, the others await
+    the same future and count as cache hits.
+
+    Returns (context_block, cache_hit).
+    """
+    settings = context.settings
+    if shared_step1 is not None:
+        shared_key = (settings.AXIS_OF_EXPLORATION, settings.UNIT_OF_ANALYSIS)
+        future = shared_step1.get(shared_key)
+        record_cache_lookup("step1_shared", future is not None)
+        if future is not None:
+            context_block, _ = await asyncio.shield(future)
+            logger.info("Step 1 shared with another run in the group")
+            return context_block, True
+        future = asyncio.ensure_future(
+            agenerate_general_context(context, use_cache, on_event)
+        )
+        shared_step1[shared_key] = future
+        return await asyncio.shield(future)
+
+    inputs = {
+        "axis": settings.AXIS_OF_EXPLORATION,
+        "unit": settings.UNIT_OF_ANALYSIS,
+    }
+    cache = get_response_cache(settings) if use_cache else None
+    if cache is not None:
+        key = axis_unit_context_cache_key(context, **inputs)
+        cached = await asyncio.to_thread(cache.get, key)
+        record_cache_lookup("step1_response", cached is not None)
+        if cached is not None:
+            logger.info("Step 1 cache hit (key=%s)", key[:12])
+            return cached, True
+
+    semantic = get_semantic_cache(settings) if use_cache else None
+    if semantic is not None:
+        namespace = tool_call_key(context, generate_axis_unit_context.name, {})
+        hit = await _semantic_lookup(
+            context, semantic, "step1_semantic", generate_axis_unit_context, {}, inputs
+        )
+        if hit is not None:
+            # Not copied into the exact-key cache: a near match is only
+            # served while the semantic cache is on (and its entry lives)
+            return hit, True
+
+    context_block = await arun_tool(
+        generate_axis_unit_context, inputs, 1, on_event, context
+    )
+
+    if not _is_valid(settings, generate_axis_unit_context, context_block):
+        return context_block, False
+    if cache is not None:
+        await asyncio.to_thread(cache.set, key, context_block)
+    if semantic is not None:
+        await asyncio.to_thread(semantic.set, namespace, inputs, context_block)
+    return context_block, False
+
+
+async def _semantic_lookup(
+    context: RunContext,
+    semantic: SemanticCache,
+    name: str,
+    tool: BaseTool,
+    exact_inputs: Dict[str, Any],
+    fields: Dict[str, str],
+) -> Optional[str]:
+    """
+    A near-duplicate's cached response for a call of `tool`, recorded as
+    cache `name`. `exact_inputs` must match exactly, `fields` closely; a hit
+    is recorded in the run's metrics with the key of the call it reuses.
+    """
+    namespace = tool_call_key(context, tool.name, exact_inputs)
+    hit = await asyncio.to_thread(semantic.get, namespace, fields)
+    record_cache_lookup(name, hit is not None)
+    if hit is None:
+        return None
+    source_key = tool_call_key(context, tool.name, {**exact_inputs, **hit.matched})
+    matched = {field: value[:60] for field, value in hit.matched.items()}
+    record_semantic_hit(name, source_key, hit.similarity, matched)
+    logger.info(
+        "%s hit (similarity %.3f, key=%s): %s",
+        name,
+        hit.similarity,
+        source_key[:12],
+        matched,
+    )
+    return hit.value
+
+
+async def agenerate_ideal_roles(
+    context: RunContext,
+    inputs: Dict[str, Any],
+    use_cache: bool,
+    on_event: Optional[EventCallback] = None,
+) -> tuple:
+    """
+    Run step 2, reusing the roles of a near-identical general context from
+    the semantic cache unless bypassed (or disabled).
+
+    Returns (roles_block, cache_hit).
+    """
+    semantic = get_semantic_cache(context.settings) if use_cache else None
+    if semantic is None:
+        roles_block = await arun_tool(
+            generate_ideal_roles, inputs, 2, on_event, context
+        )
+        return roles_block, False
+
+    # The number of roles must match exactly; the context only closely
+    exact_inputs = {"n_roles": inputs["n_roles"]}
+    namespace = tool_call_key(context, generate_ideal_roles.name, exact_inputs)
+    fields = {"context": inputs["context"]}
+    hit = await _semantic_lookup(
+        context, semantic, "step2_semantic", generate_ideal_roles, exact_inputs, fields
+    )
+    if hit is not None:
+        return hit, True
+    roles_block = await arun_tool(generate_ideal_roles, inputs, 2, on_event, context)
+    if _is_valid(context.settings, generate_ideal_roles, roles_block):
+        await asyncio.to_thread(semantic.set, namespace, fields, roles_block)
+    return roles_block, False
+
+
+def _is_valid(settings: Settings, tool: BaseTool, output: str) -> bool:
+    """Whether an output passes its validator; invalid ones are not cached."""
+    result = validate_output(tool.name, output, settings.IDEAL_ROLES)
+    return result is None or result.valid
+
+
+# ---------------------------
+# Console helpers (CLI mode)
+# ---------------------------
+
+
+def print_run_header(settings: Settings, run: StoredRun) -> None:
+    print("\n🌐 BIG – Agentic Pipeline Run")
+    print("====================================")
+    print("We will now perform three internal steps:")
+    print("  1️⃣ Generate a general analytical context for your AXIS × UNIT")
+    print("  2️⃣ From that context, generate the ideal roles prompt opening")
+    print(
+        "  3️⃣ Using both, generate a rigorous, actionable analytical context brief\n"
+    )
+
+    print(f"   AXIS_OF_EXPLORATION: {settings.AXIS_OF_EXPLORATION}")
+    print(f"   UNIT_OF_ANALYSIS   : {settings.UNIT_OF_ANALYSIS}")
+    print(f"   COUNTRY            : {settings.COUNTRY}")
+    print(f"   IDEAL_ROLES        : {settings.IDEAL_ROLES}")
+    print(
+        f"   EXTERNAL_RESEARCH  : "
+        f"{'yes' if settings.EXTERNAL_RESEARCH else 'no'}"
+    )
+    print(f"   CONSTRAINTS        : {settings.CONSTRAINTS or 'none specified'}")
+    print(f"   COMPLEX_UNIT       : {'yes' if settings.COMPLEX_UNIT else 'no'}\n")
+
+    print(f"📁 This run will be saved to: {run}\n")
+    print("🚀 Launching sub-agents...\n")
+
+
+def print_step_result(
+    step: int, title: str, content: str, resumed: bool = False
+) -> None:
+    suffix = " (resumed from checkpoint)" if resumed else ""
+    print(f"✅ Step {step}/3 completed{suffix}.\n")
+    print("====================================")
+    print(f"STEP {step}/3 – {title}")
+    print("====================================\n")
+    print(content)
+    if step < 3:
+        print("\n------------------------------------\n")
+
+
+def print_run_footer(run: StoredRun) -> None:
+    print(
+        f"\n📝 All artefacts for this run are saved under:\n   {run}\n"
+        "   - step1_general_context.md\n"
+        "   - step2_ideal_roles_prompt.md\n"
+        "   - step3_actionable_context_brief.md\n"
+    )
+
+    print(
+        "🎯 End of run – you can now reuse the final brief above as the "
+        "context input for downstream ideation or opportunity generation."
+    )